@@ -33,6 +33,71 @@ export async function processOCR(files, options = {}) {
   }
 }
 
+// Stream results page by page as newline-delimited JSON events:
+// 'start', 'page' and 'summary' per file (or 'error'), then a final 'done'.
+// onEvent is called with each event as soon as it arrives.
+export async function processOCRStream(files, options = {}, onEvent = () => {}) {
+  try {
+    const formData = new FormData();
+    
+    // Add files
+    files.forEach(file => {
+      formData.append('files', file);
+    });
+    
+    // Add options
+    formData.append('languages', JSON.stringify(options.languages || ['en']));
+    formData.append('useHighAccuracy', options.useHighAccuracy || 'true');
+    if (options.dpi) {
+      formData.append('dpi', options.dpi);
+    }
+    
+    const response = await fetch(`${API_ENDPOINT}/process/stream`, {
+      method: 'POST',
+      headers: { Accept: 'application/x-ndjson' },
+      body: formData,
+    });
+    
+    if (!response.ok) {
+      return await response.json();
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let lastEvent = null;
+    
+    const handleLine = (line) => {
+      if (line.trim()) {
+        lastEvent = JSON.parse(line);
+        onEvent(lastEvent);
+      }
+    };
+    
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split('\n');
+      buffer = lines.pop();
+      lines.forEach(handleLine);
+    }
+    handleLine(buffer + decoder.decode());
+    
+    return {
+      success: lastEvent?.event === 'done' && lastEvent.failed === 0,
+      summary: lastEvent
+    };
+    
+  } catch (error) {
+    console.error('OCR Stream Error:', error);
+    return {
+      success: false,
+      error: `Connection failed: ${error.message}`
+    };
+  }
+}
+
 export async function quickExtract(file, languages = ['en']) {
   try {
     const formData = new FormData();
@@ -0,0 +1,213 @@
+"""
+Request admission control
+Estimates what a request will cost before any OCR runs and turns it away
+early (HTTP 429/503 with Retry-After) when its client or the process is
+over budget, so one large batch cannot starve everyone else
+"""
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+import logging
+
+import numpy as np
+
+import config
+from metrics import ADMISSION_REJECTIONS
+from ocr import AUTO_DPI, Dpi, pdf_page_count, source_extension
+from paged_image import MULTI_FRAME_EXTENSIONS, image_header
+
+logger = logging.getLogger(__name__)
+
+# Seconds per page assumed for Retry-After until requests have been timed
+INITIAL_SECONDS_PER_PAGE = 1.0
+# Weight of the latest request in the seconds-per-page average
+SECONDS_PER_PAGE_SMOOTHING = 0.2
+# Idle client buckets are dropped once more clients than this are tracked
+MAX_TRACKED_CLIENTS = 4096
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request is not admitted; carries the HTTP status to
+    answer with and, for retryable rejections, the Retry-After seconds
+    """
+
+    def __init__(self, message: str, status: int, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def file_cost(source, filename: Optional[str] = None, dpi: Dpi = config.DEFAULT_DPI) -> float:
+    """
+    Estimated cost of one upload in pages, from its headers only: the PDF
+    page count (scaled up for DPIs above config.DEFAULT_DPI), or an image's
+    frames, each counting as one page per config.ADMISSION_PAGE_PIXELS
+    pixels. Unreadable files cost one page; processing reports the error.
+    """
+    ext = source_extension(source, filename)
+    if ext == '.pdf':
+        try:
+            pages = pdf_page_count(source)
+        except Exception:
+            return 1.0
+        scale = 1.0 if dpi == AUTO_DPI else (float(dpi) / config.DEFAULT_DPI) ** 2
+        return pages * max(1.0, scale)
+    if isinstance(source, np.ndarray):
+        frames, pixels = 1, source.shape[0] * source.shape[1]
+    else:
+        header = image_header(source)
+        if header is None:
+            return 1.0
+        frames, width, height = header
+        if not config.IMAGE_FRAME_PAGES or ext not in MULTI_FRAME_EXTENSIONS:
+            frames = 1
+        pixels = width * height
+    return frames * max(1.0, pixels / config.ADMISSION_PAGE_PIXELS)
+
+
+def estimate_cost(sources: Sequence, filenames: Sequence[Optional[str]], dpi: Dpi = config.DEFAULT_DPI) -> float:
+    """Estimated cost of a request's uploads in pages (see file_cost)"""
+    return sum(file_cost(source, filename, dpi) for source, filename in zip(sources, filenames))
+
+
+class AdmissionController:
+    """
+    Admits requests by estimated cost, in pages (see estimate_cost).
+
+    Two budgets apply. Every client has a token bucket refilled at
+    `client_rate` pages per second up to `client_burst`; a client whose
+    bucket cannot cover the request gets 429. Requests that hold the
+    process (synchronous OCR, as opposed to queued jobs) also share a
+    budget of `max_inflight` pages; one that would exceed it gets 503,
+    unless nothing is in flight so any single request can run on an idle
+    worker. Rejections are immediate and carry a Retry-After estimate.
+
+    Limits are per process: with several gunicorn workers each enforces
+    its own.
+    """
+
+    def __init__(self, max_inflight: float = config.ADMISSION_MAX_INFLIGHT_PAGES,
+                 client_rate: float = config.ADMISSION_CLIENT_RATE,
+                 client_burst: float = config.ADMISSION_CLIENT_BURST,
+                 max_files: int = config.ADMISSION_MAX_FILES,
+                 max_request_pages: float = config.ADMISSION_MAX_REQUEST_PAGES):
+        self.max_inflight = max_inflight
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.max_files = max_files
+        self.max_request_pages = max_request_pages
+        self._inflight = 0.0
+        # client -> [tokens, monotonic time of the last refill]
+        self._buckets: Dict[str, List[float]] = {}
+        self._seconds_per_page = INITIAL_SECONDS_PER_PAGE
+        self._lock = threading.Lock()
+
+    def _refill(self, client: str, now: float) -> float:
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            if len(self._buckets) >= MAX_TRACKED_CLIENTS:
+                self._prune(now)
+            bucket = self._buckets[client] = [self.client_burst, now]
+        bucket[0] = min(self.client_burst, bucket[0] + (now - bucket[1]) * self.client_rate)
+        bucket[1] = now
+        return bucket[0]
+
+    def _prune(self, now: float):
+        # A bucket that has refilled completely is the same as a new one
+        full = [client for client, (tokens, updated) in self._buckets.items()
+                if tokens + (now - updated) * self.client_rate >= self.client_burst]
+        for client in full:
+            del self._buckets[client]
+
+    @staticmethod
+    def _retry_after(seconds: float) -> int:
+        return int(math.ceil(min(max(seconds, 1.0), config.ADMISSION_MAX_RETRY_AFTER)))
+
+    def admit(self, client: str, cost: float, files: int = 1, hold: bool = True) -> Dict:
+        """
+        Admit a request or raise AdmissionRejected
+
+        Args:
+            client: Client identity the token bucket is kept for
+            cost: Estimated cost in pages
+            files: Number of files in the request
+            hold: Count the cost against the in-flight budget until
+                release() (False for work queued elsewhere, e.g. jobs,
+                which only draws on the client's bucket)
+
+        Returns:
+            A ticket to pass to release() when the work is done
+
+        Raises:
+            AdmissionRejected: 413 for a request over the per-request limits,
+                429 when the client is over its rate, 503 when the process
+                is at its in-flight budget
+        """
+        if self.max_files and files > self.max_files:
+            ADMISSION_REJECTIONS.inc(reason='too_large')
+            raise AdmissionRejected(f"Too many files: at most {self.max_files} per request", 413)
+        if self.max_request_pages and cost > self.max_request_pages:
+            ADMISSION_REJECTIONS.inc(reason='too_large')
+            raise AdmissionRejected(f"Request too large: about {math.ceil(cost)} pages, at most "
+                                    f"{self.max_request_pages:g} per request", 413)
+
+        now = time.monotonic()
+        with self._lock:
+            if self.client_rate > 0:
+                tokens = self._refill(client, now)
+                # Requests larger than the bucket are admitted from a full
+                # bucket, which they leave in debt
+                needed = min(cost, self.client_burst)
+                if tokens < needed:
+                    ADMISSION_REJECTIONS.inc(reason='client_rate')
+                    raise AdmissionRejected('Rate limit exceeded, please retry later', 429,
+                                            self._retry_after((needed - tokens) / self.client_rate))
+            if (hold and self.max_inflight > 0 and self._inflight > 0
+                    and self._inflight + cost > self.max_inflight):
+                excess = self._inflight + cost - self.max_inflight
+                ADMISSION_REJECTIONS.inc(reason='busy')
+                raise AdmissionRejected('Server is busy, please retry later', 503,
+                                        self._retry_after(excess * self._seconds_per_page))
+            if self.client_rate > 0:
+                self._buckets[client][0] -= cost
+            if hold:
+                self._inflight += cost
+        return {'cost': cost, 'held': hold, 'start': now}
+
+    def release(self, ticket: Optional[Dict]):
+        """Return an admitted request's cost to the in-flight budget"""
+        if ticket is None or not ticket['held']:
+            return
+        elapsed = time.monotonic() - ticket['start']
+        with self._lock:
+            self._inflight = max(0.0, self._inflight - ticket['cost'])
+            if ticket['cost'] > 0:
+                self._seconds_per_page += SECONDS_PER_PAGE_SMOOTHING * (
+                    elapsed / ticket['cost'] - self._seconds_per_page)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'inflight_pages': round(self._inflight, 2),
+                'max_inflight_pages': self.max_inflight,
+                'clients': len(self._buckets),
+                'seconds_per_page': round(self._seconds_per_page, 3)
+            }
+
+
+_controller: Optional[AdmissionController] = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """
+    Get the process-wide admission controller
+    """
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController()
+    return _controller
@@ -0,0 +1,328 @@
+"""
+Framework-neutral API helpers
+Option parsing, admission, OCR dispatch and response shapes shared by the
+Flask app (app.py) and the ASGI app (asgi_app.py), so both serve the same
+routes with the same bodies
+"""
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+import logging
+
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+import config
+from admission import AdmissionRejected, estimate_cost, get_admission_controller
+from metrics import stage
+from ocr import MODE_DETECT, MODE_FULL, MODES, batch_process, parse_boxes, parse_dpi, process_file
+from serialization import compact_result, encode, format_for_mimetype, offered_mimetypes
+
+logger = logging.getLogger(__name__)
+
+# Largest request body accepted (uploads plus form fields)
+MAX_CONTENT_LENGTH = 50 * 1024 * 1024
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tif', 'tiff', 'webp', 'pdf'}
+
+SUPPORTED_LANGUAGES = {
+    'en': 'English',
+    'es': 'Spanish',
+    'fr': 'French',
+    'de': 'German',
+    'it': 'Italian',
+    'pt': 'Portuguese',
+    'ru': 'Russian',
+    'ar': 'Arabic',
+    'zh': 'Chinese',
+    'ja': 'Japanese',
+    'ko': 'Korean',
+    'hi': 'Hindi'
+}
+
+
+def allowed_file(filename: str) -> bool:
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def error_body(message: str) -> Dict:
+    return {
+        'success': False,
+        'error': message
+    }
+
+
+def health_body(state: Dict) -> Dict:
+    """/api/health body (liveness) from warmup.readiness()"""
+    return {
+        'status': 'healthy',
+        'service': 'OCR API',
+        'version': '1.0.0',
+        'ready': state['ready'],
+        'readers': state['languages']
+    }
+
+
+def readiness_status(state: Dict) -> str:
+    if state['ready']:
+        return 'ready'
+    return 'unhealthy' if state['errors'] and not state['warming'] else 'warming_up'
+
+
+def ready_body(state: Dict) -> Tuple[Dict, int]:
+    """/api/ready body and status code: 503 until the readers are warm"""
+    return {
+        'status': readiness_status(state),
+        'ready': state['ready'],
+        'readers': state['languages'],
+        'errors': state['errors'],
+        'warmup_time': state['warmup_time']
+    }, 200 if state['ready'] else 503
+
+
+def parse_process_options(form: Mapping[str, str]) -> Tuple[List[str], bool, Any]:
+    """
+    Parse the processing options shared by /api/process and /api/jobs
+
+    Raises:
+        ValueError: With the message for the 400 response
+    """
+    languages = json.loads(form.get('languages', '["en"]'))
+    use_high_accuracy = form.get('useHighAccuracy', 'true').lower() == 'true'
+    # PDF rendering DPI: a number or 'auto' for per-page adaptive DPI
+    try:
+        dpi = parse_dpi(form.get('dpi', config.DEFAULT_DPI))
+    except ValueError as e:
+        raise ValueError(f'Invalid dpi: {str(e)}')
+    return languages, use_high_accuracy, dpi
+
+
+def parse_rois(value: Optional[str]) -> Optional[List]:
+    """
+    Parse the optional 'rois' form field: a JSON list of [x, y, width, height]
+    (or {x, y, width, height}) image regions
+
+    Raises:
+        ValueError: With the message for the 400 response
+    """
+    if not value:
+        return None
+    try:
+        rois = json.loads(value)
+        if not isinstance(rois, list) or not all(
+                isinstance(roi, dict) or (isinstance(roi, list) and len(roi) == 4) for roi in rois):
+            raise ValueError('expected a list of [x, y, width, height]')
+    except ValueError as e:
+        raise ValueError(f'Invalid rois: {str(e)}')
+    return rois or None
+
+
+def parse_mode_options(form: Mapping[str, str], file_count: int) -> Tuple[str, Any]:
+    """
+    Parse the optional 'mode' form field ('full', 'detect' or 'recognize')
+    and 'boxes', the JSON result of an earlier /api/detect (or /api/process)
+    call on the same single file
+
+    Raises:
+        ValueError: With the message for the 400 response
+    """
+    mode = form.get('mode', MODE_FULL).lower()
+    value = form.get('boxes')
+    if mode not in MODES:
+        raise ValueError(f"Invalid mode: expected one of {', '.join(MODES)}")
+    boxes = None
+    if value:
+        try:
+            boxes = parse_boxes(json.loads(value))
+            if mode == MODE_DETECT or file_count != 1:
+                raise ValueError('boxes apply to recognize mode on a single file')
+        except ValueError as e:
+            raise ValueError(f'Invalid boxes: {str(e)}')
+    return mode, boxes
+
+
+def client_key(headers: Mapping[str, str], remote_addr: Optional[str]) -> str:
+    """
+    Identity admission control keeps a rate limit for: the
+    ADMISSION_CLIENT_HEADER value when configured, otherwise the client
+    address. For a list such as X-Forwarded-For this is the entry the
+    outermost trusted proxy appended, config.ADMISSION_TRUSTED_PROXIES
+    from the right; the entries before it are the client's own and are
+    ignored, so forging them does not give a fresh rate limit.
+    """
+    if config.ADMISSION_CLIENT_HEADER:
+        entries = [entry.strip() for entry in (headers.get(config.ADMISSION_CLIENT_HEADER) or '').split(',')]
+        entries = [entry for entry in entries if entry]
+        if entries:
+            return entries[-min(max(1, config.ADMISSION_TRUSTED_PROXIES), len(entries))]
+    return remote_addr or 'unknown'
+
+
+def admit(sources: Sequence, filenames: Sequence[str], dpi: Any, client: str,
+          hold: bool = True) -> Optional[Dict]:
+    """
+    Admit the uploads' estimated cost for a client (see admission.py)
+
+    Returns:
+        A ticket for release(), or None when admission control is off
+
+    Raises:
+        AdmissionRejected: The request is turned away (413, 429 or 503)
+    """
+    if not config.ADMISSION_ENABLED:
+        return None
+    with stage('admission'):
+        cost = estimate_cost(sources, filenames, dpi)
+        try:
+            return get_admission_controller().admit(client, cost, len(sources), hold)
+        except AdmissionRejected as e:
+            logger.warning(f"Rejected request from {client} ({cost:.1f} pages): {str(e)}")
+            raise
+
+
+def release(ticket: Optional[Dict]):
+    if ticket is not None:
+        get_admission_controller().release(ticket)
+
+
+def run_ocr(sources, filenames, languages, use_high_accuracy, dpi=config.DEFAULT_DPI, progress=None,
+            rois=None, mode=MODE_FULL, boxes=None):
+    """Run OCR on uploads: one file directly, several as a batch"""
+    if len(sources) == 1:
+        # Single file processing
+        return process_file(
+            sources[0],
+            languages=languages,
+            detail=True,
+            dpi=dpi,
+            use_fallback=use_high_accuracy,
+            progress=progress,
+            filename=filenames[0],
+            rois=rois,
+            mode=mode,
+            boxes=boxes
+        )
+    # Batch processing
+    return batch_process(
+        sources,
+        languages=languages,
+        detail=True,
+        dpi=dpi,
+        use_fallback=use_high_accuracy,
+        progress=progress,
+        filenames=filenames,
+        rois=rois,
+        mode=mode
+    )
+
+
+def format_process_result(result) -> Tuple[Dict, int]:
+    """Shape an OCR result into the /api/process response body and status code"""
+    if isinstance(result, dict):
+        if result.get('status') == 'success':
+            extracted_text = result.get('text') or result.get('full_text') or ''
+            return {
+                'success': True,
+                'data': {
+                    'extractedText': extracted_text,
+                    'method': result.get('method', 'easyocr'),
+                    'confidence': result.get('confidence') or result.get('average_confidence'),
+                    'fallback_used': result.get('fallback_used', False),
+                    'details': result
+                }
+            }, 200
+        return error_body(result.get('error', 'Processing failed')), 500
+    # Plain text result
+    return {
+        'success': True,
+        'data': {
+            'extractedText': str(result),
+            'method': 'easyocr',
+            'fallback_used': False
+        }
+    }, 200
+
+
+def process_output_format(accept: Optional[str]) -> str:
+    """
+    Output format for a /api/process style body from the Accept header:
+    the default JSON, or the compact columnar form for
+    application/vnd.ocr.compact+json (or application/msgpack)
+    """
+    offered = offered_mimetypes()
+    mimetype = parse_accept_header(accept, MIMEAccept).best_match(offered, default=offered[0])
+    return format_for_mimetype(mimetype)
+
+
+def encode_compact_body(body: Dict, output_format: str) -> Tuple[bytes, str]:
+    """Encode a /api/process style body with its details in compact form"""
+    data = body.get('data')
+    if isinstance(data, dict) and 'details' in data:
+        body = dict(body, data=dict(data, details=compact_result(data['details'])))
+    return encode(body, output_format)
+
+
+def job_view(job: Dict) -> Dict:
+    """Public view of a job record (without the result payload)"""
+    return {
+        'id': job['id'],
+        'status': job['status'],
+        'files': job.get('files', []),
+        'progress': job['progress'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+        'expires_at': job['expires_at'],
+        'error': job['error']
+    }
+
+
+def job_links(job: Dict) -> Dict:
+    """202 body for a submitted job"""
+    return {
+        'success': True,
+        'job': job_view(job),
+        'status_url': f"/api/jobs/{job['id']}",
+        'result_url': f"/api/jobs/{job['id']}/result"
+    }
+
+
+def stream_uses_ndjson(accept: Optional[str]) -> bool:
+    """Whether a streaming client asked for NDJSON rather than Server-Sent Events"""
+    return parse_accept_header(accept, MIMEAccept).best_match(
+        ['text/event-stream', 'application/x-ndjson']) == 'application/x-ndjson'
+
+
+def sse_event(event: Dict) -> str:
+    """Encode an OCR event as a Server-Sent Event"""
+    return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+
+def ndjson_event(event: Dict) -> str:
+    """Encode an OCR event as one line of newline-delimited JSON"""
+    return json.dumps(event) + '\n'
+
+
+def run_once(func: Callable[[], None]) -> Callable[[], None]:
+    """
+    Wrap a cleanup so only its first call runs, for cleanups registered in
+    more than one place (e.g. a stream's end and its response's close)
+    """
+    lock = threading.Lock()
+    done = []
+
+    def wrapper():
+        with lock:
+            if done:
+                return
+            done.append(True)
+        func()
+    return wrapper
+
+
+def remove_files(paths: Sequence[str]):
+    for path in paths:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
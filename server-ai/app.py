@@ -3,13 +3,27 @@ Flask API for OCR Service
 Simple and direct API for the OCR functionality
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
 import os
 import tempfile
 from werkzeug.utils import secure_filename
-import json
-from ocr import process_file, batch_process
+import time
+from ocr import MODE_DETECT, iter_process_file, process_file
+from reader_pool import get_reader_pool
+from result_cache import get_result_cache
+from serialization import FORMAT_JSON
+from warmup import readiness, warm_up, warm_up_in_background
+from jobs import get_job_manager, QueueFullError, COMPLETED, FAILED
+from admission import AdmissionRejected, get_admission_controller
+from api_common import (MAX_CONTENT_LENGTH, SUPPORTED_LANGUAGES, admit, allowed_file, client_key,
+                        encode_compact_body, error_body, format_process_result, health_body, job_links,
+                        job_view, ndjson_event, parse_mode_options, parse_process_options, parse_rois,
+                        process_output_format, ready_body, release, remove_files, run_ocr, run_once,
+                        sse_event, stream_uses_ndjson)
+from metrics import (ADMISSION_INFLIGHT_PAGES, HTTP_SECONDS, JOB_QUEUE_DEPTH, READER_POOL_BYTES,
+                     collect_timings, render_metrics, rounded_timings, stage)
+import config
 import logging
 
 # Configure logging
@@ -23,151 +37,470 @@ CORS(app, resources={
     r"/api/*": {
         "origins": "*",  # Allow all origins - change to your frontend URL in production
         "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type"]
+        "allow_headers": ["Content-Type"],
+        # Let browser clients read when to retry a 429/503
+        "expose_headers": ["Retry-After"]
     }
 })
 
 # Configuration
-app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff', 'webp', 'pdf'}
+app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH  # 50MB max file size
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+# Warm the configured language sets so the first request skips model load.
+# Under gunicorn with preload_app this runs once in the master, before fork;
+# otherwise it runs in the background and /api/ready reports when it is done.
+if config.PREFORK_WARMUP:
+    warm_up(config.PRELOAD_LANGUAGES)
+else:
+    warm_up_in_background(config.PRELOAD_LANGUAGES)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    start = g.get('request_start')
+    if start is not None:
+        # Route templates (not raw paths) keep job ids out of the labels
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint,
+                             method=request.method, status=str(response.status_code))
+    return response
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Liveness endpoint; answers as soon as the app is up, models loaded or not"""
+    return jsonify(health_body(readiness()))
+
+@app.route('/api/ready', methods=['GET'])
+def ready_check():
+    """Readiness endpoint; 503 until this worker's readers are warm"""
+    body, status = ready_body(readiness())
+    return jsonify(body), status
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Reader pool and result cache statistics"""
+    cache = get_result_cache()
     return jsonify({
-        'status': 'healthy',
-        'service': 'OCR API',
-        'version': '1.0.0'
+        'success': True,
+        'readers': get_reader_pool().stats(),
+        'cache': cache.stats() if cache is not None else None,
+        'admission': get_admission_controller().stats() if config.ADMISSION_ENABLED else None
     })
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Stage timings, counters and histograms in Prometheus text format"""
+    READER_POOL_BYTES.set(get_reader_pool().stats()['resident_mb'] * 1024 * 1024)
+    JOB_QUEUE_DEPTH.set(get_job_manager().queue_depth())
+    if config.ADMISSION_ENABLED:
+        ADMISSION_INFLIGHT_PAGES.set(get_admission_controller().stats()['inflight_pages'])
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/languages', methods=['GET'])
 def get_languages():
     """Get supported languages"""
-    languages = {
-        'en': 'English',
-        'es': 'Spanish', 
-        'fr': 'French',
-        'de': 'German',
-        'it': 'Italian',
-        'pt': 'Portuguese',
-        'ru': 'Russian',
-        'ar': 'Arabic',
-        'zh': 'Chinese',
-        'ja': 'Japanese',
-        'ko': 'Korean',
-        'hi': 'Hindi'
-    }
     return jsonify({
         'success': True,
-        'languages': languages
+        'languages': SUPPORTED_LANGUAGES
     })
 
+def upload_size(file):
+    """Size in bytes of an uploaded file's stream"""
+    stream = file.stream
+    position = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(position)
+    return size
+
+def read_upload(file):
+    """
+    Return (source, temp_path) for an upload. Uploads up to
+    UPLOAD_SPILL_BYTES are read into memory and OCR'd from the buffer;
+    larger ones are written to a temporary file (temp_path is then set).
+    """
+    filename = secure_filename(file.filename)
+    if upload_size(file) <= config.UPLOAD_SPILL_BYTES:
+        return file.read(), None
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f"_{filename}")
+    file.save(temp_file.name)
+    return temp_file.name, temp_file.name
+
+def read_uploads(files):
+    """
+    Read allowed uploads. Returns (sources, filenames, temp_files), where
+    temp_files lists spilled uploads the caller must remove.
+    """
+    sources, filenames, temp_files = [], [], []
+    for file in files:
+        if file and allowed_file(file.filename):
+            source, temp_path = read_upload(file)
+            sources.append(source)
+            filenames.append(secure_filename(file.filename))
+            if temp_path:
+                temp_files.append(temp_path)
+    return sources, filenames, temp_files
+
+def admit_request(sources, filenames, dpi=config.DEFAULT_DPI, hold=True):
+    """
+    Return (ticket, error_response): admit the uploads' estimated cost, or
+    turn the request away at once with 413, 429 or 503 (with Retry-After).
+    Pass the ticket to release() when the work is done; `hold` is False
+    for queued jobs, which only draw on the client's rate limit.
+    """
+    try:
+        ticket = admit(sources, filenames, dpi, client_key(request.headers, request.remote_addr), hold)
+    except AdmissionRejected as e:
+        response = jsonify(error_body(str(e)))
+        if e.retry_after is not None:
+            response.headers['Retry-After'] = str(e.retry_after)
+        return None, (response, e.status)
+    return ticket, None
+
+def encode_process_response(body, status):
+    """
+    Encode a /api/process style body in the format the client accepts:
+    the default JSON, or with Accept: application/vnd.ocr.compact+json
+    (or application/msgpack) the compact columnar details
+    """
+    output_format = process_output_format(request.headers.get('Accept'))
+    if output_format == FORMAT_JSON:
+        return jsonify(body), status
+    encoded, mimetype = encode_compact_body(body, output_format)
+    return Response(encoded, status=status, mimetype=mimetype)
+
+def get_upload_files():
+    """Return (files, error_response) for the 'files' field of a multipart upload"""
+    if 'files' not in request.files:
+        return None, (jsonify({
+            'success': False,
+            'error': 'No files uploaded'
+        }), 400)
+
+    files = request.files.getlist('files')
+    if not files or files[0].filename == '':
+        return None, (jsonify({
+            'success': False,
+            'error': 'No files selected'
+        }), 400)
+    return files, None
+
+def get_process_options():
+    """
+    Return (languages, use_high_accuracy, dpi, error_response) for the
+    processing options shared by /api/process and /api/jobs
+    """
+    try:
+        languages, use_high_accuracy, dpi = parse_process_options(request.form)
+    except ValueError as e:
+        return None, None, None, (jsonify(error_body(str(e))), 400)
+    return languages, use_high_accuracy, dpi, None
+
+def get_rois():
+    """
+    Return (rois, error_response) for the optional 'rois' form field: a JSON
+    list of [x, y, width, height] (or {x, y, width, height}) image regions
+    """
+    try:
+        return parse_rois(request.form.get('rois')), None
+    except ValueError as e:
+        return None, (jsonify(error_body(str(e))), 400)
+
+def get_mode_options(file_count):
+    """
+    Return (mode, boxes, error_response) for the optional 'mode' form field
+    ('full', 'detect' or 'recognize') and 'boxes', the JSON result of an
+    earlier /api/detect (or /api/process) call on the same single file
+    """
+    try:
+        mode, boxes = parse_mode_options(request.form, file_count)
+    except ValueError as e:
+        return None, None, (jsonify(error_body(str(e))), 400)
+    return mode, boxes, None
+
 @app.route('/api/process', methods=['POST'])
 def process_files():
     """Main OCR processing endpoint"""
     try:
-        # Check if files are present
-        if 'files' not in request.files:
-            return jsonify({
-                'success': False,
-                'error': 'No files uploaded'
-            }), 400
+        with collect_timings() as timings:
+            with stage('upload'):
+                files, error_response = get_upload_files()
+            if error_response:
+                return error_response
 
-        files = request.files.getlist('files')
-        if not files or files[0].filename == '':
-            return jsonify({
-                'success': False,
-                'error': 'No files selected'
-            }), 400
+            # Get processing options
+            languages, use_high_accuracy, dpi, error_response = get_process_options()
+            if error_response:
+                return error_response
+            rois, error_response = get_rois()
+            if error_response:
+                return error_response
+            mode, boxes, error_response = get_mode_options(len(files))
+            if error_response:
+                return error_response
+            confidence_threshold = float(request.form.get('confidenceThreshold', '0.7'))
+            include_timings = request.form.get('timings', 'false').lower() == 'true'
+
+            # Process files
+            temp_files = []
+            try:
+                # Read uploads (large ones are spilled to temporary files)
+                with stage('upload'):
+                    sources, filenames, temp_files = read_uploads(files)
+
+                if not sources:
+                    return jsonify({
+                        'success': False,
+                        'error': 'No valid files to process'
+                    }), 400
+
+                ticket, error_response = admit_request(sources, filenames, dpi)
+                if error_response:
+                    return error_response
+
+                # Process with OCR
+                try:
+                    result = run_ocr(sources, filenames, languages, use_high_accuracy, dpi, rois=rois,
+                                     mode=mode, boxes=boxes)
+                finally:
+                    release(ticket)
+
+                # Format response
+                body, status = format_process_result(result)
+                if include_timings and body['success']:
+                    body['data']['timings'] = rounded_timings(timings)
+                with stage('serialize'):
+                    return encode_process_response(body, status)
+
+            finally:
+                # Clean up temporary files
+                remove_files(temp_files)
+
+    except Exception as e:
+        logger.error(f"OCR processing error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Processing failed: {str(e)}'
+        }), 500
+
+@app.route('/api/detect', methods=['POST'])
+def detect_text():
+    """
+    Text boxes only, without recognition (for redaction and layout).
+    Pass a result back to /api/process with mode=recognize as 'boxes' to
+    read the text later, in any language, without detecting again.
+    """
+    try:
+        files, error_response = get_upload_files()
+        if error_response:
+            return error_response
+        languages, _, dpi, error_response = get_process_options()
+        if error_response:
+            return error_response
+        rois, error_response = get_rois()
+        if error_response:
+            return error_response
 
-        # Get processing options
-        languages = json.loads(request.form.get('languages', '["en"]'))
-        use_high_accuracy = request.form.get('useHighAccuracy', 'true').lower() == 'true'
-        confidence_threshold = float(request.form.get('confidenceThreshold', '0.7'))
-        
-        # Process files
         temp_files = []
         try:
-            # Save uploaded files temporarily
-            for file in files:
-                if file and allowed_file(file.filename):
-                    filename = secure_filename(file.filename)
-                    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f"_{filename}")
-                    file.save(temp_file.name)
-                    temp_files.append(temp_file.name)
-
-            if not temp_files:
+            sources, filenames, temp_files = read_uploads(files)
+            if not sources:
                 return jsonify({
                     'success': False,
                     'error': 'No valid files to process'
                 }), 400
 
-            # Process with OCR
-            if len(temp_files) == 1:
-                # Single file processing
-                result = process_file(
-                    temp_files[0],
-                    languages=languages,
-                    detail=True,
-                    use_fallback=use_high_accuracy
-                )
-            else:
-                # Batch processing
-                result = batch_process(
-                    temp_files,
-                    languages=languages,
-                    detail=True,
-                    use_fallback=use_high_accuracy
-                )
-
-            # Format response
-            if isinstance(result, dict):
-                if result.get('status') == 'success':
-                    extracted_text = result.get('text') or result.get('full_text') or ''
-                    return jsonify({
-                        'success': True,
-                        'data': {
-                            'extractedText': extracted_text,
-                            'method': result.get('method', 'easyocr'),
-                            'confidence': result.get('confidence') or result.get('average_confidence'),
-                            'fallback_used': result.get('fallback_used', False),
-                            'details': result
-                        }
-                    })
-                else:
-                    return jsonify({
-                        'success': False,
-                        'error': result.get('error', 'Processing failed')
-                    }), 500
-            else:
-                # Plain text result
+            ticket, error_response = admit_request(sources, filenames, dpi)
+            if error_response:
+                return error_response
+            try:
+                result = run_ocr(sources, filenames, languages, False, dpi, rois=rois, mode=MODE_DETECT)
+            finally:
+                release(ticket)
+            if result.get('status') == 'error':
                 return jsonify({
-                    'success': True,
-                    'data': {
-                        'extractedText': str(result),
-                        'method': 'easyocr',
-                        'fallback_used': False
-                    }
-                })
-
+                    'success': False,
+                    'error': result.get('error', 'Detection failed')
+                }), 500
+            return jsonify({
+                'success': True,
+                'data': result
+            })
         finally:
-            # Clean up temporary files
-            for temp_file in temp_files:
-                try:
-                    os.unlink(temp_file)
-                except OSError:
-                    pass
+            remove_files(temp_files)
 
     except Exception as e:
-        logger.error(f"OCR processing error: {str(e)}")
+        logger.error(f"Detection error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Detection failed: {str(e)}'
+        }), 500
+
+@app.route('/api/process/stream', methods=['POST'])
+def process_files_stream():
+    """
+    Stream OCR results page by page. Emits 'start', 'page' and 'summary'
+    events per file, then a final 'done' event. Sent as Server-Sent Events,
+    or as NDJSON when the client accepts application/x-ndjson.
+    """
+    try:
+        files, error_response = get_upload_files()
+        if error_response:
+            return error_response
+
+        languages, use_high_accuracy, dpi, error_response = get_process_options()
+        if error_response:
+            return error_response
+        rois, error_response = get_rois()
+        if error_response:
+            return error_response
+        sources, filenames, temp_files = read_uploads(files)
+        if not sources:
+            return jsonify({
+                'success': False,
+                'error': 'No valid files to process'
+            }), 400
+        ticket, error_response = admit_request(sources, filenames, dpi)
+        if error_response:
+            remove_files(temp_files)
+            return error_response
+    except Exception as e:
+        logger.error(f"OCR streaming error: {str(e)}")
         return jsonify({
             'success': False,
             'error': f'Processing failed: {str(e)}'
         }), 500
 
+    use_ndjson = stream_uses_ndjson(request.headers.get('Accept'))
+    encode = ndjson_event if use_ndjson else sse_event
+
+    @run_once
+    def cleanup():
+        release(ticket)
+        remove_files(temp_files)
+
+    def generate():
+        failed = 0
+        try:
+            for source, filename in zip(sources, filenames):
+                for event in iter_process_file(source, languages, dpi, filename=filename, rois=rois,
+                                               use_fallback=use_high_accuracy):
+                    if event['event'] == 'error':
+                        failed += 1
+                    yield encode(event)
+            yield encode({'event': 'done', 'total_files': len(sources), 'failed': failed})
+        finally:
+            # Frees the budget as soon as the stream ends
+            cleanup()
+
+    response = Response(generate(),
+                        mimetype='application/x-ndjson' if use_ndjson else 'text/event-stream')
+    # A generator closed before its first chunk (client gone before the
+    # stream started) never runs its finally; the response close always runs
+    response.call_on_close(cleanup)
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop reverse proxies (e.g. nginx) from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Queue files for background OCR and return a job id immediately"""
+    try:
+        files, error_response = get_upload_files()
+        if error_response:
+            return error_response
+
+        languages, use_high_accuracy, dpi, error_response = get_process_options()
+        if error_response:
+            return error_response
+        rois, error_response = get_rois()
+        if error_response:
+            return error_response
+        mode, boxes, error_response = get_mode_options(len(files))
+        if error_response:
+            return error_response
+        sources, filenames, temp_files = read_uploads(files)
+        if not sources:
+            return jsonify({
+                'success': False,
+                'error': 'No valid files to process'
+            }), 400
+        # The job queue bounds concurrent work; jobs only count against the client's rate
+        _, error_response = admit_request(sources, filenames, dpi, hold=False)
+        if error_response:
+            remove_files(temp_files)
+            return error_response
+
+        def run(progress):
+            return format_process_result(run_ocr(sources, filenames, languages, use_high_accuracy, dpi,
+                                                 progress, rois=rois, mode=mode, boxes=boxes))
+
+        try:
+            job = get_job_manager().submit(
+                run,
+                on_finish=lambda: remove_files(temp_files),
+                files=filenames
+            )
+        except QueueFullError:
+            remove_files(temp_files)
+            response = jsonify({
+                'success': False,
+                'error': 'Too many queued jobs, please retry later'
+            })
+            response.headers['Retry-After'] = str(config.JOB_RETRY_AFTER)
+            return response, 429
+
+        return jsonify(job_links(job)), 202
+
+    except Exception as e:
+        logger.error(f"Job submission error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Job submission failed: {str(e)}'
+        }), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Job status and per-page progress"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found or expired'
+        }), 404
+    return jsonify({
+        'success': True,
+        'job': job_view(job)
+    })
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Fetch a finished job's output, shaped like the /api/process response"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found or expired'
+        }), 404
+    if job['status'] == FAILED:
+        return jsonify({
+            'success': False,
+            'error': f"Processing failed: {job['error']}"
+        }), 500
+    if job['status'] != COMPLETED:
+        return jsonify({
+            'success': False,
+            'status': job['status'],
+            'progress': job['progress'],
+            'error': 'Job has not finished yet'
+        }), 202
+    body, status = job['result']
+    return encode_process_response(body, status)
+
 @app.route('/api/quick', methods=['POST'])
 def quick_extract():
     """Quick text extraction endpoint"""
@@ -194,19 +527,26 @@ def quick_extract():
         # Get options
         languages = request.form.get('languages', 'en').split(',')
         
-        # Save file temporarily
+        # Read the upload (large files are spilled to a temporary file)
         filename = secure_filename(file.filename)
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f"_{filename}")
-        file.save(temp_file.name)
+        source, temp_path = read_upload(file)
 
         try:
+            ticket, error_response = admit_request([source], [filename])
+            if error_response:
+                return error_response
+
             # Quick processing
-            result = process_file(
-                temp_file.name,
-                languages=languages,
-                detail=False,
-                use_fallback=False
-            )
+            try:
+                result = process_file(
+                    source,
+                    languages=languages,
+                    detail=False,
+                    use_fallback=False,
+                    filename=filename
+                )
+            finally:
+                release(ticket)
 
             return jsonify({
                 'success': True,
@@ -215,10 +555,8 @@ def quick_extract():
 
         finally:
             # Clean up
-            try:
-                os.unlink(temp_file.name)
-            except OSError:
-                pass
+            if temp_path:
+                remove_files([temp_path])
 
     except Exception as e:
         logger.error(f"Quick extract error: {str(e)}")
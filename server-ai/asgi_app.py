@@ -0,0 +1,562 @@
+"""
+ASGI API for OCR Service
+Serves the same routes and response bodies as app.py on Starlette. Uploads
+are received without blocking the event loop and OCR runs on a bounded
+executor, so health checks, job polling and other light requests stay
+responsive while OCR keeps every executor thread busy.
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+
+Under gunicorn (preloaded, warm readers shared by forked workers):
+
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn -c gunicorn.conf.py asgi_app:app
+"""
+import asyncio
+import contextvars
+import functools
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple, Union
+import logging
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.types import Receive
+from werkzeug.utils import secure_filename
+
+import config
+from admission import AdmissionRejected, get_admission_controller
+from api_common import (MAX_CONTENT_LENGTH, SUPPORTED_LANGUAGES, admit, allowed_file, client_key,
+                        encode_compact_body, error_body, format_process_result, health_body, job_links,
+                        job_view, ndjson_event, parse_mode_options, parse_process_options, parse_rois,
+                        process_output_format, ready_body, release, remove_files, run_ocr, run_once,
+                        sse_event, stream_uses_ndjson)
+from jobs import COMPLETED, FAILED, QueueFullError, get_job_manager
+from metrics import (ADMISSION_INFLIGHT_PAGES, HTTP_SECONDS, JOB_QUEUE_DEPTH, READER_POOL_BYTES,
+                     collect_timings, render_metrics, rounded_timings, stage)
+from ocr import MODE_DETECT, iter_process_file, process_file
+from reader_pool import get_reader_pool
+from result_cache import get_result_cache
+from serialization import FORMAT_JSON
+from warmup import readiness, warm_up, warm_up_in_background
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Warm the configured language sets so the first request skips model load
+# (before fork under gunicorn's preload_app, as in app.py)
+if config.PREFORK_WARMUP:
+    warm_up(config.PRELOAD_LANGUAGES)
+else:
+    warm_up_in_background(config.PRELOAD_LANGUAGES)
+
+# OCR calls run at once by this process. Threads share the warm readers and
+# caches; torch and OpenCV release the GIL, and multi-page PDFs still fan
+# out to OCR_WORKERS processes.
+_executor = ThreadPoolExecutor(max_workers=max(1, config.ASGI_OCR_THREADS),
+                               thread_name_prefix='ocr-asgi')
+
+_STREAM_END = object()
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that runs a cleanup once it is done, however it ends.
+    A generator that never started (client gone before the first chunk)
+    skips its finally, and Starlette skips background tasks on disconnect.
+    """
+
+    def __init__(self, content, cleanup, **kwargs):
+        super().__init__(content, **kwargs)
+        self.cleanup = cleanup
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.cleanup()
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Run blocking OCR work on the bounded executor, keeping the request's
+    context (e.g. the stage timings being collected)
+    """
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        _executor, functools.partial(context.run, func, *args, **kwargs))
+
+
+def json_error(message: str, status: int, headers: Optional[dict] = None) -> JSONResponse:
+    return JSONResponse(error_body(message), status_code=status, headers=headers)
+
+
+class BodyTooLarge(Exception):
+    """Raised when a request body grows past MAX_CONTENT_LENGTH"""
+
+
+def limit_body(receive: Receive, limit: int) -> Receive:
+    """
+    Wrap an ASGI receive channel to raise BodyTooLarge once more than
+    `limit` body bytes have arrived, whatever Content-Length claimed
+    (chunked uploads have none)
+    """
+    received = 0
+
+    async def limited_receive():
+        nonlocal received
+        message = await receive()
+        if message['type'] == 'http.request':
+            received += len(message.get('body', b''))
+            if received > limit:
+                raise BodyTooLarge()
+        return message
+    return limited_receive
+
+
+async def read_form(request: Request):
+    """
+    Return (form, error_response). The multipart body is parsed as it
+    arrives; file parts are spooled to disk past a small size. Bodies over
+    MAX_CONTENT_LENGTH get 413, like Flask's limit in app.py: at once when
+    Content-Length says so, otherwise as soon as the bytes received pass it.
+    """
+    length = request.headers.get('content-length')
+    if length is not None and length.isdigit() and int(length) > MAX_CONTENT_LENGTH:
+        return None, json_error('File too large. Maximum size is 50MB.', 413)
+    limited = Request(request.scope, limit_body(request.receive, MAX_CONTENT_LENGTH))
+    try:
+        return await limited.form(), None
+    except BodyTooLarge:
+        return None, json_error('File too large. Maximum size is 50MB.', 413)
+
+
+def upload_files(form, field: str = 'files') -> Tuple[Optional[List[UploadFile]], Optional[Response]]:
+    """Return (files, error_response) for a file field of a multipart upload"""
+    files = [value for value in form.getlist(field) if isinstance(value, UploadFile)]
+    if not files:
+        return None, json_error('No files uploaded' if field == 'files' else 'No file uploaded', 400)
+    if not files[0].filename:
+        return None, json_error('No files selected' if field == 'files' else 'No file selected', 400)
+    return files, None
+
+
+def _spill(upload: UploadFile, filename: str) -> str:
+    upload.file.seek(0)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=f"_{filename}") as temp_file:
+        shutil.copyfileobj(upload.file, temp_file)
+    return temp_file.name
+
+
+async def read_upload(upload: UploadFile) -> Tuple[Union[bytes, str], Optional[str]]:
+    """
+    Return (source, temp_path) for an upload, like app.read_upload: bytes up
+    to UPLOAD_SPILL_BYTES, otherwise a temporary file (temp_path is then set)
+    """
+    if upload.size is not None and upload.size <= config.UPLOAD_SPILL_BYTES:
+        return await upload.read(), None
+    path = await run_in_threadpool(_spill, upload, secure_filename(upload.filename))
+    return path, path
+
+
+async def read_uploads(files: List[UploadFile]) -> Tuple[List, List[str], List[str]]:
+    """
+    Read allowed uploads. Returns (sources, filenames, temp_files), where
+    temp_files lists spilled uploads the caller must remove.
+    """
+    sources, filenames, temp_files = [], [], []
+    for upload in files:
+        if upload.filename and allowed_file(upload.filename):
+            source, temp_path = await read_upload(upload)
+            sources.append(source)
+            filenames.append(secure_filename(upload.filename))
+            if temp_path:
+                temp_files.append(temp_path)
+    return sources, filenames, temp_files
+
+
+async def admit_request(request: Request, sources, filenames, dpi=config.DEFAULT_DPI, hold=True):
+    """Return (ticket, error_response); see app.admit_request"""
+    client = client_key(request.headers, request.client.host if request.client else None)
+    try:
+        # Cost estimates read file headers (and run pdfinfo)
+        ticket = await run_in_threadpool(admit, sources, filenames, dpi, client, hold)
+    except AdmissionRejected as e:
+        headers = {'Retry-After': str(e.retry_after)} if e.retry_after is not None else None
+        return None, json_error(str(e), e.status, headers)
+    return ticket, None
+
+
+def encode_process_response(request: Request, body: dict, status: int) -> Response:
+    """Encode a /api/process style body in the format the client accepts (see app.py)"""
+    output_format = process_output_format(request.headers.get('accept'))
+    if output_format == FORMAT_JSON:
+        return JSONResponse(body, status_code=status)
+    encoded, mimetype = encode_compact_body(body, output_format)
+    return Response(encoded, status_code=status, media_type=mimetype)
+
+
+async def health_check(request: Request) -> Response:
+    """Liveness endpoint; answers as soon as the app is up, models loaded or not"""
+    return JSONResponse(health_body(readiness()))
+
+
+async def ready_check(request: Request) -> Response:
+    """Readiness endpoint; 503 until this worker's readers are warm"""
+    body, status = ready_body(readiness())
+    return JSONResponse(body, status_code=status)
+
+
+async def get_stats(request: Request) -> Response:
+    """Reader pool and result cache statistics"""
+    cache = get_result_cache()
+    return JSONResponse({
+        'success': True,
+        'readers': get_reader_pool().stats(),
+        'cache': cache.stats() if cache is not None else None,
+        'admission': get_admission_controller().stats() if config.ADMISSION_ENABLED else None
+    })
+
+
+async def get_metrics(request: Request) -> Response:
+    """Stage timings, counters and histograms in Prometheus text format"""
+    READER_POOL_BYTES.set(get_reader_pool().stats()['resident_mb'] * 1024 * 1024)
+    JOB_QUEUE_DEPTH.set(get_job_manager().queue_depth())
+    if config.ADMISSION_ENABLED:
+        ADMISSION_INFLIGHT_PAGES.set(get_admission_controller().stats()['inflight_pages'])
+    return Response(render_metrics(), media_type='text/plain; version=0.0.4')
+
+
+async def get_languages(request: Request) -> Response:
+    """Get supported languages"""
+    return JSONResponse({
+        'success': True,
+        'languages': SUPPORTED_LANGUAGES
+    })
+
+
+async def process_files(request: Request) -> Response:
+    """Main OCR processing endpoint"""
+    try:
+        with collect_timings() as timings:
+            with stage('upload'):
+                form, error_response = await read_form(request)
+            if error_response:
+                return error_response
+            files, error_response = upload_files(form)
+            if error_response:
+                return error_response
+
+            try:
+                languages, use_high_accuracy, dpi = parse_process_options(form)
+                rois = parse_rois(form.get('rois'))
+                mode, boxes = parse_mode_options(form, len(files))
+            except ValueError as e:
+                return json_error(str(e), 400)
+            include_timings = form.get('timings', 'false').lower() == 'true'
+
+            temp_files = []
+            try:
+                with stage('upload'):
+                    sources, filenames, temp_files = await read_uploads(files)
+                if not sources:
+                    return json_error('No valid files to process', 400)
+
+                ticket, error_response = await admit_request(request, sources, filenames, dpi)
+                if error_response:
+                    return error_response
+                try:
+                    result = await run_blocking(run_ocr, sources, filenames, languages, use_high_accuracy,
+                                                dpi, rois=rois, mode=mode, boxes=boxes)
+                finally:
+                    release(ticket)
+
+                body, status = format_process_result(result)
+                if include_timings and body['success']:
+                    body['data']['timings'] = rounded_timings(timings)
+                with stage('serialize'):
+                    return encode_process_response(request, body, status)
+            finally:
+                remove_files(temp_files)
+    except Exception as e:
+        logger.error(f"OCR processing error: {str(e)}")
+        return json_error(f'Processing failed: {str(e)}', 500)
+
+
+async def detect_text(request: Request) -> Response:
+    """Text boxes only, without recognition (see app.detect_text)"""
+    try:
+        form, error_response = await read_form(request)
+        if error_response:
+            return error_response
+        files, error_response = upload_files(form)
+        if error_response:
+            return error_response
+        try:
+            languages, _, dpi = parse_process_options(form)
+            rois = parse_rois(form.get('rois'))
+        except ValueError as e:
+            return json_error(str(e), 400)
+
+        temp_files = []
+        try:
+            sources, filenames, temp_files = await read_uploads(files)
+            if not sources:
+                return json_error('No valid files to process', 400)
+            ticket, error_response = await admit_request(request, sources, filenames, dpi)
+            if error_response:
+                return error_response
+            try:
+                result = await run_blocking(run_ocr, sources, filenames, languages, False, dpi, rois=rois,
+                                            mode=MODE_DETECT)
+            finally:
+                release(ticket)
+            if result.get('status') == 'error':
+                return json_error(result.get('error', 'Detection failed'), 500)
+            return JSONResponse({
+                'success': True,
+                'data': result
+            })
+        finally:
+            remove_files(temp_files)
+    except Exception as e:
+        logger.error(f"Detection error: {str(e)}")
+        return json_error(f'Detection failed: {str(e)}', 500)
+
+
+async def process_files_stream(request: Request) -> Response:
+    """
+    Stream OCR results page by page, as Server-Sent Events or NDJSON (see
+    app.process_files_stream). Each page is produced on the executor.
+    """
+    try:
+        form, error_response = await read_form(request)
+        if error_response:
+            return error_response
+        files, error_response = upload_files(form)
+        if error_response:
+            return error_response
+        try:
+            languages, use_high_accuracy, dpi = parse_process_options(form)
+            rois = parse_rois(form.get('rois'))
+        except ValueError as e:
+            return json_error(str(e), 400)
+        sources, filenames, temp_files = await read_uploads(files)
+        if not sources:
+            return json_error('No valid files to process', 400)
+        ticket, error_response = await admit_request(request, sources, filenames, dpi)
+        if error_response:
+            remove_files(temp_files)
+            return error_response
+    except Exception as e:
+        logger.error(f"OCR streaming error: {str(e)}")
+        return json_error(f'Processing failed: {str(e)}', 500)
+
+    use_ndjson = stream_uses_ndjson(request.headers.get('accept'))
+    encode = ndjson_event if use_ndjson else sse_event
+
+    @run_once
+    def cleanup():
+        release(ticket)
+        remove_files(temp_files)
+
+    async def generate():
+        failed = 0
+        try:
+            for source, filename in zip(sources, filenames):
+                events = iter_process_file(source, languages, dpi, filename=filename, rois=rois,
+                                           use_fallback=use_high_accuracy)
+                while True:
+                    event = await run_blocking(next, events, _STREAM_END)
+                    if event is _STREAM_END:
+                        break
+                    if event['event'] == 'error':
+                        failed += 1
+                    yield encode(event)
+            yield encode({'event': 'done', 'total_files': len(sources), 'failed': failed})
+        finally:
+            # Frees the budget as soon as the stream ends
+            cleanup()
+
+    return ClosingStreamingResponse(generate(), cleanup,
+                                    media_type='application/x-ndjson' if use_ndjson else 'text/event-stream',
+                                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+async def submit_job(request: Request) -> Response:
+    """Queue files for background OCR and return a job id immediately"""
+    try:
+        form, error_response = await read_form(request)
+        if error_response:
+            return error_response
+        files, error_response = upload_files(form)
+        if error_response:
+            return error_response
+        try:
+            languages, use_high_accuracy, dpi = parse_process_options(form)
+            rois = parse_rois(form.get('rois'))
+            mode, boxes = parse_mode_options(form, len(files))
+        except ValueError as e:
+            return json_error(str(e), 400)
+        sources, filenames, temp_files = await read_uploads(files)
+        if not sources:
+            return json_error('No valid files to process', 400)
+        # The job queue bounds concurrent work; jobs only count against the client's rate
+        _, error_response = await admit_request(request, sources, filenames, dpi, hold=False)
+        if error_response:
+            remove_files(temp_files)
+            return error_response
+
+        def run(progress):
+            return format_process_result(run_ocr(sources, filenames, languages, use_high_accuracy, dpi,
+                                                 progress, rois=rois, mode=mode, boxes=boxes))
+
+        try:
+            job = get_job_manager().submit(
+                run,
+                on_finish=lambda: remove_files(temp_files),
+                files=filenames
+            )
+        except QueueFullError:
+            remove_files(temp_files)
+            return json_error('Too many queued jobs, please retry later', 429,
+                              {'Retry-After': str(config.JOB_RETRY_AFTER)})
+        return JSONResponse(job_links(job), status_code=202)
+    except Exception as e:
+        logger.error(f"Job submission error: {str(e)}")
+        return json_error(f'Job submission failed: {str(e)}', 500)
+
+
+async def get_job(request: Request) -> Response:
+    """Job status and per-page progress"""
+    job = get_job_manager().get(request.path_params['job_id'])
+    if job is None:
+        return json_error('Job not found or expired', 404)
+    return JSONResponse({
+        'success': True,
+        'job': job_view(job)
+    })
+
+
+async def get_job_result(request: Request) -> Response:
+    """Fetch a finished job's output, shaped like the /api/process response"""
+    job = get_job_manager().get(request.path_params['job_id'])
+    if job is None:
+        return json_error('Job not found or expired', 404)
+    if job['status'] == FAILED:
+        return json_error(f"Processing failed: {job['error']}", 500)
+    if job['status'] != COMPLETED:
+        return JSONResponse({
+            'success': False,
+            'status': job['status'],
+            'progress': job['progress'],
+            'error': 'Job has not finished yet'
+        }, status_code=202)
+    body, status = job['result']
+    return encode_process_response(request, body, status)
+
+
+async def quick_extract(request: Request) -> Response:
+    """Quick text extraction endpoint"""
+    try:
+        form, error_response = await read_form(request)
+        if error_response:
+            return error_response
+        files, error_response = upload_files(form, 'file')
+        if error_response:
+            return error_response
+        upload = files[0]
+        if not allowed_file(upload.filename):
+            return json_error('Invalid file type', 400)
+
+        languages = form.get('languages', 'en').split(',')
+        filename = secure_filename(upload.filename)
+        source, temp_path = await read_upload(upload)
+        try:
+            ticket, error_response = await admit_request(request, [source], [filename])
+            if error_response:
+                return error_response
+            try:
+                result = await run_blocking(process_file, source, languages=languages, detail=False,
+                                            use_fallback=False, filename=filename)
+            finally:
+                release(ticket)
+            return JSONResponse({
+                'success': True,
+                'text': str(result)
+            })
+        finally:
+            if temp_path:
+                remove_files([temp_path])
+    except Exception as e:
+        logger.error(f"Quick extract error: {str(e)}")
+        return json_error(f'Extraction failed: {str(e)}', 500)
+
+
+async def not_found(request: Request, exc: Exception) -> Response:
+    return json_error('Endpoint not found', 404)
+
+
+async def server_error(request: Request, exc: Exception) -> Response:
+    return json_error('Internal server error', 500)
+
+
+class RequestTimer:
+    """
+    ASGI middleware recording ocr_http_request_seconds by route template
+    (time to the response headers, as app.py's request hooks do)
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+
+        async def timed_send(message):
+            if message['type'] == 'http.response.start':
+                route = scope.get('route')
+                endpoint = route.path if route is not None else 'unmatched'
+                HTTP_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint,
+                                     method=scope['method'], status=str(message['status']))
+            await send(message)
+
+        await self.app(scope, receive, timed_send)
+
+
+routes = [
+    Route('/api/health', health_check, methods=['GET']),
+    Route('/api/ready', ready_check, methods=['GET']),
+    Route('/api/stats', get_stats, methods=['GET']),
+    Route('/api/metrics', get_metrics, methods=['GET']),
+    Route('/api/languages', get_languages, methods=['GET']),
+    Route('/api/process', process_files, methods=['POST']),
+    Route('/api/detect', detect_text, methods=['POST']),
+    Route('/api/process/stream', process_files_stream, methods=['POST']),
+    Route('/api/jobs', submit_job, methods=['POST']),
+    Route('/api/jobs/{job_id}', get_job, methods=['GET']),
+    Route('/api/jobs/{job_id}/result', get_job_result, methods=['GET']),
+    Route('/api/quick', quick_extract, methods=['POST']),
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[
+        Middleware(RequestTimer),
+        # Same policy as app.py: all origins, Retry-After readable by browsers
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['GET', 'POST', 'OPTIONS'],
+                   allow_headers=['Content-Type'], expose_headers=['Retry-After'])
+    ],
+    exception_handlers={404: not_found, 500: server_error}
+)
@@ -0,0 +1,241 @@
+"""
+Micro-batched recognition
+Coalesces images from concurrent requests into one batched detector pass,
+followed by one recognizer pass over the boxes of every image
+"""
+import bisect
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+import config
+from inference import inference_mode
+from metrics import stage
+from preprocessing import to_grey, to_rgb
+from reader_pool import LanguageKey, get_reader_pool, normalize_languages
+
+logger = logging.getLogger(__name__)
+
+# Blank rows between images stacked for recognition, so a slanted box
+# reaching past its image's edge reads blank pixels, as it would alone
+STACK_GAP = 64
+
+
+def pad_to_shape(img: np.ndarray, height: int, width: int) -> np.ndarray:
+    """
+    Pad an image on the right and bottom with white up to (height, width).
+    Padding only extends the canvas, so boxes keep their original coordinates.
+    """
+    pad_h = height - img.shape[0]
+    pad_w = width - img.shape[1]
+    if pad_h == 0 and pad_w == 0:
+        return img
+    pad = ((0, pad_h), (0, pad_w)) + ((0, 0),) * (img.ndim - 2)
+    return np.pad(img, pad, mode='constant', constant_values=255)
+
+
+def group_by_size(images: List[np.ndarray], max_pad_ratio: float) -> List[List[int]]:
+    """
+    Group image indices so that padding every image in a group to the
+    group's largest height and width costs at most `max_pad_ratio` times
+    its own area. Keeps one large photo from inflating a batch of small ones.
+    """
+    order = sorted(range(len(images)), key=lambda i: images[i].shape[0] * images[i].shape[1])
+    groups: List[List[int]] = []
+    for index in order:
+        h, w = images[index].shape[:2]
+        if groups:
+            group = groups[-1]
+            max_h = max(h, max(images[i].shape[0] for i in group))
+            max_w = max(w, max(images[i].shape[1] for i in group))
+            smallest = images[group[0]].shape[0] * images[group[0]].shape[1]
+            if max_h * max_w <= max_pad_ratio * max(1, smallest):
+                group.append(index)
+                continue
+        groups.append([index])
+    return groups
+
+
+def stack_for_recognition(images: List[np.ndarray], horizontal_lists: List[List],
+                           free_lists: List[List]) -> Tuple[np.ndarray, List, List, List[int]]:
+    """
+    Stack grey images top to bottom (STACK_GAP blank rows apart) into one
+    canvas, with every image's boxes moved into its band, so that a single
+    recognizer call covers the boxes of all of them. Horizontal boxes are
+    clipped to their own image first, as EasyOCR clips them to the image
+    it is given.
+
+    Returns:
+        (canvas, horizontal_list, free_list, top row of each image's band)
+    """
+    width = max(img.shape[1] for img in images)
+    offsets, top = [], 0
+    for img in images:
+        offsets.append(top)
+        top += img.shape[0] + STACK_GAP
+    canvas = np.zeros((top, width), dtype=np.uint8)
+    horizontal_list, free_list = [], []
+    for img, offset, horizontals, frees in zip(images, offsets, horizontal_lists, free_lists):
+        h, w = img.shape[:2]
+        canvas[offset:offset + h, :w] = img
+        for x0, x1, y0, y1 in horizontals:
+            horizontal_list.append([max(0, x0), min(x1, w), max(0, y0) + offset, min(y1, h) + offset])
+        for box in frees:
+            free_list.append([[x, y + offset] for x, y in box])
+    return canvas, horizontal_list, free_list, offsets
+
+
+def split_stacked_results(results: List, offsets: List[int]) -> List[List]:
+    """
+    Give each stacked image (see stack_for_recognition) the results whose
+    box starts in its band, moved back to its own coordinates. EasyOCR may
+    reorder and drop crops, so results are matched by position, not order.
+    """
+    split: List[List] = [[] for _ in offsets]
+    for bbox, text, confidence in results:
+        top = min(point[1] for point in bbox)
+        index = max(0, bisect.bisect_right(offsets, top) - 1)
+        offset = offsets[index]
+        split[index].append(([[x, y - offset] for x, y in bbox], text, confidence))
+    return split
+
+
+class RecognitionBatcher:
+    """
+    Collects images for one language set and runs them together.
+
+    The first queued image opens a window of `window_ms`; everything that
+    arrives before it closes (up to `max_batch` images) is recognized in
+    one pass. Each caller waits on its own Future, so added latency is
+    bounded by the window plus the batch's inference time.
+    """
+
+    def __init__(self, languages: LanguageKey, window_ms: Optional[float] = None,
+                 max_batch: Optional[int] = None, max_pad_ratio: Optional[float] = None):
+        # Defaults are read when the batcher starts, not when this module loads
+        if window_ms is None:
+            window_ms = config.RECOGNITION_BATCH_WINDOW_MS
+        if max_batch is None:
+            max_batch = config.RECOGNITION_BATCH_MAX_IMAGES
+        if max_pad_ratio is None:
+            max_pad_ratio = config.RECOGNITION_BATCH_MAX_PAD_RATIO
+        self.languages = languages
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.max_pad_ratio = max_pad_ratio
+        self._queue: 'queue.Queue[Tuple[np.ndarray, Optional[int], Future]]' = queue.Queue()
+        self.batches = 0
+        self.images = 0
+        thread = threading.Thread(target=self._run, name=f"ocr-batcher-{'+'.join(languages)}",
+                                  daemon=True)
+        thread.start()
+
+    def submit(self, img: np.ndarray, canvas_size: Optional[int] = None) -> Future:
+        """
+        Queue an RGB, RGBA or grey image array; the Future resolves to
+        readtext-style results. Images are only batched with others
+        detected on the same `canvas_size` (default: EasyOCR's).
+        """
+        future: Future = Future()
+        self._queue.put((img, canvas_size, future))
+        return future
+
+    def _collect(self) -> List[Tuple[np.ndarray, Optional[int], Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                reader = get_reader_pool().get(self.languages)
+                by_canvas: Dict[Optional[int], List[Tuple[np.ndarray, Optional[int], Future]]] = {}
+                for item in batch:
+                    by_canvas.setdefault(item[1], []).append(item)
+                for canvas_size, items in by_canvas.items():
+                    images = [img for img, _, _ in items]
+                    for group in group_by_size(images, self.max_pad_ratio):
+                        self._recognize_group(reader, [items[i] for i in group], canvas_size)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _recognize_group(self, reader, group: List[Tuple[np.ndarray, Optional[int], Future]],
+                         canvas_size: Optional[int] = None):
+        # What readtext_batched does, without EasyOCR's array conventions: it
+        # takes 3-D stacks as single images and 3-channel arrays as BGR. The
+        # detector gets an RGB stack, the recognizer the images in grey (as
+        # ocr.readtext_array), stacked so their boxes share one call.
+        self.batches += 1
+        self.images += len(group)
+        try:
+            images = [to_rgb(img) for img, _, _ in group]
+            height = max(img.shape[0] for img in images)
+            width = max(img.shape[1] for img in images)
+            stacked = np.stack([pad_to_shape(img, height, width) for img in images])
+            detect_options = {'canvas_size': canvas_size} if canvas_size else {}
+            with inference_mode():
+                with stage('detect'):
+                    horizontal_lists, free_lists = reader.detect(stacked, reformat=False, **detect_options)
+                canvas, horizontal_list, free_list, offsets = stack_for_recognition(
+                    [to_grey(img) for img, _, _ in group], horizontal_lists, free_lists)
+                recognized = []
+                if horizontal_list or free_list:
+                    with stage('recognize'):
+                        recognized = reader.recognize(canvas, horizontal_list, free_list, reformat=False,
+                                                      batch_size=config.RECOGNITION_BATCH_SIZE)
+            results = split_stacked_results(recognized, offsets)
+            logger.debug(f"Recognized batch of {len(group)} images")
+        except Exception as e:
+            for _, _, future in group:
+                future.set_exception(e)
+            return
+        for (_, _, future), result in zip(group, results):
+            future.set_result(result)
+
+
+_batchers: Dict[LanguageKey, RecognitionBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(languages: List[str]) -> RecognitionBatcher:
+    """
+    Get the batcher for a language set, starting it on first use
+    """
+    key = normalize_languages(languages)
+    with _batchers_lock:
+        batcher = _batchers.get(key)
+        if batcher is None:
+            batcher = _batchers[key] = RecognitionBatcher(key)
+        return batcher
+
+
+def batching_enabled() -> bool:
+    return config.RECOGNITION_BATCH_WINDOW_MS > 0
+
+
+def recognize_batched(img: np.ndarray, languages: List[str], canvas_size: Optional[int] = None,
+                      timeout: Optional[float] = None) -> List:
+    """
+    Recognize one image through the shared batcher and wait for its result
+    (see RecognitionBatcher.submit for `canvas_size`)
+    """
+    return get_batcher(languages).submit(img, canvas_size).result(timeout=timeout)
@@ -0,0 +1,585 @@
+"""
+OCR Benchmark Suite
+Measures latency, throughput, memory and model-load time on a synthetic corpus,
+and startup import time of the CLI and API modules
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import resource
+import subprocess
+import tempfile
+from typing import Callable, Dict, List, Optional
+from PIL import Image, ImageDraw, ImageFont
+
+import config
+
+# (name, width, height, font size)
+IMAGE_SIZES = [
+    ('small', 400, 200, 16),
+    ('medium', 1200, 800, 32),
+    ('large', 2400, 1600, 56)
+]
+
+# (name, background, text colour)
+CONTRASTS = [
+    ('high', (255, 255, 255), (0, 0, 0)),
+    ('low', (235, 235, 235), (170, 170, 170))
+]
+
+PDF_PAGE_COUNTS = [3, 8]
+
+WORDS = [
+    'invoice', 'total', 'amount', 'date', 'customer', 'order', 'number',
+    'payment', 'address', 'account', 'balance', 'shipping', 'quantity',
+    'price', 'tax', 'reference', 'summary', 'report', 'page', 'section'
+]
+
+# Entry-point modules whose import time is reported (--imports)
+IMPORT_MODULES = ['ocr', 'app']
+# Loaded with the first reader or image; importing them at startup is a regression
+DEFERRED_IMPORTS = ['torch', 'torchvision', 'easyocr', 'skimage', 'scipy', 'cv2']
+# Slowest top-level imports listed per module
+IMPORT_REPORT_TOP = 10
+
+# Metrics compared against a baseline: name -> True if higher is worse
+COMPARED_METRICS = {
+    'p50': True,
+    'p95': True,
+    'pages_per_sec': False
+}
+
+# Character error rate of int8 against fp32 output allowed by --quantization
+DEFAULT_MAX_CER = 0.02
+
+
+def load_font(size: int):
+    """Load a TrueType font, falling back to PIL's default font"""
+    try:
+        return ImageFont.truetype("arial.ttf", size)
+    except:
+        try:
+            return ImageFont.load_default(size=size)
+        except TypeError:
+            # Pillow < 10.1 has a single fixed-size default font
+            return ImageFont.load_default()
+
+
+def render_text_image(rng: random.Random, width: int, height: int, font_size: int,
+                      background, fill) -> Image.Image:
+    """Draw deterministic lines of words on a blank image"""
+    img = Image.new('RGB', (width, height), color=background)
+    draw = ImageDraw.Draw(img)
+    font = load_font(font_size)
+    line_height = int(font_size * 1.8)
+    y_position = font_size
+    while y_position + line_height < height:
+        line = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 6)))
+        line += f" {rng.randint(0, 99999)}"
+        draw.text((font_size, y_position), line, fill=fill, font=font)
+        y_position += line_height
+    return img
+
+
+def generate_corpus(output_dir: str, seed: int = 0, quick: bool = False) -> List[Dict]:
+    """
+    Generate the benchmark corpus
+
+    The same seed always produces the same files, so runs are comparable.
+
+    Returns:
+        List of {'name', 'path', 'kind', 'pages'} entries
+    """
+    rng = random.Random(seed)
+    os.makedirs(output_dir, exist_ok=True)
+    sizes = IMAGE_SIZES[:2] if quick else IMAGE_SIZES
+    page_counts = PDF_PAGE_COUNTS[:1] if quick else PDF_PAGE_COUNTS
+    corpus = []
+
+    for size_name, width, height, font_size in sizes:
+        for contrast_name, background, fill in CONTRASTS:
+            name = f"image_{size_name}_{contrast_name}.png"
+            path = os.path.join(output_dir, name)
+            render_text_image(rng, width, height, font_size, background, fill).save(path)
+            corpus.append({'name': name, 'path': path, 'kind': 'image', 'pages': 1})
+
+    for page_count in page_counts:
+        # Letter-size pages at 100 DPI, saved as an image-only PDF
+        pages = [render_text_image(rng, 850, 1100, 22, (255, 255, 255), (0, 0, 0))
+                 for _ in range(page_count)]
+        name = f"document_{page_count}p.pdf"
+        path = os.path.join(output_dir, name)
+        pages[0].save(path, save_all=True, append_images=pages[1:], resolution=100)
+        corpus.append({'name': name, 'path': path, 'kind': 'pdf', 'pages': page_count})
+
+    return corpus
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def peak_rss_mb() -> Dict:
+    """Peak resident set size of this process and its reaped children"""
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    unit = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {
+        'self': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit, 1),
+        'children': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit, 1)
+    }
+
+
+def measure(name: str, calls: List[Callable[[], int]], iterations: int) -> Dict:
+    """
+    Time each call `iterations` times
+
+    Args:
+        name: Scenario name
+        calls: Callables that run one request and return the pages processed
+        iterations: Repetitions of the whole list of calls
+    """
+    latencies = []
+    pages = 0
+    errors = 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for call in calls:
+            call_start = time.perf_counter()
+            try:
+                pages += call()
+            except Exception as e:
+                errors += 1
+                print(f"  {name}: {str(e)}", file=sys.stderr)
+            latencies.append(time.perf_counter() - call_start)
+    wall_time = time.perf_counter() - start
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'pages': pages,
+        'wall_time': round(wall_time, 3),
+        'p50': round(percentile(latencies, 50), 4),
+        'p95': round(percentile(latencies, 95), 4),
+        'mean': round(sum(latencies) / len(latencies), 4) if latencies else 0.0,
+        'max': round(max(latencies), 4) if latencies else 0.0,
+        'pages_per_sec': round(pages / wall_time, 3) if wall_time > 0 else 0.0,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def result_pages(result, expected: int) -> int:
+    """Pages processed by a successful detailed result; raises on errors"""
+    if not isinstance(result, dict) or result.get('status') != 'success':
+        error = result.get('error') if isinstance(result, dict) else result
+        raise RuntimeError(f"OCR failed: {error}")
+    return result.get('total_pages', expected)
+
+
+def run_benchmarks(corpus: List[Dict], languages: List[str], iterations: int,
+                   warmup: int, include_api: bool) -> Dict:
+    """
+    Run every scenario over the corpus and collect the report
+    """
+    # Imported here so model-load and import time are measured separately
+    import_start = time.perf_counter()
+    from ocr import process_file, batch_process
+    from reader_pool import get_reader_pool
+    import_time = time.perf_counter() - import_start
+
+    load_start = time.perf_counter()
+    get_reader_pool().get(languages)
+    model_load_time = time.perf_counter() - load_start
+
+    def process_call(entry):
+        return lambda: result_pages(process_file(entry['path'], languages, detail=True), entry['pages'])
+
+    def batch_call():
+        result = batch_process([entry['path'] for entry in corpus], languages, detail=True)
+        if result['failed']:
+            raise RuntimeError(f"{result['failed']} files failed")
+        return sum(result_pages(item, entry['pages']) for item, entry in zip(result['files'], corpus))
+
+    scenarios = {}
+    for kind in ('image', 'pdf'):
+        entries = [entry for entry in corpus if entry['kind'] == kind]
+        if entries:
+            scenarios[f"process_file_{kind}"] = [process_call(entry) for entry in entries]
+    scenarios['batch_process'] = [batch_call]
+
+    if include_api:
+        from app import app
+        client = app.test_client()
+
+        def api_call(endpoint, entry, form):
+            def call():
+                with open(entry['path'], 'rb') as f:
+                    data = dict(form)
+                    data['file' if endpoint == '/api/quick' else 'files'] = (f, entry['name'])
+                    response = client.post(endpoint, data=data, content_type='multipart/form-data')
+                if response.status_code != 200:
+                    raise RuntimeError(f"{endpoint} returned {response.status_code}")
+                return entry['pages']
+            return call
+
+        process_form = {'languages': json.dumps(languages), 'useHighAccuracy': 'false'}
+        quick_form = {'languages': ','.join(languages)}
+        scenarios['api_process'] = [api_call('/api/process', entry, process_form) for entry in corpus]
+        scenarios['api_quick'] = [api_call('/api/quick', entry, quick_form)
+                                  for entry in corpus if entry['kind'] == 'image']
+
+    results = {}
+    for name, calls in scenarios.items():
+        print(f"Running {name} ({len(calls)} requests x {iterations})", file=sys.stderr)
+        if warmup:
+            measure(name, calls, warmup)
+        results[name] = measure(name, calls, iterations)
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'config': {
+                'OCR_WORKERS': config.OCR_WORKERS,
+                'BATCH_WORKERS': config.BATCH_WORKERS,
+                'PDF_PAGES_IN_FLIGHT': config.PDF_PAGES_IN_FLIGHT,
+                'RECOGNITION_BATCH_WINDOW_MS': config.RECOGNITION_BATCH_WINDOW_MS,
+                'RESULT_CACHE_ENABLED': config.RESULT_CACHE_ENABLED,
+                'USE_GPU': config.USE_GPU,
+                'OCR_QUANTIZE': config.OCR_QUANTIZE,
+                'TORCH_THREADS': config.TORCH_THREADS
+            }
+        },
+        'languages': languages,
+        'iterations': iterations,
+        'corpus': [{'name': entry['name'], 'kind': entry['kind'], 'pages': entry['pages']}
+                   for entry in corpus],
+        'import_time': round(import_time, 3),
+        'model_load_time': round(model_load_time, 3),
+        'peak_rss_mb': peak_rss_mb(),
+        'scenarios': results
+    }
+
+
+def sample_corpus(paths: List[str]) -> List[Dict]:
+    """
+    Corpus entries for existing files; directories contribute every PDF and
+    image directly inside them
+    """
+    from ocr import IMAGE_EXTENSIONS
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path)))
+        else:
+            files.append(path)
+    corpus = []
+    for path in files:
+        ext = os.path.splitext(path)[1].lower()
+        if ext == '.pdf' or ext in IMAGE_EXTENSIONS:
+            corpus.append({'name': os.path.basename(path), 'path': path,
+                           'kind': 'pdf' if ext == '.pdf' else 'image', 'pages': None})
+    return corpus
+
+
+def corpus_pages(corpus: List[Dict]):
+    """Yield (name, RGB array) for every page or frame of the corpus files"""
+    import numpy as np
+    from pdf2image import convert_from_path
+    from paged_image import iter_frames
+    for entry in corpus:
+        if entry['kind'] == 'pdf':
+            for page_num, page in enumerate(convert_from_path(entry['path'], dpi=config.DEFAULT_DPI), 1):
+                yield f"{entry['name']}#{page_num}", np.asarray(page.convert('RGB'))
+        else:
+            for page_num, frame in iter_frames(entry['path']):
+                yield f"{entry['name']}#{page_num}", frame
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance between two strings"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+def compare_quantization(corpus: List[Dict], languages: List[str]) -> Dict:
+    """
+    OCR every page of the corpus with fp32 and int8 readers and compare
+
+    The fp32 text is the reference: each page reports the character error
+    rate (edit distance / reference length) of the int8 text against it and
+    the change in mean confidence, and the totals include the time each
+    reader spent and its model size.
+    """
+    from inference import create_reader
+    from ocr import ocr_image
+    from reader_pool import estimate_reader_size
+
+    readers = {}
+    for name, quantize in (('fp32', False), ('int8', True)):
+        load_start = time.perf_counter()
+        reader = create_reader(languages, quantize=quantize)
+        readers[name] = {
+            'reader': reader,
+            'load_time': round(time.perf_counter() - load_start, 3),
+            'size_mb': round(estimate_reader_size(reader) / (1024 * 1024), 1),
+            'seconds': 0.0
+        }
+
+    pages = []
+    for name, img in corpus_pages(corpus):
+        outputs = {}
+        for model, entry in readers.items():
+            # Untimed first call per reader, like the --warmup runs
+            if not entry.get('warm'):
+                ocr_image(entry['reader'], img)
+                entry['warm'] = True
+            start = time.perf_counter()
+            results = ocr_image(entry['reader'], img)
+            entry['seconds'] += time.perf_counter() - start
+            outputs[model] = (' '.join(text for _, text, _ in results),
+                              [confidence for _, _, confidence in results])
+        (reference, fp32_conf), (text, int8_conf) = outputs['fp32'], outputs['int8']
+        pages.append({
+            'page': name,
+            'chars': len(reference),
+            'errors': edit_distance(reference, text),
+            'confidence_change': round((sum(int8_conf) / len(int8_conf) if int8_conf else 0.0)
+                                       - (sum(fp32_conf) / len(fp32_conf) if fp32_conf else 0.0), 4),
+            'identical': reference == text
+        })
+        pages[-1]['cer'] = round(pages[-1]['errors'] / max(1, len(reference)), 4)
+
+    chars = sum(page['chars'] for page in pages)
+    errors = sum(page['errors'] for page in pages)
+    models = {model: {key: round(value, 3) if key == 'seconds' else value
+                      for key, value in entry.items() if key not in ('reader', 'warm')}
+              for model, entry in readers.items()}
+    return {
+        'languages': languages,
+        'torch_threads': config.TORCH_THREADS or os.cpu_count(),
+        'pages': len(pages),
+        'identical_pages': sum(page['identical'] for page in pages),
+        'cer': round(errors / max(1, chars), 4),
+        'speedup': (round(models['fp32']['seconds'] / models['int8']['seconds'], 3)
+                    if models['int8']['seconds'] else None),
+        'models': models,
+        'page_results': pages
+    }
+
+
+def import_report(module: str) -> Dict:
+    """
+    Import a module in a fresh interpreter under `python -X importtime`
+
+    Returns:
+        Wall time of the import in seconds, number of modules loaded, the
+        slowest top-level imports (cumulative milliseconds) and any
+        DEFERRED_IMPORTS that were loaded eagerly
+    """
+    code = ('import sys, time\n'
+            'start = time.perf_counter()\n'
+            f'import {module}\n'
+            'print(time.perf_counter() - start)')
+    # No preloading: a warmup thread would import torch during the measurement
+    env = dict(os.environ, PRELOAD_LANGUAGES='', PREFORK_WARMUP='false')
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed: {proc.stderr.strip().splitlines()[-1:]}")
+
+    loaded, children, direct = set(), [], []
+    for line in proc.stderr.splitlines():
+        # "import time: <self us> | <cumulative us> | <module indented by depth>"
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        loaded.add(name.strip())
+        # Children are listed before the module that imported them
+        if depth == 1:
+            children.append((name.strip(), int(cumulative_us) / 1000))
+        elif depth == 0:
+            if name.strip() == module:
+                direct = children
+            children = []
+
+    slowest = sorted(direct, key=lambda child: child[1], reverse=True)[:IMPORT_REPORT_TOP]
+    return {
+        'seconds': round(float(proc.stdout.strip().splitlines()[-1]), 3),
+        'modules_loaded': len(loaded),
+        'slowest': [{'module': name, 'cumulative_ms': round(ms, 1)} for name, ms in slowest],
+        'deferred_loaded': [name for name in DEFERRED_IMPORTS if name in loaded]
+    }
+
+
+def check_import_budget(imports: Dict[str, Dict], budget: float) -> List[str]:
+    """Import-time problems: modules over the budget or loading DEFERRED_IMPORTS"""
+    problems = []
+    for module, report in imports.items():
+        if report['seconds'] > budget:
+            problems.append(f"import {module} took {report['seconds']:.3f}s (budget {budget:.3f}s)")
+        if report['deferred_loaded']:
+            problems.append(f"import {module} loads {', '.join(report['deferred_loaded'])} eagerly")
+    return problems
+
+
+def compare_to_baseline(report: Dict, baseline: Dict, tolerance: float) -> List[Dict]:
+    """
+    Compare scenario metrics against a baseline report
+
+    Returns:
+        One entry per compared metric, flagged as a regression when it is
+        worse than the baseline by more than `tolerance` (a fraction)
+    """
+    comparisons = []
+    for name, current in report['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+        for metric, higher_is_worse in COMPARED_METRICS.items():
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = change if higher_is_worse else -change
+            comparisons.append({
+                'scenario': name,
+                'metric': metric,
+                'baseline': old,
+                'current': new,
+                'change': round(change, 3),
+                'regression': worse > tolerance
+            })
+    return comparisons
+
+
+def write_report(report: Dict, path: Optional[str] = None):
+    """Write the JSON report to a file, or to stdout"""
+    output = json.dumps(report, indent=2)
+    if path:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"Report written to: {path}", file=sys.stderr)
+    else:
+        print(output)
+
+
+def main():
+    """Run the benchmark suite from the command line"""
+    parser = argparse.ArgumentParser(
+        description='Benchmark OCR latency, throughput and memory',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python benchmark.py --output baseline.json
+  python benchmark.py --baseline baseline.json --tolerance 0.1
+  python benchmark.py --quick --skip-api
+  python benchmark.py --imports --import-budget 1.0
+  python benchmark.py --quantization --samples scans/ --max-cer 0.02
+        """
+    )
+    parser.add_argument('--languages', '-l', nargs='+', default=['en'],
+                        help='Languages to load (default: en)')
+    parser.add_argument('--iterations', '-n', type=int, default=3,
+                        help='Timed repetitions of each scenario (default: 3)')
+    parser.add_argument('--warmup', type=int, default=1,
+                        help='Untimed repetitions before timing (default: 1)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Corpus seed; keep it fixed to compare runs (default: 0)')
+    parser.add_argument('--corpus-dir',
+                        help='Where to write the corpus (default: a temporary directory)')
+    parser.add_argument('--quick', action='store_true',
+                        help='Smaller corpus for a fast smoke run')
+    parser.add_argument('--skip-api', action='store_true',
+                        help='Skip the Flask endpoint scenarios')
+    parser.add_argument('--output', '-o',
+                        help='Write the JSON report to this file (default: stdout)')
+    parser.add_argument('--baseline',
+                        help='Baseline JSON report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='Allowed slowdown vs. the baseline as a fraction (default: 0.15)')
+    parser.add_argument('--imports', action='store_true',
+                        help='Only report import time of ocr and app (no corpus, no models)')
+    parser.add_argument('--import-budget', type=float, default=1.0,
+                        help='Seconds allowed to import ocr or app; exits 1 when exceeded '
+                             'or when torch/easyocr load at import (default: 1.0)')
+    parser.add_argument('--quantization', action='store_true',
+                        help='Only compare int8 against fp32 model output on the corpus; '
+                             'exits 1 when the character error rate exceeds --max-cer')
+    parser.add_argument('--samples', nargs='+',
+                        help='Files or directories to use as the corpus instead of the '
+                             'synthetic one (--quantization)')
+    parser.add_argument('--max-cer', type=float, default=DEFAULT_MAX_CER,
+                        help=f'Allowed int8 character error rate against fp32 (default: {DEFAULT_MAX_CER})')
+    args = parser.parse_args()
+
+    if args.quantization:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            corpus = (sample_corpus(args.samples) if args.samples
+                      else generate_corpus(args.corpus_dir or temp_dir, args.seed, args.quick))
+            report = {'quantization': compare_quantization(corpus, args.languages)}
+        cer = report['quantization']['cer']
+        if cer > args.max_cer:
+            print(f"QUANTIZATION int8 character error rate {cer:.2%} exceeds {args.max_cer:.2%}",
+                  file=sys.stderr)
+        write_report(report, args.output)
+        return 1 if cer > args.max_cer else 0
+
+    imports = {module: import_report(module) for module in IMPORT_MODULES}
+    import_problems = check_import_budget(imports, args.import_budget)
+    for problem in import_problems:
+        print(f"IMPORT BUDGET {problem}", file=sys.stderr)
+
+    if args.imports:
+        report = {'imports': imports}
+    else:
+        # Repeated runs over the same files must measure OCR, not cache hits
+        config.RESULT_CACHE_ENABLED = False
+        # Back-to-back API calls from one client would hit its rate limit
+        config.ADMISSION_ENABLED = False
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            corpus = generate_corpus(args.corpus_dir or temp_dir, args.seed, args.quick)
+            report = run_benchmarks(corpus, args.languages, args.iterations,
+                                    args.warmup, not args.skip_api)
+        report['imports'] = imports
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        report['comparison'] = compare_to_baseline(report, baseline, args.tolerance)
+        regressions = [item for item in report['comparison'] if item['regression']]
+        for item in regressions:
+            print(f"REGRESSION {item['scenario']} {item['metric']}: "
+                  f"{item['baseline']} -> {item['current']} ({item['change']:+.1%})", file=sys.stderr)
+
+    write_report(report, args.output)
+
+    return 1 if regressions or import_problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
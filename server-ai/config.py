@@ -12,13 +12,185 @@ CONFIDENCE_THRESHOLD = float(os.getenv('CONFIDENCE_THRESHOLD', '0.7'))
 MIN_TEXT_LENGTH = int(os.getenv('MIN_TEXT_LENGTH', '10'))
 
 # EasyOCR Configuration
+# Run the models on CUDA (EasyOCR falls back to the CPU when none is found)
 USE_GPU = os.getenv('USE_GPU', 'false').lower() == 'true'
+# Dynamic int8 quantization of the CPU recognizer (false = fp32 models);
+# `python benchmark.py --quantization` compares the two
+OCR_QUANTIZE = os.getenv('OCR_QUANTIZE', 'true').lower() == 'true'
+# Torch intra-op threads of the serving process (0 = its share of the CPUs,
+# see inference.default_torch_threads); gunicorn workers and PDF worker
+# processes get their share instead
+TORCH_THREADS = int(os.getenv('TORCH_THREADS', '0'))
+# Serving processes sharing the CPUs: the gunicorn workers (gunicorn.conf.py
+# reads this); set 1 when serving from a single process
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '2'))
+# Torch inter-op threads (0 = torch's default)
+TORCH_INTEROP_THREADS = int(os.getenv('TORCH_INTEROP_THREADS', '1'))
+
+# Reader Pool Configuration
+# Memory budget for warm readers; least recently used readers are evicted past it
+READER_POOL_MAX_MB = float(os.getenv('READER_POOL_MAX_MB', '1024'))
+# Language sets to load at startup, e.g. "en;en,es;ja"
+PRELOAD_LANGUAGES = [
+    [lang.strip() for lang in group.split(',') if lang.strip()]
+    for group in os.getenv('PRELOAD_LANGUAGES', '').split(';')
+    if group.strip()
+]
+# Set by gunicorn.conf.py when readers are warmed in the master before fork
+PREFORK_WARMUP = os.getenv('PREFORK_WARMUP', 'false').lower() == 'true'
+
+# Upload Configuration
+# Uploads up to this size are OCR'd from memory; larger ones go to a temp file
+UPLOAD_SPILL_BYTES = int(os.getenv('UPLOAD_SPILL_BYTES', str(20 * 1024 * 1024)))
+# OCR calls the ASGI app (asgi_app.py) runs at once per process; other
+# requests are answered on the event loop meanwhile
+ASGI_OCR_THREADS = int(os.getenv('ASGI_OCR_THREADS', '2'))
+
+# Image Input Configuration
+# OCR every frame of multi-frame TIFF and GIF files as a page, with the same
+# 'pages' output as PDFs (false = first frame only)
+IMAGE_FRAME_PAGES = os.getenv('IMAGE_FRAME_PAGES', 'true').lower() == 'true'
+# Memory-map uncompressed TIFF pages instead of decoding them (needs tifffile)
+IMAGE_MEMMAP = os.getenv('IMAGE_MEMMAP', 'true').lower() == 'true'
 
 # PDF Processing Configuration
 DEFAULT_DPI = int(os.getenv('DEFAULT_DPI', '300'))
+# Adaptive DPI (dpi='auto'): each page is rendered at AUTO_DPI_PROBE and
+# re-rendered, up to AUTO_DPI_MAX, only if its median text height in pixels
+# is below AUTO_DPI_TARGET_TEXT_HEIGHT
+AUTO_DPI_PROBE = int(os.getenv('AUTO_DPI_PROBE', '150'))
+AUTO_DPI_TARGET_TEXT_HEIGHT = float(os.getenv('AUTO_DPI_TARGET_TEXT_HEIGHT', '20'))
+AUTO_DPI_MAX = int(os.getenv('AUTO_DPI_MAX', '400'))
+# Read born-digital PDF pages from their embedded text layer (pdftotext)
+# instead of OCR; pages with fewer non-space characters are OCRed
+PDF_TEXT_LAYER = os.getenv('PDF_TEXT_LAYER', 'true').lower() == 'true'
+PDF_TEXT_LAYER_MIN_CHARS = int(os.getenv('PDF_TEXT_LAYER_MIN_CHARS', '20'))
+# Fraction of the page area the text layer's lines must cover; scans with
+# only a digital header, footer, Bates stamp or partial OCR layer fall short
+PDF_TEXT_LAYER_MIN_COVERAGE = float(os.getenv('PDF_TEXT_LAYER_MIN_COVERAGE', '0.1'))
+PDF_TEXT_LAYER_TIMEOUT = float(os.getenv('PDF_TEXT_LAYER_TIMEOUT', '60'))
+# Rendered pages held in memory at once while OCRing a PDF (0 = whole document)
+PDF_PAGES_IN_FLIGHT = int(os.getenv('PDF_PAGES_IN_FLIGHT', '2'))
+
+# Image Preprocessing Configuration
+# Normalize and shrink images before detection (EXIF orientation, first
+# frame and 8-bit depth are always applied when decoding)
+PREPROCESS_ENABLED = os.getenv('PREPROCESS_ENABLED', 'true').lower() == 'true'
+PREPROCESS_GRAYSCALE = os.getenv('PREPROCESS_GRAYSCALE', 'true').lower() == 'true'
+# Downscale so the median text height is about this many pixels (0 = off)
+PREPROCESS_TARGET_TEXT_HEIGHT = float(os.getenv('PREPROCESS_TARGET_TEXT_HEIGHT', '48'))
+# Downscale images whose longer side exceeds this (0 = off)
+PREPROCESS_MAX_SIDE = int(os.getenv('PREPROCESS_MAX_SIDE', '0'))
+# Straighten rotated scans, up to this many degrees either way
+PREPROCESS_DESKEW = os.getenv('PREPROCESS_DESKEW', 'false').lower() == 'true'
+PREPROCESS_DESKEW_MAX_ANGLE = float(os.getenv('PREPROCESS_DESKEW_MAX_ANGLE', '10'))
+# Adaptive (local) thresholding for unevenly lit photos and faint scans
+PREPROCESS_BINARIZE = os.getenv('PREPROCESS_BINARIZE', 'false').lower() == 'true'
+PREPROCESS_BINARIZE_BLOCK = int(os.getenv('PREPROCESS_BINARIZE_BLOCK', '31'))
+PREPROCESS_BINARIZE_C = float(os.getenv('PREPROCESS_BINARIZE_C', '15'))
+
+# Tiling Configuration
+# Images whose longer side exceeds this are OCRed in tiles (0 = never)
+TILE_THRESHOLD = int(os.getenv('TILE_THRESHOLD', '4000'))
+TILE_SIZE = int(os.getenv('TILE_SIZE', '2048'))
+# Tile overlap in pixels; keep above the tallest line of text expected
+TILE_OVERLAP = int(os.getenv('TILE_OVERLAP', '256'))
+# Tiles (or ROIs) OCRed concurrently with the shared reader
+TILE_WORKERS = int(os.getenv('TILE_WORKERS', '2'))
+# Overlap (of the smaller box) above which boxes from two tiles are duplicates
+TILE_DEDUP_OVERLAP = float(os.getenv('TILE_DEDUP_OVERLAP', '0.5'))
+
+# Micro-batching Configuration
+# Window for coalescing concurrent image requests (0 = disabled)
+RECOGNITION_BATCH_WINDOW_MS = float(os.getenv('RECOGNITION_BATCH_WINDOW_MS', '0'))
+RECOGNITION_BATCH_MAX_IMAGES = int(os.getenv('RECOGNITION_BATCH_MAX_IMAGES', '16'))
+# Largest padded area allowed in a batch, relative to its smallest image
+RECOGNITION_BATCH_MAX_PAD_RATIO = float(os.getenv('RECOGNITION_BATCH_MAX_PAD_RATIO', '1.5'))
+# Recognizer batch_size for micro-batched images (raise on GPU)
+RECOGNITION_BATCH_SIZE = int(os.getenv('RECOGNITION_BATCH_SIZE', '1'))
+
+# Parallel PDF Configuration
+# Worker processes for multi-page PDFs (1 = OCR pages in the calling process)
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', '1'))
+# Torch intra-op threads per worker (0 = CPU count divided by OCR_WORKERS)
+TORCH_THREADS_PER_WORKER = int(os.getenv('TORCH_THREADS_PER_WORKER', '0'))
+# Pages per task sent to a worker (0 = about four chunks per worker)
+PARALLEL_CHUNK_PAGES = int(os.getenv('PARALLEL_CHUNK_PAGES', '0'))
+# Worker start method; spawn avoids forking an initialized torch runtime
+OCR_START_METHOD = os.getenv('OCR_START_METHOD', 'spawn')
+
+# Batch Configuration
+# Files (or PDF page chunks) processed concurrently by batch_process
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', '2'))
+# PDFs in a batch are split into chunks of this many pages for fair scheduling
+BATCH_PDF_CHUNK_PAGES = int(os.getenv('BATCH_PDF_CHUNK_PAGES', '4'))
+
+# Result Cache Configuration
+RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', 'true').lower() == 'true'
+# Results kept in the in-memory LRU tier
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '512'))
+# SQLite file for the on-disk tier (empty = memory only)
+RESULT_CACHE_PATH = os.getenv('RESULT_CACHE_PATH', '')
+RESULT_CACHE_MAX_DISK_MB = float(os.getenv('RESULT_CACHE_MAX_DISK_MB', '512'))
+# Disk tier puts between size and expiry checks (the file may exceed its
+# budget by this many results in between)
+RESULT_CACHE_TRIM_EVERY = int(os.getenv('RESULT_CACHE_TRIM_EVERY', '32'))
+# Seconds before a cached result expires (0 = never)
+RESULT_CACHE_TTL = float(os.getenv('RESULT_CACHE_TTL', '86400'))
+
+# Admission Control Configuration
+# Requests are costed in pages before OCR runs: PDF pages, or image frames
+# of up to ADMISSION_PAGE_PIXELS pixels (default: A4 at 300 DPI)
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true'
+ADMISSION_PAGE_PIXELS = int(os.getenv('ADMISSION_PAGE_PIXELS', str(2480 * 3508)))
+# Pages processed at once per worker process before requests get HTTP 503
+# (0 = unlimited; an idle worker admits any request)
+ADMISSION_MAX_INFLIGHT_PAGES = float(os.getenv('ADMISSION_MAX_INFLIGHT_PAGES', '32'))
+# Per-client token bucket: pages per second and burst size before HTTP 429
+# (rate 0 = unlimited). Behind a proxy, also set ADMISSION_CLIENT_HEADER, or
+# every client shares the proxy's bucket
+ADMISSION_CLIENT_RATE = float(os.getenv('ADMISSION_CLIENT_RATE', '0'))
+ADMISSION_CLIENT_BURST = float(os.getenv('ADMISSION_CLIENT_BURST', '40'))
+# Request header identifying clients, e.g. X-API-Key (empty = client IP)
+ADMISSION_CLIENT_HEADER = os.getenv('ADMISSION_CLIENT_HEADER', '')
+# Proxies in front of the app that append to a comma-separated
+# ADMISSION_CLIENT_HEADER (X-Forwarded-For): the client is the entry the
+# outermost of them added, counting from the right. Entries further left
+# are written by the client and can be forged.
+ADMISSION_TRUSTED_PROXIES = int(os.getenv('ADMISSION_TRUSTED_PROXIES', '1'))
+# Per-request limits, answered with HTTP 413 (0 = unlimited)
+ADMISSION_MAX_FILES = int(os.getenv('ADMISSION_MAX_FILES', '0'))
+ADMISSION_MAX_REQUEST_PAGES = float(os.getenv('ADMISSION_MAX_REQUEST_PAGES', '0'))
+# Upper bound of the Retry-After seconds sent with HTTP 429/503 rejections
+ADMISSION_MAX_RETRY_AFTER = int(os.getenv('ADMISSION_MAX_RETRY_AFTER', '60'))
+
+# Background Job Configuration
+# Job storage backend ('memory' keeps jobs in the serving process)
+JOB_STORE = os.getenv('JOB_STORE', 'memory')
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '1'))
+# Jobs waiting to run before new submissions get HTTP 429
+JOB_QUEUE_SIZE = int(os.getenv('JOB_QUEUE_SIZE', '16'))
+# Seconds a finished job and its result are retained
+JOB_RESULT_TTL = float(os.getenv('JOB_RESULT_TTL', '3600'))
+# Retry-After seconds sent with HTTP 429 responses
+JOB_RETRY_AFTER = int(os.getenv('JOB_RETRY_AFTER', '30'))
 
 # Fallback Configuration
+# use_fallback runs a cheap first pass, then re-processes text below
+# CONFIDENCE_THRESHOLD and pages shorter than MIN_TEXT_LENGTH at higher quality
 ENABLE_FALLBACK = os.getenv('ENABLE_FALLBACK', 'true').lower() == 'true'
+# First-pass PDF render DPI (requested DPIs above it are lowered to it)
+FALLBACK_FAST_DPI = int(os.getenv('FALLBACK_FAST_DPI', '200'))
+# First-pass detector canvas for images (EasyOCR's default is 2560)
+FALLBACK_FAST_CANVAS_SIZE = int(os.getenv('FALLBACK_FAST_CANVAS_SIZE', '1280'))
+# Render DPI for re-processing weak PDF pages and blocks
+FALLBACK_DPI = int(os.getenv('FALLBACK_DPI', '400'))
+FALLBACK_BEAM_WIDTH = int(os.getenv('FALLBACK_BEAM_WIDTH', '5'))
+
+# CLI Daemon Configuration
+# Unix socket of `ocr.py --serve`; CLI runs forward to it when it is listening
+DAEMON_SOCKET = os.getenv('OCR_DAEMON_SOCKET', os.path.join(
+    os.getenv('XDG_RUNTIME_DIR') or '/tmp', f"ocr-daemon-{os.getuid()}.sock"))
 
 # Logging Configuration
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
\ No newline at end of file
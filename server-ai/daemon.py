@@ -0,0 +1,240 @@
+"""
+OCR CLI daemon
+`ocr.py --serve` keeps readers warm behind a local Unix socket; later
+`ocr.py` invocations forward their command line to it and print its output,
+skipping the torch/EasyOCR import and model load. When no daemon is
+listening the CLI runs in-process as before.
+
+This module is imported before anything heavy in ocr.py, so it must only
+use the standard library (and config).
+"""
+import io
+import json
+import logging
+import os
+import signal
+import socket
+import struct
+import sys
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+PROTOCOL_VERSION = 1
+# Seconds to wait for a daemon to accept before running in-process
+CONNECT_TIMEOUT = 0.5
+
+_FRAME_HEADER = struct.Struct('>I')
+
+
+def _send_frame(sock: socket.socket, data: bytes):
+    sock.sendall(_FRAME_HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError('Daemon connection closed mid-message')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def _recv_frame(sock: socket.socket) -> bytes:
+    (size,) = _FRAME_HEADER.unpack(_recv_exact(sock, _FRAME_HEADER.size))
+    return _recv_exact(sock, size)
+
+
+def socket_path(argv: List[str]) -> str:
+    """Socket given by --socket on the command line, else config.DAEMON_SOCKET"""
+    for i, arg in enumerate(argv):
+        if arg == '--socket' and i + 1 < len(argv):
+            return argv[i + 1]
+        if arg.startswith('--socket='):
+            return arg.split('=', 1)[1]
+    return config.DAEMON_SOCKET
+
+
+def forward(argv: List[str], path: str) -> Optional[int]:
+    """
+    Run a command line in the daemon listening on `path`, writing its
+    stdout and stderr to ours
+
+    Returns:
+        The command's exit code, or None if no daemon answered (the caller
+        then runs the command in-process)
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(CONNECT_TIMEOUT)
+        sock.connect(path)
+        # OCR of a large document can take minutes
+        sock.settimeout(None)
+        _send_frame(sock, json.dumps({
+            'version': PROTOCOL_VERSION,
+            'argv': argv,
+            'cwd': os.getcwd()
+        }).encode('utf-8'))
+        header = json.loads(_recv_frame(sock))
+        stdout = _recv_frame(sock)
+        stderr = _recv_frame(sock)
+    except (OSError, ValueError):
+        return None
+    finally:
+        sock.close()
+    sys.stderr.flush()
+    sys.stderr.buffer.write(stderr)
+    sys.stderr.flush()
+    sys.stdout.flush()
+    sys.stdout.buffer.write(stdout)
+    sys.stdout.flush()
+    return header['exit_code']
+
+
+def forward_or_continue(argv: List[str]):
+    """
+    Client mode for ocr.py: exit with the daemon's result if one handled
+    the command line, otherwise return so it runs in-process
+    """
+    if '--serve' in argv or '--no-daemon' in argv:
+        return
+    exit_code = forward(argv, socket_path(argv))
+    if exit_code is not None:
+        sys.exit(exit_code)
+
+
+@contextmanager
+def _logs_to(stream: io.TextIOBase) -> Iterator[None]:
+    # Send root log handlers' output to the request's stderr, as it would
+    # appear in an in-process run
+    handlers = [handler for handler in logging.getLogger().handlers
+                if type(handler) is logging.StreamHandler]
+    previous = [handler.setStream(stream) for handler in handlers]
+    try:
+        yield
+    finally:
+        for handler, old_stream in zip(handlers, previous):
+            handler.setStream(old_stream)
+
+
+def run_captured(run: Callable[[List[str]], int], argv: List[str], cwd: str) -> Tuple[int, bytes, bytes]:
+    """
+    Run a command line with the client's working directory, capturing its
+    stdout, stderr and logging
+
+    Returns:
+        (exit code, stdout bytes, stderr bytes)
+    """
+    stdout_bytes, stderr_bytes = io.BytesIO(), io.BytesIO()
+    stdout = io.TextIOWrapper(stdout_bytes, encoding='utf-8', write_through=True)
+    stderr = io.TextIOWrapper(stderr_bytes, encoding='utf-8', write_through=True)
+    previous_cwd = os.getcwd()
+    try:
+        os.chdir(cwd)
+        with redirect_stdout(stdout), redirect_stderr(stderr), _logs_to(stderr):
+            try:
+                exit_code = run(argv)
+            except SystemExit as e:
+                # argparse errors and --help
+                if isinstance(e.code, str):
+                    print(e.code, file=stderr)
+                    exit_code = 1
+                else:
+                    exit_code = e.code or 0
+            except Exception as e:
+                logger.exception(f"Daemon command failed: {str(e)}")
+                exit_code = 1
+    finally:
+        os.chdir(previous_cwd)
+    stdout.flush()
+    stderr.flush()
+    return exit_code, stdout_bytes.getvalue(), stderr_bytes.getvalue()
+
+
+def _handle(conn: socket.socket, run: Callable[[List[str]], int]):
+    request = json.loads(_recv_frame(conn))
+    if request.get('version') != PROTOCOL_VERSION:
+        exit_code, stdout, stderr = 1, b'', b'OCR daemon protocol mismatch; restart the daemon\n'
+    else:
+        exit_code, stdout, stderr = run_captured(run, request['argv'], request['cwd'])
+    _send_frame(conn, json.dumps({'exit_code': exit_code}).encode('utf-8'))
+    _send_frame(conn, stdout)
+    _send_frame(conn, stderr)
+
+
+def forward_probe(path: str) -> bool:
+    """Whether a daemon is accepting connections on `path`"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(CONNECT_TIMEOUT)
+        sock.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+def listen(path: str) -> socket.socket:
+    """
+    Bind the daemon's socket (only the current user may connect). Clients
+    connecting before serve() starts wait in the backlog.
+
+    Raises:
+        RuntimeError: Another daemon is listening on the path
+    """
+    if os.path.exists(path):
+        if forward_probe(path):
+            raise RuntimeError(f"An OCR daemon is already listening on {path}")
+        os.unlink(path)  # Stale socket from a daemon that did not shut down
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    previous_umask = os.umask(0o177)
+    try:
+        server.bind(path)
+    finally:
+        os.umask(previous_umask)
+    server.listen(16)
+    return server
+
+
+def serve(server: socket.socket, run: Callable[[List[str]], int]):
+    """
+    Serve CLI command lines on a listening socket until interrupted or
+    terminated, then remove the socket file
+
+    Requests are handled one at a time: OCR already uses every core, and
+    serial handling keeps each request's working directory, output
+    capture and logging separate.
+
+    Args:
+        server: Socket returned by listen()
+        run: CLI entry point, run(argv) -> exit code
+    """
+    path = server.getsockname()
+    # Unwind through the cleanup below on SIGTERM too
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    logger.warning(f"OCR daemon listening on {path} (pid {os.getpid()})")
+    try:
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                try:
+                    _handle(conn, run)
+                except (OSError, ValueError) as e:
+                    # Includes forward_probe() connections, which send nothing
+                    logger.debug(f"Dropped daemon request: {str(e)}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+        logger.warning('OCR daemon stopped')
@@ -0,0 +1,152 @@
+"""
+Confidence-driven fallback
+With use_fallback, files first go through a cheap pass (lower DPI, smaller
+detector canvas, greedy decoding). Text blocks below CONFIDENCE_THRESHOLD
+are then re-recognized at higher quality, and pages that are weak overall
+(low average confidence, or less than MIN_TEXT_LENGTH characters) are
+re-OCRed at higher quality
+"""
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+import config
+from inference import inference_mode
+from metrics import FALLBACKS, stage
+
+logger = logging.getLogger(__name__)
+
+# Method reported for pages and images improved by the fallback pass
+METHOD_FALLBACK = 'easyocr_fallback'
+
+# Pixels of context kept around a block when re-recognizing it
+BLOCK_PADDING = 4
+
+
+def fallback_enabled(use_fallback: bool) -> bool:
+    """Whether a request asking for use_fallback gets the tiered engine"""
+    return bool(use_fallback) and config.ENABLE_FALLBACK
+
+
+def fallback_settings() -> List:
+    """Settings that change fallback output, for result cache keys"""
+    return [config.CONFIDENCE_THRESHOLD, config.MIN_TEXT_LENGTH, config.FALLBACK_FAST_DPI,
+            config.FALLBACK_DPI, config.FALLBACK_FAST_CANVAS_SIZE, config.FALLBACK_BEAM_WIDTH]
+
+
+def fast_dpi(dpi):
+    """First-pass render DPI for a requested DPI ('auto' is kept)"""
+    if isinstance(dpi, str):
+        return dpi
+    return min(int(dpi), config.FALLBACK_FAST_DPI)
+
+
+def quality_dpi(page_dpi: int, dpi) -> int:
+    """Render DPI for re-processing a page first OCRed at page_dpi"""
+    requested = 0 if isinstance(dpi, str) else int(dpi)
+    return max(page_dpi, requested, config.FALLBACK_DPI)
+
+
+def average_confidence(text_blocks: List[Dict]) -> Optional[float]:
+    """Mean confidence of text blocks, or None if there are none"""
+    if not text_blocks:
+        return None
+    return round(float(np.mean([block['confidence'] for block in text_blocks])), 4)
+
+
+def _text_length(text_blocks: List[Dict]) -> int:
+    return sum(len(block['text'].strip()) for block in text_blocks)
+
+
+def is_weak_page(text_blocks: List[Dict]) -> bool:
+    """
+    A page (or image) is weak when it has less than MIN_TEXT_LENGTH
+    characters or its average confidence is below CONFIDENCE_THRESHOLD
+    """
+    if _text_length(text_blocks) < config.MIN_TEXT_LENGTH:
+        return True
+    return average_confidence(text_blocks) < config.CONFIDENCE_THRESHOLD
+
+
+def weak_blocks(text_blocks: List[Dict]) -> List[int]:
+    """Indices of blocks below CONFIDENCE_THRESHOLD"""
+    return [i for i, block in enumerate(text_blocks)
+            if block['confidence'] < config.CONFIDENCE_THRESHOLD]
+
+
+def is_better(candidate: List[Dict], current: List[Dict]) -> bool:
+    """
+    Whether a re-processed page should replace the first pass: more
+    confident, or, when the first pass found too little text, longer
+    """
+    current_length = _text_length(current)
+    if current_length < config.MIN_TEXT_LENGTH and _text_length(candidate) > current_length:
+        return True
+    return (average_confidence(candidate) or 0.0) > (average_confidence(current) or 0.0)
+
+
+def enhance_contrast(grey: np.ndarray) -> np.ndarray:
+    """Local contrast equalization (CLAHE) for faint or unevenly lit text"""
+    import cv2
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    return clahe.apply(grey)
+
+
+def refine_blocks(reader, grey: np.ndarray, text_blocks: List[Dict],
+                  scale: float = 1.0) -> Tuple[List[Dict], int]:
+    """
+    Re-recognize weak blocks with beam search on a contrast-enhanced image,
+    reusing the first pass's boxes (detection is not repeated)
+
+    Args:
+        reader: EasyOCR reader
+        grey: Grey image to crop blocks from, at `scale` times the
+            resolution of the blocks' coordinates
+        text_blocks: Block dicts from the first pass
+        scale: Ratio of grey's resolution to the blocks' coordinates
+
+    Returns:
+        (blocks with improved text and confidence, number of blocks improved).
+        Boxes keep the first pass's coordinates.
+    """
+    indices = weak_blocks(text_blocks)
+    if not indices:
+        return text_blocks, 0
+
+    height, width = grey.shape[:2]
+    boxes = []
+    for i in indices:
+        xs = [point[0] for point in text_blocks[i]['bbox']]
+        ys = [point[1] for point in text_blocks[i]['bbox']]
+        x0 = max(0, int(min(xs) * scale) - BLOCK_PADDING)
+        x1 = min(width, int(max(xs) * scale) + BLOCK_PADDING)
+        y0 = max(0, int(min(ys) * scale) - BLOCK_PADDING)
+        y1 = min(height, int(max(ys) * scale) + BLOCK_PADDING)
+        if x1 - x0 > 1 and y1 - y0 > 1:
+            boxes.append((i, [x0, x1, y0, y1]))
+    if not boxes:
+        return text_blocks, 0
+
+    # One crop per call: EasyOCR sorts a batch of crops by position and
+    # drops empty ones, so only a single-box result maps back to its block
+    # (on CPU it recognizes crops one at a time either way)
+    enhanced = enhance_contrast(grey)
+    with stage('fallback_recognize'), inference_mode():
+        results = [(i, reader.recognize(enhanced, [box], [], decoder='beamsearch',
+                                        beamWidth=config.FALLBACK_BEAM_WIDTH, reformat=False))
+                   for i, box in boxes]
+
+    refined = list(text_blocks)
+    improved = 0
+    for i, block_results in results:
+        if not block_results:
+            continue
+        _, text, confidence = block_results[0]
+        if float(confidence) > refined[i]['confidence'] and text.strip():
+            refined[i] = dict(refined[i], text=text, confidence=float(confidence))
+            improved += 1
+    if improved:
+        FALLBACKS.inc(improved, level='block')
+        logger.info(f"Fallback improved {improved}/{len(boxes)} weak blocks")
+    return refined, improved
@@ -0,0 +1,39 @@
+# gunicorn.conf.py
+"""
+Gunicorn configuration for the OCR API
+
+The app is imported once in the master (preload_app), which loads and warms
+the PRELOAD_LANGUAGES readers before any worker is forked. Workers share
+those model weights copy-on-write, so N workers cost close to the memory
+of one and none of them pays the model-load time on its first request.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+or, for the ASGI app (asgi_app.py):
+
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn -c gunicorn.conf.py asgi_app:app
+"""
+import os
+import sys
+
+# Must be set before config.py is imported, here or by preload_app
+os.environ.setdefault('PREFORK_WARMUP', 'true')
+os.environ.setdefault('PRELOAD_LANGUAGES', 'en')
+
+# gunicorn reads this file before putting the app directory on sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import config  # noqa: E402
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+# The same count the workers divide the CPU threads by
+workers = config.WEB_CONCURRENCY
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '300'))
+preload_app = True
+
+
+def post_fork(server, worker):
+    # Runs in each new worker; the app and its warm readers are already loaded
+    import warmup
+    warmup.after_fork(server.cfg.workers)
+    server.log.info(f"Worker {worker.pid} ready with readers {warmup.readiness()['languages']}")
@@ -0,0 +1,113 @@
+"""
+Torch inference profile for the EasyOCR models
+Builds readers on the configured device with optional int8 weights, pins
+torch's intra- and inter-op thread counts, and runs model calls without
+autograd bookkeeping
+"""
+import os
+import sys
+import threading
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, List, Optional
+import logging
+
+import config
+
+if TYPE_CHECKING:
+    import easyocr
+
+logger = logging.getLogger(__name__)
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def set_torch_threads(threads: int, interop_threads: Optional[int] = None):
+    """
+    Set torch's intra-op threads, and its inter-op threads while torch still
+    allows it (only before the first inter-op work of the process; later
+    calls keep the existing pool)
+
+    Args:
+        threads: Intra-op threads (per concurrent model call)
+        interop_threads: Inter-op threads (default: config.TORCH_INTEROP_THREADS)
+    """
+    global _configured
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(max(1, threads))
+    interop_threads = config.TORCH_INTEROP_THREADS if interop_threads is None else interop_threads
+    if interop_threads > 0 and torch.get_num_interop_threads() != interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError as e:
+            logger.debug(f"Keeping {torch.get_num_interop_threads()} inter-op threads: {str(e)}")
+    _configured = True
+
+
+def inference_threads() -> int:
+    """
+    Model calls a serving process may run at once: its largest OCR thread
+    pool (ASGI requests, batch files, background jobs or tiles)
+    """
+    return max(1, config.ASGI_OCR_THREADS, config.BATCH_WORKERS, config.JOB_WORKERS, config.TILE_WORKERS)
+
+
+def default_torch_threads(processes: int = 1) -> int:
+    """
+    Intra-op threads per model call that keep `processes` serving
+    processes, each running inference_threads() calls at once, within the
+    CPU count (every concurrent call gets its own set of threads)
+    """
+    return max(1, (os.cpu_count() or 1) // (max(1, processes) * inference_threads()))
+
+
+def configure_torch():
+    """
+    Apply config.TORCH_THREADS (0 = default_torch_threads for
+    config.WEB_CONCURRENCY processes) and config.TORCH_INTEROP_THREADS
+    before the first reader loads, unless the process already set its
+    threads (pre-fork warmup, PDF worker processes)
+    """
+    with _configure_lock:
+        if _configured:
+            return
+        set_torch_threads(config.TORCH_THREADS or default_torch_threads(config.WEB_CONCURRENCY))
+
+
+def inference_mode():
+    """
+    Context for model calls: torch.inference_mode() once torch is loaded
+    (loading a reader loads it), otherwise a no-op. Grad mode is per thread,
+    so every OCR thread enters it around its own calls.
+    """
+    torch = sys.modules.get('torch')
+    return torch.inference_mode() if torch is not None else nullcontext()
+
+
+def model_settings() -> dict:
+    """Settings that change model output, for result cache keys"""
+    return {'gpu': config.USE_GPU, 'quantize': config.OCR_QUANTIZE}
+
+
+def create_reader(languages: List[str], quantize: Optional[bool] = None) -> 'easyocr.Reader':
+    """
+    Build an EasyOCR reader with the inference profile applied
+
+    Args:
+        languages: Language codes
+        quantize: Dynamic int8 quantization of the CPU models' LSTM and
+            linear layers (default: config.OCR_QUANTIZE). The CRAFT detector
+            is convolutional, so only the recognizer changes. Ignored on GPU.
+    """
+    # Imported on first load: easyocr pulls in torch, torchvision and
+    # scikit-image, seconds of startup that --help or /api/health don't need
+    import easyocr
+    configure_torch()
+    quantize = config.OCR_QUANTIZE if quantize is None else quantize
+    reader = easyocr.Reader(languages, gpu=config.USE_GPU, quantize=quantize)
+    logger.info(f"Reader {languages} on {reader.device}"
+                f"{' with int8 recognizer weights' if quantize and reader.device == 'cpu' else ''}")
+    return reader
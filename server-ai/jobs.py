@@ -0,0 +1,212 @@
+"""
+Background OCR jobs
+Bounded job queue, worker threads and pluggable job storage
+"""
+from abc import ABC, abstractmethod
+import queue
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+import logging
+
+import config
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity"""
+
+
+class JobStore(ABC):
+    """
+    Storage interface for job records.
+
+    A job record is a plain dict with at least 'id', 'status' and
+    'expires_at'. Implementations must be safe to call from several threads.
+    """
+
+    @abstractmethod
+    def create(self, job: Dict):
+        pass
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict]:
+        pass
+
+    @abstractmethod
+    def update(self, job_id: str, **fields):
+        pass
+
+    @abstractmethod
+    def delete(self, job_id: str):
+        pass
+
+    @abstractmethod
+    def purge_expired(self, now: float) -> List[Dict]:
+        """Remove and return jobs whose expires_at has passed"""
+
+
+class InMemoryJobStore(JobStore):
+    """
+    Job store held in this process. Jobs are only visible to the worker
+    process that accepted them, so it suits single-worker deployments.
+    """
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job: Dict):
+        with self._lock:
+            self._jobs[job['id']] = job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def delete(self, job_id: str):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def purge_expired(self, now: float) -> List[Dict]:
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.get('expires_at') is not None and job['expires_at'] <= now]
+            return [self._jobs.pop(job_id) for job_id in expired]
+
+
+JOB_STORES = {
+    'memory': InMemoryJobStore
+}
+
+
+def create_job_store(name: str = config.JOB_STORE) -> JobStore:
+    if name not in JOB_STORES:
+        raise ValueError(f"Unknown job store: {name}")
+    return JOB_STORES[name]()
+
+
+class JobManager:
+    """
+    Runs submitted jobs on a fixed set of worker threads.
+
+    A job is a callable taking a progress callback, progress(done, total),
+    and returning a JSON-serializable result. Submitting when `max_queue`
+    jobs are already waiting raises QueueFullError. Finished jobs and their
+    results are kept for `ttl` seconds.
+    """
+
+    def __init__(self, store: Optional[JobStore] = None, workers: int = config.JOB_WORKERS,
+                 max_queue: int = config.JOB_QUEUE_SIZE, ttl: float = config.JOB_RESULT_TTL):
+        self.store = store or create_job_store()
+        self.ttl = ttl
+        self._queue: 'queue.Queue' = queue.Queue(maxsize=max_queue)
+        self._callbacks: Dict[str, Callable] = {}
+        self._threads = []
+        for i in range(max(1, workers)):
+            thread = threading.Thread(target=self._worker, name=f"ocr-job-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, run: Callable[[Callable[[int, int], None]], Dict],
+               on_finish: Optional[Callable[[], None]] = None, **metadata) -> Dict:
+        """
+        Queue a job and return its initial record
+
+        Args:
+            run: Callable doing the work; receives a progress callback
+            on_finish: Called after the job finishes or fails (e.g. cleanup)
+            **metadata: Extra fields stored on the job record
+        """
+        self.purge_expired()
+        now = time.time()
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': QUEUED,
+            'created_at': now,
+            'started_at': None,
+            'finished_at': None,
+            'expires_at': None,
+            'progress': {'pages_done': 0, 'total_pages': None},
+            'result': None,
+            'error': None
+        }
+        job.update(metadata)
+        self.store.create(job)
+        try:
+            self._queue.put_nowait((job['id'], run, on_finish))
+        except queue.Full:
+            self.store.delete(job['id'])
+            raise QueueFullError('Job queue is full')
+        return self.store.get(job['id'])
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        self.purge_expired()
+        return self.store.get(job_id)
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def purge_expired(self):
+        for job in self.store.purge_expired(time.time()):
+            logger.info(f"Expired job {job['id']} ({job['status']})")
+
+    def _worker(self):
+        while True:
+            job_id, run, on_finish = self._queue.get()
+            try:
+                self._run(job_id, run)
+            finally:
+                if on_finish is not None:
+                    try:
+                        on_finish()
+                    except Exception as e:
+                        logger.error(f"Job {job_id} cleanup failed: {str(e)}")
+                self._queue.task_done()
+                self.purge_expired()
+
+    def _run(self, job_id: str, run: Callable):
+        self.store.update(job_id, status=RUNNING, started_at=time.time())
+
+        def progress(done: int, total: int):
+            self.store.update(job_id, progress={'pages_done': done, 'total_pages': total})
+
+        try:
+            result = run(progress)
+            status, error = COMPLETED, None
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            result, status, error = None, FAILED, str(e)
+
+        now = time.time()
+        self.store.update(job_id, status=status, result=result, error=error,
+                          finished_at=now, expires_at=now + self.ttl)
+
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """
+    Get the process-wide job manager, starting its workers on first use
+    """
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = JobManager()
+    return _manager
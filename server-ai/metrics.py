@@ -0,0 +1,242 @@
+"""
+Service metrics
+Per-stage timers, counters and histograms exposed in Prometheus text format
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; spans a cached lookup up to a long multi-page PDF
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {list(self.label_names)}, got {list(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count per label set"""
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+                    for key, value in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    """Value that can go up and down, e.g. resident reader memory"""
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Cumulative bucketed observations per label set, with sum and count"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            # Per-bucket counts, then sum and count
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def _samples(self) -> List[str]:
+        lines = []
+        label_names = self.label_names + ('le',)
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, state):
+                    cumulative += count
+                    labels = _format_labels(label_names, key + (_format_value(bound),))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.label_names, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(round(state[-2], 6))}")
+                lines.append(f"{self.name}_count{labels} {state[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'ocr_stage_seconds', 'Time spent in each processing stage', ['stage']))
+FILE_SECONDS = REGISTRY.register(Histogram(
+    'ocr_file_seconds', 'End-to-end processing time per file', ['file_type', 'pages']))
+FILES = REGISTRY.register(Counter(
+    'ocr_files_total', 'Files processed', ['file_type', 'status']))
+PAGES = REGISTRY.register(Counter(
+    'ocr_pages_total', 'PDF pages and images processed, by extraction method', ['method']))
+ERRORS = REGISTRY.register(Counter(
+    'ocr_errors_total', 'Files that failed to process', ['file_type']))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    'ocr_cache_lookups_total', 'Result cache lookups', ['kind', 'result']))
+FALLBACKS = REGISTRY.register(Counter(
+    'ocr_fallbacks_total', 'Pages re-OCRed and blocks re-recognized at higher quality', ['level']))
+READER_LOADS = REGISTRY.register(Counter(
+    'ocr_reader_loads_total', 'EasyOCR reader loads', ['languages']))
+READER_LOAD_SECONDS = REGISTRY.register(Histogram(
+    'ocr_reader_load_seconds', 'Time to load an EasyOCR reader', ['languages']))
+HTTP_SECONDS = REGISTRY.register(Histogram(
+    'ocr_http_request_seconds', 'HTTP request latency', ['endpoint', 'method', 'status']))
+READER_POOL_BYTES = REGISTRY.register(Gauge(
+    'ocr_reader_pool_resident_bytes', 'Estimated memory held by warm EasyOCR readers'))
+JOB_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'ocr_job_queue_depth', 'Background jobs waiting for a worker'))
+ADMISSION_REJECTIONS = REGISTRY.register(Counter(
+    'ocr_admission_rejections_total', 'Requests turned away by admission control', ['reason']))
+ADMISSION_INFLIGHT_PAGES = REGISTRY.register(Gauge(
+    'ocr_admission_inflight_pages', 'Estimated pages of admitted requests still being processed'))
+
+# Stage timings of the request being handled on this thread, when collected
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar('ocr_timings', default=None)
+# Threads running parts of one request (e.g. image tiles) share its timings
+_timings_lock = threading.Lock()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Time a processing stage into the stage histogram, and into the
+    active collect_timings() block if there is one
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        timings = _timings.get()
+        if timings is not None:
+            with _timings_lock:
+                timings[name] = timings.get(name, 0.0) + elapsed
+
+
+@contextmanager
+def collect_timings() -> Iterator[Dict[str, float]]:
+    """
+    Collect stage durations in seconds for the enclosed work, summed by stage
+    name. Nested blocks share the outermost block's dict.
+    """
+    timings = _timings.get()
+    if timings is not None:
+        yield timings
+        return
+    timings = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def rounded_timings(timings: Dict[str, float]) -> Dict[str, float]:
+    """Stage timings rounded to milliseconds, for responses"""
+    return {name: round(seconds, 3) for name, seconds in timings.items()}
+
+
+def page_count_label(pages: int) -> str:
+    """Bucket a page count into a low-cardinality label"""
+    if pages <= 1:
+        return '1'
+    if pages <= 5:
+        return '2-5'
+    if pages <= 20:
+        return '6-20'
+    return '21+'
+
+
+def render_metrics() -> str:
+    """All registered metrics in Prometheus text exposition format"""
+    return REGISTRY.render()
@@ -20,6 +20,7 @@ class OCRService {
    * @param {boolean} options.detail - Include confidence scores and bounding boxes
    * @param {number} options.dpi - DPI for PDF conversion (default: 300)
    * @param {boolean} options.json - Return JSON format
+   * @param {number} options.workers - Worker processes for multi-page PDFs
    * @returns {Promise<string|Object>} - Extracted text or detailed results
    */
   extractText(filePath, options = {}) {
@@ -43,6 +44,10 @@ class OCRService {
         args.push('--dpi', options.dpi.toString());
       }
 
+      if (options.workers) {
+        args.push('--workers', options.workers.toString());
+      }
+
       const python = spawn(this.pythonPath, args);
       let output = '';
       let errorOutput = '';
@@ -104,6 +109,10 @@ class OCRService {
         args.push('--dpi', options.dpi.toString());
       }
 
+      if (options.workers) {
+        args.push('--workers', options.workers.toString());
+      }
+
       const python = spawn(this.pythonPath, args);
       let output = '';
       let errorOutput = '';
@@ -1,14 +1,48 @@
 # ocr.py
-import easyocr
-from pdf2image import convert_from_path
-from PIL import Image
 import sys
+
+if __name__ == "__main__":
+    # Client mode: hand the command line to a running daemon (ocr.py --serve)
+    # before the OpenCV, numpy and PDF imports below are paid for
+    import daemon
+    daemon.forward_or_continue(sys.argv[1:])
+
+from pdf2image import convert_from_path, convert_from_bytes, pdfinfo_from_path, pdfinfo_from_bytes
+from PIL import Image
+import numpy as np
+import math
+import tempfile
+from contextlib import contextmanager, nullcontext
 import os
 import json
 import argparse
-from typing import List, Dict, Union
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import (TYPE_CHECKING, List, Dict, Union, Optional, Iterable, Iterator, Tuple, Callable,
+                    BinaryIO)
 import logging
 
+import config
+from batcher import batching_enabled, recognize_batched
+from inference import inference_mode, model_settings
+from metrics import (CACHE_LOOKUPS, ERRORS, FALLBACKS, FILE_SECONDS, FILES, PAGES, collect_timings,
+                     page_count_label, rounded_timings, stage)
+from reader_pool import get_reader_pool, normalize_languages
+from result_cache import get_result_cache, hash_array, hash_bytes, hash_file, hash_image, make_key
+from serialization import compact_result, dumps_json, dumps_msgpack
+from fallback import (METHOD_FALLBACK, average_confidence, enhance_contrast, fallback_enabled,
+                      fallback_settings, fast_dpi, is_better, is_weak_page, quality_dpi, refine_blocks,
+                      weak_blocks)
+from paged_image import MULTI_FRAME_EXTENSIONS, frame_count, iter_frames, memmap_frame
+from preprocessing import decode, preprocess, preprocess_settings, to_grey, to_original, to_rgb
+from text_layer import extract_text_layer
+from tiling import ocr_rois, ocr_tiled, parse_roi, should_tile
+
+if TYPE_CHECKING:
+    # Loaded with the first reader (see reader_pool), not at import
+    import easyocr
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -16,211 +50,1665 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize EasyOCR once (lazy loading for better performance)
-_reader = None
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.gif', '.webp']
+
+# Inputs accepted by the extract functions: a file path, raw file bytes,
+# a binary file-like object, or an already decoded image array
+Source = Union[str, bytes, BinaryIO, np.ndarray]
+
+# PDF rendering resolution: dots per inch, or 'auto' for adaptive per-page DPI
+Dpi = Union[int, str]
+AUTO_DPI = 'auto'
+
+# Pipeline modes: full OCR, text boxes only (detect), or recognition of
+# given or previously detected boxes (recognize)
+MODE_FULL = 'full'
+MODE_DETECT = 'detect'
+MODE_RECOGNIZE = 'recognize'
+MODES = [MODE_FULL, MODE_DETECT, MODE_RECOGNIZE]
+
+
+def get_reader(languages: List[str] = ['en']) -> 'easyocr.Reader':
+    """
+    Get a warm EasyOCR reader for the specified languages.
+    Readers are cached per language set in the shared reader pool.
+    """
+    return get_reader_pool().get(languages)
+
+
+def read_source(source: Source) -> Union[str, bytes, np.ndarray]:
+    """
+    Normalize an input: file-like objects are read into bytes, paths,
+    bytes and arrays are returned unchanged
+    """
+    if isinstance(source, (str, bytes, np.ndarray)):
+        return source
+    if isinstance(source, (bytearray, memoryview)):
+        return bytes(source)
+    return source.read()
+
+
+def source_name(source: Source, filename: Optional[str] = None) -> str:
+    """
+    Display name for a source, used as the 'file' field of results
+    """
+    if filename:
+        return os.path.basename(filename)
+    if isinstance(source, str):
+        return os.path.basename(source)
+    name = getattr(source, 'name', None)
+    return os.path.basename(name) if isinstance(name, str) else 'upload'
+
+
+def source_extension(source: Source, filename: Optional[str] = None) -> str:
+    """
+    File extension for a source, sniffing the content when there is no name
+    """
+    name = filename or (source if isinstance(source, str) else None)
+    if name:
+        return os.path.splitext(name)[1].lower()
+    if isinstance(source, np.ndarray):
+        return '.png'
+    if isinstance(source, bytes):
+        if source[:5] == b'%PDF-':
+            return '.pdf'
+        if source[:4] in (b'II*\x00', b'MM\x00*'):
+            return '.tiff'
+        return '.gif' if source[:4] == b'GIF8' else '.png'
+    return ''
+
+
+@contextmanager
+def spilled_to_disk(data: Union[str, bytes], suffix: str = '') -> Iterator[str]:
+    """
+    Yield a file path for data, writing bytes to a temporary file only when
+    a path is really needed (e.g. to hand a document to worker processes)
+    """
+    if isinstance(data, str):
+        yield data
+        return
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    try:
+        with temp_file:
+            temp_file.write(data)
+        yield temp_file.name
+    finally:
+        try:
+            os.unlink(temp_file.name)
+        except OSError:
+            pass
+
+
+def load_image_array(image: Union[str, bytes, np.ndarray]) -> np.ndarray:
+    """
+    Decode an image path, image bytes or array into an 8-bit RGB or grey
+    numpy array (first frame, EXIF orientation applied; see preprocessing.decode).
+    Uncompressed TIFF files are memory-mapped instead (see paged_image.memmap_frame).
+    """
+    if isinstance(image, np.ndarray):
+        return image
+    with stage('decode'):
+        mapped = memmap_frame(image) if isinstance(image, str) else None
+        return mapped if mapped is not None else decode(image)
+
+
+def image_page_count(source: Union[str, bytes, np.ndarray], ext: str) -> int:
+    """
+    Pages of an image input: its frame count for multi-frame formats (see
+    config.IMAGE_FRAME_PAGES), otherwise 1
+    """
+    if (not config.IMAGE_FRAME_PAGES or ext not in MULTI_FRAME_EXTENSIONS
+            or isinstance(source, np.ndarray)):
+        return 1
+    return frame_count(source)
+
+
+def detect_array(reader: 'easyocr.Reader', img: np.ndarray,
+                 canvas_size: Optional[int] = None) -> Tuple[List, List]:
+    """
+    Run EasyOCR's text detector on a decoded image array
+
+    Args:
+        reader: EasyOCR reader (the detector is the same for every language)
+        img: RGB or grey image array
+        canvas_size: Largest side the detector resizes to (default: EasyOCR's)
+
+    Returns:
+        (horizontal_list, free_list): [x_min, x_max, y_min, y_max] boxes, and
+        four-point polygons for slanted text
+    """
+    detect_options = {'canvas_size': canvas_size} if canvas_size else {}
+    with stage('detect'), inference_mode():
+        horizontal_list, free_list = reader.detect(to_rgb(img), reformat=False, **detect_options)
+    return horizontal_list[0], free_list[0]
+
+
+def recognize_array(reader: 'easyocr.Reader', img: np.ndarray, horizontal_list: List, free_list: List,
+                    decoder: str = 'greedy', beam_width: int = 5) -> List:
+    """
+    Run EasyOCR's recognizer on the given boxes of a decoded image array
+    (see detect_array for the box lists)
+
+    Returns:
+        Raw (bbox, text, confidence) results
+    """
+    if not horizontal_list and not free_list:
+        return []
+    with stage('recognize'), inference_mode():
+        return reader.recognize(to_grey(img), horizontal_list, free_list, reformat=False,
+                                decoder=decoder, beamWidth=beam_width)
+
+
+def readtext_array(reader: 'easyocr.Reader', img: np.ndarray, canvas_size: Optional[int] = None,
+                   decoder: str = 'greedy', beam_width: int = 5) -> List:
+    """
+    Run detection and recognition on a decoded image array
+
+    Equivalent to reader.readtext on the encoded file: the detector gets
+    the RGB image and the recognizer a proper RGB-to-grey conversion
+    (readtext on an array would treat it as BGR).
+
+    Args:
+        reader: EasyOCR reader
+        img: RGB or grey image array
+        canvas_size: Largest side the detector resizes to (default: EasyOCR's)
+        decoder: Recognizer decoder, 'greedy' or 'beamsearch'
+        beam_width: Beam width for 'beamsearch'
+    """
+    horizontal_list, free_list = detect_array(reader, img, canvas_size)
+    return recognize_array(reader, img, horizontal_list, free_list, decoder, beam_width)
+
+
+def ocr_image(reader: 'easyocr.Reader', img: np.ndarray, tiled: Optional[bool] = None,
+              fast: bool = False) -> List:
+    """
+    Preprocess an image array and OCR it, in tiles when it is still large.
+    Boxes are returned in the coordinates of the array passed in.
+    With `fast` (the first pass of the fallback engine) untiled images are
+    detected on a smaller canvas.
+    """
+    img, matrix = preprocess(img)
+    if should_tile(img, tiled):
+        results = ocr_tiled(lambda tile: readtext_array(reader, tile), img)
+    else:
+        canvas_size = config.FALLBACK_FAST_CANVAS_SIZE if fast else None
+        results = readtext_array(reader, img, canvas_size=canvas_size)
+    return to_original(results, matrix)
+
+
+def readtext_quality(reader: 'easyocr.Reader', img: np.ndarray) -> List:
+    """
+    Fallback OCR of a weak page or image: full resolution, contrast
+    enhanced and beam-search decoded
+    """
+    grey = enhance_contrast(to_grey(img))
+    if should_tile(grey):
+        return ocr_tiled(lambda tile: readtext_array(reader, tile, decoder='beamsearch',
+                                                     beam_width=config.FALLBACK_BEAM_WIDTH), grey)
+    return readtext_array(reader, grey, decoder='beamsearch', beam_width=config.FALLBACK_BEAM_WIDTH)
+
+
+def refine_image_blocks(reader: 'easyocr.Reader', img: np.ndarray, text_blocks: List[Dict],
+                        whole_image: bool = True) -> Tuple[List[Dict], bool]:
+    """
+    Fallback pass for an image: re-OCR it at full quality if it is weak
+    overall (only when `whole_image`), otherwise re-recognize its weak blocks
+
+    Returns:
+        (text blocks, whether the fallback changed them)
+    """
+    with stage('fallback'):
+        if whole_image and is_weak_page(text_blocks):
+            candidate = format_text_blocks(readtext_quality(reader, img))
+            FALLBACKS.inc(level='page')
+            if is_better(candidate, text_blocks):
+                return candidate, True
+            return text_blocks, False
+        text_blocks, improved = refine_blocks(reader, to_grey(img), text_blocks)
+        return text_blocks, improved > 0
+
+
+def boxes_from_lists(horizontal_list: List, free_list: List) -> List[List[List[int]]]:
+    """
+    Detector output (see detect_array) as four-point boxes, clockwise from
+    top-left like text block bboxes
+    """
+    boxes = [[[x0, y0], [x1, y0], [x1, y1], [x0, y1]] for x0, x1, y0, y1 in horizontal_list]
+    boxes += [[list(point) for point in box] for box in free_list]
+    if not boxes:
+        return []
+    return np.asarray(boxes, dtype=np.float64).round().astype(np.int64).tolist()
+
+
+def lists_from_boxes(boxes: List) -> Tuple[List, List]:
+    """
+    Four-point boxes back into the detector's (horizontal_list, free_list):
+    axis-aligned boxes are horizontal boxes, the rest polygons
+    """
+    horizontal_list, free_list = [], []
+    for box in boxes:
+        (x0, y0), (x1, y1), (x2, y2), (x3, y3) = box
+        if y0 == y1 and x1 == x2 and y2 == y3 and x3 == x0:
+            horizontal_list.append([min(x0, x1), max(x0, x1), min(y0, y2), max(y0, y2)])
+        else:
+            free_list.append([list(point) for point in box])
+    return horizontal_list, free_list
+
+
+def _check_boxes(value) -> List:
+    if isinstance(value, dict):
+        # A detect-mode result, or a full result whose boxes are reused
+        if 'boxes' in value:
+            value = value['boxes']
+        elif 'text_blocks' in value:
+            value = [block['bbox'] for block in value['text_blocks']]
+        else:
+            raise ValueError('expected boxes or text_blocks from an earlier result')
+    if not isinstance(value, list):
+        raise ValueError('expected a list of four-point boxes')
+    try:
+        boxes = np.asarray(value, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise ValueError('expected a list of four-point boxes')
+    if boxes.size and boxes.shape[1:] != (4, 2):
+        raise ValueError('each box must be four [x, y] points')
+    return boxes.reshape(-1, 4, 2).round().astype(np.int64).tolist()
+
+
+def parse_boxes(value) -> Union[List, Dict[int, Dict]]:
+    """
+    Validate boxes for recognize mode: a list of four-point boxes, or an
+    earlier detect-mode (or full) result for the same file
+
+    Returns:
+        The list of boxes for an image, or {page number: {'boxes', 'dpi'}}
+        for a PDF result
+
+    Raises:
+        ValueError: The value has none of those shapes
+    """
+    if isinstance(value, dict) and 'pages' in value:
+        pages = {}
+        for page in value['pages']:
+            if not isinstance(page, dict) or 'page' not in page:
+                raise ValueError('each PDF page needs a page number')
+            pages[int(page['page'])] = {'boxes': _check_boxes(page), 'dpi': page.get('dpi')}
+        return pages
+    return _check_boxes(value)
+
+
+def tiling_settings(tiled: Optional[bool]) -> List:
+    """Settings that change tiled OCR output, for cache keys"""
+    return [tiled, config.TILE_THRESHOLD, config.TILE_SIZE, config.TILE_OVERLAP, config.TILE_DEDUP_OVERLAP]
+
+
+def detect_image(reader: 'easyocr.Reader', img: np.ndarray, rois: Optional[List] = None,
+                 tiled: Optional[bool] = None) -> List:
+    """
+    Text boxes of a decoded image, in its own coordinates
+
+    The image is preprocessed and detected as in full OCR (in tiles when it
+    is large, only inside `rois` when given). Boxes are cached by image
+    content and, since EasyOCR's detector is the same for every language
+    set, reused by recognize mode in any language.
+    """
+    cache = get_result_cache()
+    key = None
+    if cache is not None:
+        with stage('hash'):
+            key = make_key('detections', hash_array(img),
+                           preprocess=preprocess_settings(), rois=rois or None,
+                           tiling=tiling_settings(tiled))
+        with stage('cache_lookup'):
+            boxes = cache.get(key)
+        CACHE_LOOKUPS.inc(kind='detections', result='miss' if boxes is None else 'hit')
+        if boxes is not None:
+            return boxes
+
+    def detect_tile(tile: np.ndarray) -> List:
+        return [(box, '', 1.0) for box in boxes_from_lists(*detect_array(reader, tile))]
+
+    def detect(region: np.ndarray) -> List:
+        region, matrix = preprocess(region)
+        results = ocr_tiled(detect_tile, region) if should_tile(region, tiled) else detect_tile(region)
+        return to_original(results, matrix)
+
+    if rois:
+        results = [result for _, region_results in ocr_rois(detect, img, rois) for result in region_results]
+    else:
+        results = detect(img)
+    boxes = [block['bbox'] for block in format_text_blocks(results)]
+    if key is not None:
+        cache.put(key, boxes)
+    return boxes
+
 
-def get_reader(languages: List[str] = ['en']) -> easyocr.Reader:
+def recognize_image(reader: 'easyocr.Reader', img: np.ndarray, boxes: List) -> List:
     """
-    Get or initialize the EasyOCR reader with specified languages.
-    Lazy initialization to improve startup time.
+    Recognize text in four-point boxes of a decoded image (no detection)
+
+    Returns:
+        Raw (bbox, text, confidence) results
     """
-    global _reader
-    if _reader is None:
-        logger.info(f"Initializing EasyOCR reader with languages: {languages}")
-        _reader = easyocr.Reader(languages, gpu=False)  # Set gpu=True if CUDA is available
-    return _reader
+    return recognize_array(reader, img, *lists_from_boxes(boxes))
 
 
-def extract_text_from_image(image_path: str, languages: List[str] = ['en'], 
-                           detail: bool = False) -> Union[str, Dict]:
+def extract_text_from_image(image_path: Source, languages: List[str] = ['en'], 
+                           detail: bool = False, filename: Optional[str] = None,
+                           rois: Optional[List] = None, tiled: Optional[bool] = None,
+                           use_fallback: bool = False, mode: str = MODE_FULL,
+                           boxes: Optional[List] = None) -> Union[str, Dict]:
     """
     Extract text from an image (JPG, PNG, etc.)
     
     Args:
-        image_path: Path to the image file
+        image_path: Path to the image file, image bytes, a file-like object
+            or a decoded RGB/grey numpy array
         languages: List of language codes (e.g., ['en', 'es', 'fr'])
         detail: If True, return detailed info including confidence scores
+        filename: Name reported in results for in-memory inputs
+        rois: Only OCR these regions, each [x, y, width, height] in pixels
+            (or a dict with those keys); boxes stay in image coordinates
+        tiled: Force tiled OCR on or off (default: tile images whose longer
+            side exceeds config.TILE_THRESHOLD)
+        use_fallback: Cheap first pass, then re-process weak text at higher
+            quality (see fallback.py; full mode only)
+        mode: MODE_FULL, MODE_DETECT (text boxes only, always returned as a
+            detailed result) or MODE_RECOGNIZE (recognize `boxes`, or the
+            image's cached detections)
+        boxes: Four-point boxes to recognize in MODE_RECOGNIZE (see parse_boxes)
         
     Returns:
         Extracted text as string, or dict with detailed information
     """
+    name = source_name(image_path, filename)
+    fast = fallback_enabled(use_fallback) and mode == MODE_FULL
     try:
-        reader = get_reader(languages)
-        results = reader.readtext(image_path, detail=1)  # Always get details first
+        img = load_image_array(read_source(image_path))
+        regions = None
+        if mode == MODE_DETECT:
+            boxes = detect_image(get_reader(languages), img, rois, tiled)
+            return {'status': 'success', 'file': name, 'mode': MODE_DETECT, 'boxes': boxes}
+        if mode == MODE_RECOGNIZE:
+            reader = get_reader(languages)
+            if boxes is None:
+                boxes = detect_image(reader, img, rois, tiled)
+            results = recognize_image(reader, img, boxes)
+        elif rois:
+            reader = get_reader(languages)
+            regions = ocr_rois(lambda region: ocr_image(reader, region, fast=fast), img, rois)
+            results = [result for _, region_results in regions for result in region_results]
+        elif batching_enabled() and not tiled:
+            # Coalesced with images from concurrent requests; like ocr_image,
+            # the fallback's first pass detects on its smaller canvas, and its
+            # weak blocks are refined below
+            processed, matrix = preprocess(img)
+            if should_tile(processed):
+                reader = get_reader(languages)
+                results = ocr_tiled(lambda tile: readtext_array(reader, tile), processed)
+            else:
+                canvas_size = config.FALLBACK_FAST_CANVAS_SIZE if fast else None
+                with stage('batched_ocr'):
+                    results = recognize_batched(processed, languages, canvas_size)
+            results = to_original(results, matrix)
+        else:
+            results = ocr_image(get_reader(languages), img, tiled, fast=fast)
+        extracted_data = format_text_blocks(results)
+        fallback_used = False
+        if fast:
+            # ROIs are small already: only their weak blocks are redone
+            extracted_data, fallback_used = refine_image_blocks(get_reader(languages), img, extracted_data,
+                                                                whole_image=regions is None)
+        method = METHOD_FALLBACK if fallback_used else 'easyocr'
+        PAGES.inc(method=method)
         
         if detail:
             # Return structured data with confidence scores
-            extracted_data = []
-            for bbox, text, confidence in results:
-                extracted_data.append({
-                    'text': text,
-                    'confidence': float(confidence),
-                    'bbox': [[int(coord) for coord in point] for point in bbox]
-                })
-            return {
+            result = {
                 'status': 'success',
-                'file': os.path.basename(image_path),
+                'file': name,
+                'method': method,
+                'fallback_used': fallback_used,
+                'average_confidence': average_confidence(extracted_data),
                 'text_blocks': extracted_data,
                 'full_text': '\n'.join([item['text'] for item in extracted_data])
             }
+            if mode == MODE_RECOGNIZE:
+                result['mode'] = MODE_RECOGNIZE
+            if regions is not None:
+                first = 0
+                result['rois'] = []
+                for region, region_results in regions:
+                    blocks = extracted_data[first:first + len(region_results)]
+                    first += len(region_results)
+                    result['rois'].append({
+                        'roi': list(region),
+                        'text': '\n'.join([block['text'] for block in blocks])
+                    })
+            return result
         else:
             # Return simple text
-            return "\n".join([text for (_, text, _) in results])
+            return "\n".join([item['text'] for item in extracted_data])
             
     except Exception as e:
-        logger.error(f"Error processing image {image_path}: {str(e)}")
+        logger.error(f"Error processing image {name}: {str(e)}")
         if detail:
             return {
                 'status': 'error',
-                'file': os.path.basename(image_path),
+                'file': name,
                 'error': str(e)
             }
         return f"Error processing image: {str(e)}"
 
 
 
-def extract_text_from_pdf(pdf_path: str, languages: List[str] = ['en'], 
-                         detail: bool = False, dpi: int = 300) -> Union[str, Dict]:
+def format_text_blocks(results: List) -> List[Dict]:
+    """
+    Convert raw EasyOCR (bbox, text, confidence) tuples into text block dicts
+    """
+    if not results:
+        return []
+    # One array conversion instead of an int() per coordinate
+    boxes = np.asarray([bbox for bbox, _, _ in results], dtype=np.float64).astype(np.int64).tolist()
+    return [{
+        'text': text,
+        'confidence': float(confidence),
+        'bbox': bbox
+    } for (_, text, confidence), bbox in zip(results, boxes)]
+
+
+def iter_ocr_frames(source: Union[str, bytes], languages: List[str] = ['en'], name: str = 'upload',
+                    total_pages: Optional[int] = None, rois: Optional[List] = None,
+                    tiled: Optional[bool] = None, use_fallback: bool = False, mode: str = MODE_FULL,
+                    page_boxes: Optional[Dict[int, Dict]] = None) -> Iterator[Dict]:
+    """
+    OCR the frames of a multi-frame TIFF or GIF as pages, yielding each page
+    dict as soon as the frame is done
+
+    Frames are decoded one at a time (see paged_image.iter_frames) and go
+    through the same pipeline as a single image, so memory does not grow
+    with the number of frames. In MODE_DETECT pages carry boxes instead of
+    text; in MODE_RECOGNIZE `page_boxes` ({page number: {'boxes'}})
+    replaces detection.
+
+    Raises:
+        RuntimeError: A frame failed; the whole file is reported as failed,
+            as for PDFs
+    """
+    page_boxes = page_boxes or {}
+    if total_pages is None:
+        total_pages = frame_count(source)
+    for page_num, frame in iter_frames(source):
+        logger.info(f"Processing frame {page_num}/{total_pages}")
+        boxes = page_boxes.get(page_num, {}).get('boxes')
+        result = extract_text_from_image(frame, languages, True, filename=name, rois=rois, tiled=tiled,
+                                         use_fallback=use_fallback, mode=mode, boxes=boxes)
+        if result['status'] != 'success':
+            raise RuntimeError(f"Frame {page_num}: {result['error']}")
+        if mode == MODE_DETECT:
+            yield {'page': page_num, 'method': 'easyocr', 'boxes': result['boxes']}
+            continue
+        page = {
+            'page': page_num,
+            'method': result['method'],
+            'text_blocks': result['text_blocks'],
+            'page_text': result['full_text']
+        }
+        if 'rois' in result:
+            page['rois'] = result['rois']
+        yield page
+
+
+def extract_text_from_frames(image_path: Source, languages: List[str] = ['en'],
+                             detail: bool = False, filename: Optional[str] = None,
+                             rois: Optional[List] = None, tiled: Optional[bool] = None,
+                             use_fallback: bool = False, mode: str = MODE_FULL,
+                             boxes: Optional[Dict[int, Dict]] = None,
+                             progress: Optional[Callable[[int, int], None]] = None) -> Union[str, Dict]:
+    """
+    Extract text from every frame of a multi-frame TIFF or GIF, with the
+    same detailed output as a PDF (one entry in 'pages' per frame)
+
+    Args:
+        image_path: Path to the image file, image bytes or a file-like object
+        languages: List of language codes
+        detail: If True, return detailed info including confidence scores
+        filename: Name reported in results for in-memory inputs
+        rois: Regions OCRed in every frame, [x, y, width, height] each
+        tiled: Force tiled OCR of frames on or off (default: by size)
+        use_fallback: Cheap first pass, then re-process weak text per frame
+            (full mode only)
+        mode: MODE_FULL, MODE_DETECT or MODE_RECOGNIZE (see extract_text_from_pdf)
+        boxes: Per-page boxes for MODE_RECOGNIZE, as returned by parse_boxes
+            for a detect-mode result of the same file
+        progress: Optional callback, progress(pages_done, total_pages)
+
+    Returns:
+        Extracted text as string, or dict with detailed information
+    """
+    name = source_name(image_path, filename)
+    try:
+        if boxes is not None and not isinstance(boxes, dict):
+            raise ValueError('Boxes for a multi-frame image must come from a result with pages')
+        source = read_source(image_path)
+        total_pages = frame_count(source)
+        logger.info(f"Processing {total_pages} frames from {name}")
+        pages = []
+        for page in iter_ocr_frames(source, languages, name, total_pages, rois, tiled, use_fallback,
+                                    mode, boxes):
+            pages.append(page)
+            if progress is not None:
+                progress(len(pages), total_pages)
+
+        if detail or mode == MODE_DETECT:
+            return build_pdf_result(name, total_pages, pages, mode)
+        return "\n".join([page['page_text'] for page in pages])
+
+    except Exception as e:
+        logger.error(f"Error processing image {name}: {str(e)}")
+        if detail:
+            return {
+                'status': 'error',
+                'file': name,
+                'error': str(e)
+            }
+        return f"Error processing image: {str(e)}"
+
+
+def pdf_page_count(pdf: Union[str, bytes]) -> int:
+    """
+    Number of pages in a PDF path or PDF bytes
+    """
+    if isinstance(pdf, bytes):
+        return pdfinfo_from_bytes(pdf)['Pages']
+    return pdfinfo_from_path(pdf)['Pages']
+
+
+def iter_pdf_pages(pdf_path: Union[str, bytes], dpi: int = 300, pages_in_flight: Optional[int] = None,
+                   total_pages: Optional[int] = None, first_page: int = 1,
+                   last_page: Optional[int] = None) -> Iterator[Tuple[int, Image.Image]]:
+    """
+    Rasterize a PDF lazily, yielding (page_number, image) pairs in order
+
+    Pages are rendered in windows of `pages_in_flight` pages using
+    first_page/last_page, so at most that many rendered pages are held at
+    once. Each page is closed after the consumer moves on to the next one.
+
+    Args:
+        pdf_path: Path to the PDF file, or the PDF bytes
+        dpi: DPI for PDF to image conversion
+        pages_in_flight: Max rendered pages held in memory (0 = whole range)
+        total_pages: Page count if already known (skips a pdfinfo call)
+        first_page: First page to render (1-based)
+        last_page: Last page to render (default: last page of the document)
+    """
+    if pages_in_flight is None:
+        pages_in_flight = config.PDF_PAGES_IN_FLIGHT
+    if last_page is None:
+        if total_pages is None:
+            total_pages = pdf_page_count(pdf_path)
+        last_page = total_pages
+    convert = convert_from_bytes if isinstance(pdf_path, bytes) else convert_from_path
+    window = pages_in_flight if pages_in_flight > 0 else last_page - first_page + 1
+
+    for window_first in range(first_page, last_page + 1, window):
+        window_last = min(window_first + window - 1, last_page)
+        with stage('render'):
+            images = convert(pdf_path, dpi=dpi,
+                             first_page=window_first, last_page=window_last)
+        page_num = window_first
+        while images:
+            img = images.pop(0)
+            try:
+                yield page_num, img
+            finally:
+                img.close()
+            page_num += 1
+
+
+def render_pdf_page(pdf: Union[str, bytes], page_num: int, dpi: int, grayscale: bool = False) -> Image.Image:
+    """
+    Render a single PDF page (path or bytes) at the given DPI
+    """
+    convert = convert_from_bytes if isinstance(pdf, bytes) else convert_from_path
+    with stage('render'):
+        return convert(pdf, dpi=dpi, first_page=page_num, last_page=page_num, grayscale=grayscale)[0]
+
+
+def auto_dpi_settings() -> List[float]:
+    """
+    Settings that change adaptive-DPI output, for cache keys
+    """
+    return [config.AUTO_DPI_PROBE, config.AUTO_DPI_TARGET_TEXT_HEIGHT, config.AUTO_DPI_MAX]
+
+
+def median_text_height(horizontal_list: List, free_list: List) -> Optional[float]:
+    """
+    Median height in pixels of detected text boxes, or None if there are none
+    """
+    heights = [box[3] - box[2] for box in horizontal_list]
+    heights += [max(point[1] for point in box) - min(point[1] for point in box) for box in free_list]
+    if not heights:
+        return None
+    return float(np.median(heights))
+
+
+def choose_page_dpi(text_height: Optional[float], probe_dpi: Optional[int] = None) -> int:
+    """
+    DPI at which text measured `text_height` px tall at `probe_dpi` reaches
+    config.AUTO_DPI_TARGET_TEXT_HEIGHT, rounded up to a multiple of 50 and
+    capped at config.AUTO_DPI_MAX. Pages without text keep the probe DPI.
+    """
+    if probe_dpi is None:
+        probe_dpi = config.AUTO_DPI_PROBE
+    target = config.AUTO_DPI_TARGET_TEXT_HEIGHT
+    if text_height is None or text_height <= 0 or text_height >= target:
+        return probe_dpi
+    needed = math.ceil(probe_dpi * target / text_height / 50) * 50
+    return max(probe_dpi, min(config.AUTO_DPI_MAX, needed))
+
+
+def ocr_page_adaptive(reader: 'easyocr.Reader', pdf: Union[str, bytes], page_num: int,
+                      probe: Image.Image) -> Tuple[List, int]:
+    """
+    OCR one PDF page from its low-DPI probe render
+
+    Text is detected on the probe first. If the detected text is large
+    enough, the probe's detections are recognized directly; otherwise only
+    this page is re-rendered at the DPI chosen by choose_page_dpi.
+
+    Returns:
+        (raw EasyOCR results, DPI the results were produced at)
+    """
+    probe_dpi = config.AUTO_DPI_PROBE
+    img = np.asarray(probe.convert('RGB'))
+    horizontal_list, free_list = detect_array(reader, img)
+    page_dpi = choose_page_dpi(median_text_height(horizontal_list, free_list), probe_dpi)
+
+    if page_dpi <= probe_dpi:
+        return recognize_array(reader, img, horizontal_list, free_list), probe_dpi
+
+    logger.info(f"Re-rendering page {page_num} at {page_dpi} DPI")
+    page_img = render_pdf_page(pdf, page_num, page_dpi)
+    try:
+        return readtext_array(reader, np.asarray(page_img.convert('RGB'))), page_dpi
+    finally:
+        page_img.close()
+
+
+def detect_page(img: Image.Image, page_num: int, pdf_path: Union[str, bytes],
+                languages: List[str], dpi: Dpi) -> Dict:
+    """
+    Text boxes of one rendered PDF page, going through the detection cache
+    (keyed by page content only: detections serve every language). With
+    dpi='auto', pages whose text is small are re-rendered and detected at
+    the DPI chosen by choose_page_dpi.
+
+    Returns:
+        {'boxes', 'dpi'} for the page
+    """
+    adaptive = dpi == AUTO_DPI
+    cache = get_result_cache()
+    key = None
+    if cache is not None:
+        key = make_key('pdf_page_detections', hash_image(img),
+                       auto_dpi=auto_dpi_settings() if adaptive else None)
+        with stage('cache_lookup'):
+            page = cache.get(key)
+        CACHE_LOOKUPS.inc(kind='detections', result='miss' if page is None else 'hit')
+        if page is not None:
+            return page
+
+    reader = get_reader(languages)
+    horizontal_list, free_list = detect_array(reader, np.asarray(img.convert('RGB')))
+    page_dpi = config.AUTO_DPI_PROBE if adaptive else int(dpi)
+    if adaptive:
+        chosen_dpi = choose_page_dpi(median_text_height(horizontal_list, free_list), page_dpi)
+        if chosen_dpi > page_dpi:
+            logger.info(f"Re-rendering page {page_num} at {chosen_dpi} DPI")
+            page_img = render_pdf_page(pdf_path, page_num, chosen_dpi)
+            try:
+                horizontal_list, free_list = detect_array(reader, np.asarray(page_img.convert('RGB')))
+            finally:
+                page_img.close()
+            page_dpi = chosen_dpi
+    page = {'boxes': boxes_from_lists(horizontal_list, free_list), 'dpi': page_dpi}
+    if key is not None:
+        cache.put(key, page)
+    return page
+
+
+def recognize_page(img: Image.Image, page_num: int, pdf_path: Union[str, bytes],
+                   languages: List[str], dpi: Dpi, boxes: Optional[Dict] = None) -> Dict:
+    """
+    Recognize text in the boxes of one rendered PDF page: `boxes` given as
+    {'boxes', 'dpi'} (see parse_boxes), or else the page's detections
+    (see detect_page). The page is re-rendered if the boxes were found at
+    another DPI.
+
+    Returns:
+        {'text_blocks', 'dpi'} for the page
+    """
+    render_dpi = config.AUTO_DPI_PROBE if dpi == AUTO_DPI else int(dpi)
+    if boxes is None:
+        boxes = detect_page(img, page_num, pdf_path, languages, dpi)
+    page_dpi = int(boxes.get('dpi') or render_dpi)
+    page_img = img if page_dpi == render_dpi else render_pdf_page(pdf_path, page_num, page_dpi, grayscale=True)
+    try:
+        results = recognize_image(get_reader(languages), np.asarray(page_img.convert('L')), boxes['boxes'])
+    finally:
+        if page_img is not img:
+            page_img.close()
+    return {'text_blocks': format_text_blocks(results), 'dpi': page_dpi}
+
+
+def ocr_page_image(img: Image.Image, page_num: int, pdf_path: Union[str, bytes],
+                   languages: List[str], dpi: Dpi, mode: str = MODE_FULL,
+                   boxes: Optional[Dict] = None) -> Dict:
+    """
+    OCR one rendered PDF page, going through the page cache. MODE_DETECT
+    and MODE_RECOGNIZE go to detect_page and recognize_page.
+
+    Returns:
+        {'text_blocks', 'dpi'} for the page ({'boxes', 'dpi'} in MODE_DETECT)
+    """
+    if mode == MODE_DETECT:
+        return detect_page(img, page_num, pdf_path, languages, dpi)
+    if mode == MODE_RECOGNIZE:
+        return recognize_page(img, page_num, pdf_path, languages, dpi, boxes)
+    adaptive = dpi == AUTO_DPI
+    # Pages are cached by rendered content, so a re-upload that differs
+    # in a few pages only re-OCRs those pages
+    cache = get_result_cache()
+    page_key = None
+    if cache is not None:
+        page_key = make_key('pdf_page', hash_image(img), languages=normalize_languages(languages),
+                            auto_dpi=auto_dpi_settings() if adaptive else None, model=model_settings())
+        with stage('cache_lookup'):
+            page = cache.get(page_key)
+        CACHE_LOOKUPS.inc(kind='pdf_page', result='miss' if page is None else 'hit')
+        if page is not None:
+            return page
+
+    reader = get_reader(languages)
+    if adaptive:
+        results, page_dpi = ocr_page_adaptive(reader, pdf_path, page_num, img)
+    else:
+        results, page_dpi = readtext_array(reader, np.asarray(img.convert('RGB'))), int(dpi)
+    page = {'text_blocks': format_text_blocks(results), 'dpi': page_dpi}
+    if page_key is not None:
+        cache.put(page_key, page)
+    return page
+
+
+def page_runs(first_page: int, last_page: int, text_pages: Dict[int, List[Dict]]) -> List[Tuple[int, int, bool]]:
+    """
+    Split a page range into contiguous (first, last, has_text_layer) runs,
+    so image-only pages can still be rendered in windows
+    """
+    runs = []
+    for page_num in range(first_page, last_page + 1):
+        has_text = page_num in text_pages
+        if runs and runs[-1][2] == has_text:
+            runs[-1] = (runs[-1][0], page_num, has_text)
+        else:
+            runs.append((page_num, page_num, has_text))
+    return runs
+
+
+def pdf_page_result(page_num: int, method: str, page: Dict, mode: str = MODE_FULL) -> Dict:
+    """
+    Page dict for a recognized page ({'text_blocks', 'dpi'} plus its method),
+    or in MODE_DETECT for a page's boxes
+    """
+    if mode == MODE_DETECT:
+        boxes = page['boxes'] if 'boxes' in page else [block['bbox'] for block in page['text_blocks']]
+        return {'page': page_num, 'method': method, 'dpi': page['dpi'], 'boxes': boxes}
+    PAGES.inc(method=method)
+    text_blocks = page['text_blocks']
+    return {
+        'page': page_num,
+        'method': method,
+        'dpi': page['dpi'],
+        'text_blocks': text_blocks,
+        'page_text': '\n'.join([item['text'] for item in text_blocks])
+    }
+
+
+def refine_pdf_page(pdf_path: Union[str, bytes], page: Dict, languages: List[str], dpi: Dpi) -> Dict:
+    """
+    Fallback pass for one OCRed PDF page
+
+    Weak pages (see fallback.is_weak_page) are re-rendered at
+    fallback.quality_dpi and fully re-OCRed; otherwise only weak blocks are
+    re-recognized from the re-rendered page. Confident pages and text layer
+    pages are returned unchanged without rendering anything.
+    """
+    text_blocks = page['text_blocks']
+    weak_page = is_weak_page(text_blocks)
+    if page['method'] != 'easyocr' or not (weak_page or weak_blocks(text_blocks)):
+        return page
+
+    page_num = page['page']
+    render_dpi = quality_dpi(page['dpi'], dpi)
+    with stage('fallback'):
+        img = render_pdf_page(pdf_path, page_num, render_dpi, grayscale=True)
+        try:
+            grey = np.asarray(img.convert('L'))
+        finally:
+            img.close()
+        reader = get_reader(languages)
+        if weak_page:
+            logger.info(f"Re-OCRing weak page {page_num} at {render_dpi} DPI")
+            FALLBACKS.inc(level='page')
+            candidate = format_text_blocks(readtext_quality(reader, grey))
+            if not is_better(candidate, text_blocks):
+                return page
+            text_blocks, page_dpi = candidate, render_dpi
+        else:
+            text_blocks, improved = refine_blocks(reader, grey, text_blocks, render_dpi / page['dpi'])
+            if not improved:
+                return page
+            page_dpi = page['dpi']
+
+    return dict(page, method=METHOD_FALLBACK, dpi=page_dpi, text_blocks=text_blocks,
+                page_text='\n'.join([item['text'] for item in text_blocks]))
+
+
+def refine_pdf_pages(pdf_path: Union[str, bytes], pages: Iterable[Dict], languages: List[str],
+                     dpi: Dpi) -> Iterator[Dict]:
+    """Apply refine_pdf_page to first-pass pages as they arrive"""
+    for page in pages:
+        yield refine_pdf_page(pdf_path, page, languages, dpi)
+
+
+def iter_ocr_pdf_pages(pdf_path: Union[str, bytes], languages: List[str] = ['en'],
+                       dpi: Dpi = config.DEFAULT_DPI, first_page: int = 1,
+                       last_page: Optional[int] = None, pages_in_flight: Optional[int] = None,
+                       total_pages: Optional[int] = None, mode: str = MODE_FULL,
+                       page_boxes: Optional[Dict[int, Dict]] = None,
+                       text_pages: Optional[Dict[int, List[Dict]]] = None) -> Iterator[Dict]:
+    """
+    OCR a range of PDF pages in the current process, yielding each page
+    dict as soon as the page is done
+
+    Pages with an embedded text layer are read directly (method
+    'text_layer'); only image-only pages are rasterized and OCRed (method
+    'easyocr'). Nothing is kept once a page is yielded, so a consumer that
+    streams pages out holds at most `pages_in_flight` rendered pages.
+    In MODE_DETECT pages carry boxes instead of text; in MODE_RECOGNIZE
+    `page_boxes` ({page number: {'boxes', 'dpi'}}) replaces detection.
+    `text_pages` is the document's text layer when the caller already read
+    it (see pdf_text_layer); otherwise the range's is read here.
+    """
+    page_boxes = page_boxes or {}
+    if last_page is None:
+        if total_pages is None:
+            total_pages = pdf_page_count(pdf_path)
+        last_page = total_pages
+    render_dpi = config.AUTO_DPI_PROBE if dpi == AUTO_DPI else int(dpi)
+    if text_pages is None:
+        # Text layer boxes are expressed at the render DPI, like OCRed pages
+        text_pages = extract_text_layer(pdf_path, first_page, last_page, render_dpi)
+    else:
+        text_pages = {page: blocks for page, blocks in text_pages.items() if first_page <= page <= last_page}
+
+    for run_first, run_last, has_text in page_runs(first_page, last_page, text_pages):
+        if has_text:
+            for page_num in range(run_first, run_last + 1):
+                yield pdf_page_result(page_num, 'text_layer',
+                                      {'text_blocks': text_pages.pop(page_num), 'dpi': render_dpi}, mode)
+            continue
+        for page_num, img in iter_pdf_pages(pdf_path, render_dpi, pages_in_flight, total_pages,
+                                            run_first, run_last):
+            logger.info(f"Processing page {page_num}/{last_page}")
+            page = ocr_page_image(img, page_num, pdf_path, languages, dpi, mode, page_boxes.get(page_num))
+            yield pdf_page_result(page_num, 'easyocr', page, mode)
+
+
+def ocr_pdf_pages(pdf_path: Union[str, bytes], languages: List[str] = ['en'], dpi: Dpi = config.DEFAULT_DPI,
+                  first_page: int = 1, last_page: Optional[int] = None,
+                  pages_in_flight: Optional[int] = None,
+                  total_pages: Optional[int] = None,
+                  progress: Optional[Callable[[int, int], None]] = None,
+                  mode: str = MODE_FULL, page_boxes: Optional[Dict[int, Dict]] = None,
+                  text_pages: Optional[Dict[int, List[Dict]]] = None) -> List[Dict]:
+    """
+    OCR a range of PDF pages in the current process (see iter_ocr_pdf_pages).
+    progress(pages_done, pages_in_range) is called after each page when given.
+
+    Returns:
+        List of page dicts ({'page', 'method', 'dpi', 'text_blocks', 'page_text'})
+        in page order
+    """
+    if last_page is None:
+        if total_pages is None:
+            total_pages = pdf_page_count(pdf_path)
+        last_page = total_pages
+    pages = []
+    for page in iter_ocr_pdf_pages(pdf_path, languages, dpi, first_page, last_page,
+                                   pages_in_flight, total_pages, mode, page_boxes, text_pages):
+        pages.append(page)
+        if progress is not None:
+            progress(len(pages), last_page - first_page + 1)
+    return pages
+
+
+def build_pdf_result(name: str, total_pages: int, pages: List[Dict], mode: str = MODE_FULL) -> Dict:
+    """
+    Build the detailed PDF (or multi-frame image) result from page dicts
+    in page order
+    """
+    if mode == MODE_DETECT:
+        return {'status': 'success', 'file': os.path.basename(name), 'total_pages': total_pages,
+                'mode': MODE_DETECT, 'pages': pages}
+    methods = {page['method'] for page in pages}
+    fallback_used = METHOD_FALLBACK in methods
+    if fallback_used:
+        method = METHOD_FALLBACK
+    else:
+        method = 'text_layer' if methods == {'text_layer'} else 'easyocr'
+    result = {
+        'status': 'success',
+        'file': os.path.basename(name),
+        'total_pages': total_pages,
+        'method': method,
+        'fallback_used': fallback_used,
+        'average_confidence': average_confidence([block for page in pages
+                                                  for block in page['text_blocks']]),
+        'pages': pages,
+        'full_text': '\n'.join([page['page_text'] for page in pages])
+    }
+    if mode == MODE_RECOGNIZE:
+        result['mode'] = MODE_RECOGNIZE
+    return result
+
+
+def pdf_text_layer(pdf_path: Union[str, bytes], total_pages: int, dpi: Dpi) -> Dict[int, List[Dict]]:
+    """
+    Text layer of the whole document with boxes at the DPI pages are
+    rendered at, read once and handed to whichever pages (or workers)
+    process each range
+    """
+    render_dpi = config.AUTO_DPI_PROBE if dpi == AUTO_DPI else int(dpi)
+    return extract_text_layer(pdf_path, 1, total_pages, render_dpi)
+
+
+def pdf_ocr_workers(total_pages: int, text_pages: Dict[int, List[Dict]], workers: Optional[int]) -> int:
+    """
+    Worker processes to use for a PDF: 1 unless several pages need OCR
+    (born-digital pages in `text_pages` need none)
+    """
+    if workers is None:
+        workers = config.OCR_WORKERS
+    if workers <= 1 or total_pages <= 1:
+        return 1
+    return workers if total_pages - len(text_pages) > 1 else 1
+
+
+def iter_extract_text_from_pdf(pdf_path: Source, languages: List[str] = ['en'],
+                               dpi: Dpi = config.DEFAULT_DPI,
+                               pages_in_flight: Optional[int] = None,
+                               workers: Optional[int] = None,
+                               filename: Optional[str] = None,
+                               use_fallback: bool = False) -> Iterator[Dict]:
+    """
+    Generator form of extract_text_from_pdf for streaming responses
+
+    Yields event dicts: 'start' with the page count, one 'page' per page in
+    page order as soon as it is recognized, then 'summary'. Failures yield
+    an 'error' event instead. Pages are not accumulated, so memory stays
+    flat regardless of document length.
+    """
+    name = source_name(pdf_path, filename)
+    fast = fallback_enabled(use_fallback)
+    pass_dpi = fast_dpi(dpi) if fast else dpi
+    start = time.perf_counter()
+    pages_done = 0
+    methods: Dict[str, int] = {}
+    try:
+        pdf_path = read_source(pdf_path)
+        total_pages = pdf_page_count(pdf_path)
+        yield {'event': 'start', 'file': name, 'total_pages': total_pages}
+
+        text_pages = pdf_text_layer(pdf_path, total_pages, pass_dpi)
+        workers = pdf_ocr_workers(total_pages, text_pages, workers)
+        spill = spilled_to_disk(pdf_path, '.pdf') if workers > 1 else nullcontext(pdf_path)
+        with spill as path:
+            if workers > 1:
+                # Imported here: parallel imports this module for its workers
+                from parallel import iter_pdf_parallel
+                pages = iter_pdf_parallel(path, languages, pass_dpi, total_pages, workers, pages_in_flight,
+                                          text_pages)
+            else:
+                pages = iter_ocr_pdf_pages(path, languages, pass_dpi, pages_in_flight=pages_in_flight,
+                                           total_pages=total_pages, text_pages=text_pages)
+            if fast:
+                pages = refine_pdf_pages(path, pages, languages, dpi)
+            for page in pages:
+                pages_done += 1
+                methods[page['method']] = methods.get(page['method'], 0) + 1
+                yield dict(page, event='page', file=name)
+
+        yield {
+            'event': 'summary',
+            'status': 'success',
+            'file': name,
+            'total_pages': total_pages,
+            'pages_done': pages_done,
+            'methods': methods,
+            'elapsed': round(time.perf_counter() - start, 3)
+        }
+    except Exception as e:
+        logger.error(f"Error processing PDF {name}: {str(e)}")
+        yield {'event': 'error', 'status': 'error', 'file': name, 'error': str(e),
+               'pages_done': pages_done}
+
+
+def extract_text_from_pdf(pdf_path: Source, languages: List[str] = ['en'], 
+                         detail: bool = False, dpi: Dpi = config.DEFAULT_DPI,
+                         pages_in_flight: Optional[int] = None,
+                         workers: Optional[int] = None,
+                         progress: Optional[Callable[[int, int], None]] = None,
+                         filename: Optional[str] = None,
+                         use_fallback: bool = False, mode: str = MODE_FULL,
+                         boxes: Optional[Dict[int, Dict]] = None) -> Union[str, Dict]:
     """
     Extract text from a PDF by converting pages to images
     
     Args:
-        pdf_path: Path to the PDF file
+        pdf_path: Path to the PDF file, PDF bytes or a file-like object
         languages: List of language codes
         detail: If True, return detailed info including confidence scores
-        dpi: DPI for PDF to image conversion (higher = better quality but slower)
+        dpi: DPI for PDF to image conversion (higher = better quality but slower),
+            or 'auto' to probe each page at low DPI and re-render only pages
+            whose text is too small (see choose_page_dpi)
+        pages_in_flight: Max rendered pages held in memory at once
+            (default: config.PDF_PAGES_IN_FLIGHT, 0 = render whole document)
+        workers: Worker processes to spread pages across
+            (default: config.OCR_WORKERS, 1 = OCR pages in this process)
+        progress: Optional callback, progress(pages_done, total_pages)
+        filename: Name reported in results for in-memory inputs
+        use_fallback: OCR pages at fallback.fast_dpi first, then re-process
+            weak pages and blocks at higher quality (see refine_pdf_page;
+            full mode only)
+        mode: MODE_FULL, MODE_DETECT (page boxes only, always returned as a
+            detailed result) or MODE_RECOGNIZE (recognize `boxes`, or each
+            page's cached detections)
+        boxes: Per-page boxes for MODE_RECOGNIZE, {page number: {'boxes', 'dpi'}}
+            as returned by parse_boxes for a detect-mode PDF result
         
     Returns:
         Extracted text as string, or dict with detailed information
     """
+    name = source_name(pdf_path, filename)
+    fast = fallback_enabled(use_fallback) and mode == MODE_FULL
+    pass_dpi = fast_dpi(dpi) if fast else dpi
     try:
-        logger.info(f"Converting PDF to images with DPI={dpi}")
-        images = convert_from_path(pdf_path, dpi=dpi)
-        logger.info(f"Processing {len(images)} pages from PDF")
-        
-        reader = get_reader(languages)
-        all_text = []
-        all_pages_data = []
-        
-        for page_num, img in enumerate(images, start=1):
-            logger.info(f"Processing page {page_num}/{len(images)}")
-            results = reader.readtext(img, detail=1)
-            
-            if detail:
-                page_data = []
-                for bbox, text, confidence in results:
-                    page_data.append({
-                        'text': text,
-                        'confidence': float(confidence),
-                        'bbox': [[int(coord) for coord in point] for point in bbox]
-                    })
-                all_pages_data.append({
-                    'page': page_num,
-                    'text_blocks': page_data,
-                    'page_text': '\n'.join([item['text'] for item in page_data])
-                })
-            else:
-                all_text.extend([text for (_, text, _) in results])
+        if boxes is not None and not isinstance(boxes, dict):
+            raise ValueError('Boxes for a PDF must come from a result with pages')
+        pdf_path = read_source(pdf_path)
+        total_pages = pdf_page_count(pdf_path)
+        logger.info(f"Processing {total_pages} pages from PDF with DPI={dpi}")
+
+        text_pages = pdf_text_layer(pdf_path, total_pages, pass_dpi)
+        if pdf_ocr_workers(total_pages, text_pages, workers) > 1:
+            # Imported here: parallel imports this module for its workers
+            from parallel import ocr_pdf_parallel
+            with spilled_to_disk(pdf_path, '.pdf') as spilled_path:
+                all_pages_data = ocr_pdf_parallel(spilled_path, languages, pass_dpi, total_pages,
+                                                  workers, pages_in_flight, progress, mode, boxes,
+                                                  text_pages)
+        else:
+            all_pages_data = ocr_pdf_pages(pdf_path, languages, pass_dpi,
+                                           pages_in_flight=pages_in_flight,
+                                           total_pages=total_pages, progress=progress,
+                                           mode=mode, page_boxes=boxes, text_pages=text_pages)
+        if fast:
+            all_pages_data = list(refine_pdf_pages(pdf_path, all_pages_data, languages, dpi))
         
-        if detail:
-            return {
-                'status': 'success',
-                'file': os.path.basename(pdf_path),
-                'total_pages': len(images),
-                'pages': all_pages_data,
-                'full_text': '\n'.join([page['page_text'] for page in all_pages_data])
-            }
+        if detail or mode == MODE_DETECT:
+            return build_pdf_result(name, total_pages, all_pages_data, mode)
         else:
-            return "\n".join(all_text)
+            return "\n".join([block['text'] for page in all_pages_data
+                              for block in page['text_blocks']])
             
     except Exception as e:
-        logger.error(f"Error processing PDF {pdf_path}: {str(e)}")
+        logger.error(f"Error processing PDF {name}: {str(e)}")
         if detail:
             return {
                 'status': 'error',
-                'file': os.path.basename(pdf_path),
+                'file': name,
                 'error': str(e)
             }
         return f"Error processing PDF: {str(e)}"
 
 
 
-def process_file(file_path: str, languages: List[str] = ['en'], 
-                detail: bool = False, dpi: int = 300, use_fallback: bool = False) -> Union[str, Dict]:
+def process_file(file_path: Source, languages: List[str] = ['en'], 
+                detail: bool = False, dpi: Dpi = config.DEFAULT_DPI, use_fallback: bool = False,
+                workers: Optional[int] = None,
+                progress: Optional[Callable[[int, int], None]] = None,
+                filename: Optional[str] = None, timings: bool = False,
+                rois: Optional[List] = None, tiled: Optional[bool] = None,
+                mode: str = MODE_FULL, boxes: Optional[Union[List, Dict]] = None) -> Union[str, Dict]:
     """
     Process a file and extract text based on file type
     
     Args:
-        file_path: Path to the file
+        file_path: Path to the file, raw file bytes, a binary file-like object
+            or a decoded image array (in-memory inputs are never written to disk)
         languages: List of language codes
         detail: Return detailed information
-        dpi: DPI for PDF conversion
-        use_fallback: Use fallback processing for higher accuracy (compatibility parameter)
+        dpi: DPI for PDF conversion, or 'auto' to pick it per page
+        use_fallback: Cheap first pass, then re-process low-confidence blocks
+            and pages at higher quality (see fallback.py)
+        workers: Worker processes for multi-page PDFs (default: config.OCR_WORKERS)
+        progress: Optional callback, progress(pages_done, total_pages)
+        filename: Original file name for in-memory inputs; used for the file
+            type and reported in results (sniffed from the content if omitted)
+        timings: Add a 'timings' block (seconds per processing stage) to
+            detailed results
+        rois: Image regions to OCR, [x, y, width, height] each (images only)
+        tiled: Force tiled OCR of images on or off (default: by size)
+        mode: MODE_FULL, MODE_DETECT (text boxes only, always detailed) or
+            MODE_RECOGNIZE (recognize `boxes`, or cached detections)
+        boxes: Boxes for MODE_RECOGNIZE, as returned by parse_boxes
         
     Returns:
         Extracted text or detailed results
     """
-    if not os.path.exists(file_path):
+    if isinstance(file_path, str) and not os.path.exists(file_path):
         error_msg = f"File does not exist: {file_path}"
         logger.error(error_msg)
+        record_file_metrics('unknown', {'status': 'error'}, 0.0)
         if detail:
             return {'status': 'error', 'error': error_msg}
         return error_msg
 
-    ext = os.path.splitext(file_path)[1].lower()
+    ext = source_extension(file_path, filename)
     
-    if ext in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif', '.webp']:
-        return extract_text_from_image(file_path, languages, detail)
-    elif ext == '.pdf':
-        return extract_text_from_pdf(file_path, languages, detail, dpi)
-    else:
+    if ext not in IMAGE_EXTENSIONS and ext != '.pdf':
         error_msg = f"Unsupported file type: {ext}"
         logger.warning(error_msg)
+        record_file_metrics('unknown', {'status': 'error'}, 0.0)
         if detail:
             return {'status': 'error', 'error': error_msg}
         return error_msg
 
+    name = source_name(file_path, filename)
+    file_type = 'pdf' if ext == '.pdf' else 'image'
+    start = time.perf_counter()
+    with collect_timings() as stage_timings:
+        source = read_source(file_path)
+        cache = get_result_cache()
+        key = None
+        result = None
+        if cache is not None:
+            # The detailed result is cached; plain text is derived from it
+            with stage('hash'):
+                key = file_cache_key(source, ext, languages, dpi, rois, tiled, use_fallback, mode, boxes)
+            with stage('cache_lookup'):
+                result = cache.get(key)
+            CACHE_LOOKUPS.inc(kind='file', result='miss' if result is None else 'hit')
+            if result is not None:
+                logger.info(f"Result cache hit for {name}")
+                result['file'] = name
+
+        if result is None:
+            if ext == '.pdf':
+                result = extract_text_from_pdf(source, languages, True, dpi, workers=workers,
+                                               progress=progress, filename=name,
+                                               use_fallback=use_fallback, mode=mode, boxes=boxes)
+            elif image_page_count(source, ext) > 1:
+                result = extract_text_from_frames(source, languages, True, filename=name, rois=rois,
+                                                  tiled=tiled, use_fallback=use_fallback, mode=mode,
+                                                  boxes=boxes, progress=progress)
+            else:
+                result = extract_text_from_image(source, languages, True, filename=name,
+                                                 rois=rois, tiled=tiled, use_fallback=use_fallback,
+                                                 mode=mode, boxes=boxes)
+            if key is not None and result.get('status') == 'success':
+                cache.put(key, result)
+    record_file_metrics(file_type, result, time.perf_counter() - start)
+
+    if progress is not None and result.get('status') == 'success':
+        pages_done = result.get('total_pages', 1)
+        progress(pages_done, pages_done)
+
+    if detail or mode == MODE_DETECT:
+        if timings:
+            result['timings'] = rounded_timings(stage_timings)
+        return result
+    return result_text(result)
+
+
+def iter_process_file(file_path: Source, languages: List[str] = ['en'],
+                      dpi: Dpi = config.DEFAULT_DPI, workers: Optional[int] = None,
+                      filename: Optional[str] = None, rois: Optional[List] = None,
+                      use_fallback: bool = False) -> Iterator[Dict]:
+    """
+    Streaming form of process_file: yields 'start', 'page' and 'summary'
+    events (or an 'error' event) as produced by iter_extract_text_from_pdf.
+    Multi-frame images are streamed frame by frame, other images as a
+    single page. Whole-file results are not
+    cached; PDF pages still go through the page cache.
+    """
+    name = source_name(file_path, filename)
+    ext = source_extension(file_path, filename)
+    if isinstance(file_path, str) and not os.path.exists(file_path):
+        error = f"File does not exist: {file_path}"
+    elif ext not in IMAGE_EXTENSIONS and ext != '.pdf':
+        error = f"Unsupported file type: {ext}"
+    else:
+        error = None
+    if error is not None:
+        logger.warning(error)
+        record_file_metrics('unknown', {'status': 'error'}, 0.0)
+        yield {'event': 'error', 'status': 'error', 'file': name, 'error': error}
+        return
+
+    start = time.perf_counter()
+    if ext == '.pdf':
+        event = {}
+        for event in iter_extract_text_from_pdf(file_path, languages, dpi, workers=workers,
+                                                filename=name, use_fallback=use_fallback):
+            yield event
+        record_file_metrics('pdf', event, time.perf_counter() - start)
+        return
+
+    source = read_source(file_path)
+    total_pages = image_page_count(source, ext)
+    if total_pages > 1:
+        yield {'event': 'start', 'file': name, 'total_pages': total_pages}
+        pages_done = 0
+        methods: Dict[str, int] = {}
+        try:
+            for page in iter_ocr_frames(source, languages, name, total_pages, rois,
+                                        use_fallback=use_fallback):
+                pages_done += 1
+                methods[page['method']] = methods.get(page['method'], 0) + 1
+                yield dict(page, event='page', file=name)
+        except Exception as e:
+            logger.error(f"Error processing image {name}: {str(e)}")
+            record_file_metrics('image', {'status': 'error'}, time.perf_counter() - start)
+            yield {'event': 'error', 'status': 'error', 'file': name, 'error': str(e),
+                   'pages_done': pages_done}
+            return
+        summary = {
+            'event': 'summary',
+            'status': 'success',
+            'file': name,
+            'total_pages': total_pages,
+            'pages_done': pages_done,
+            'methods': methods,
+            'elapsed': round(time.perf_counter() - start, 3)
+        }
+        record_file_metrics('image', summary, time.perf_counter() - start)
+        yield summary
+        return
+
+    yield {'event': 'start', 'file': name, 'total_pages': 1}
+    result = extract_text_from_image(source, languages, True, filename=name, rois=rois,
+                                     use_fallback=use_fallback)
+    record_file_metrics('image', result, time.perf_counter() - start)
+    if result.get('status') != 'success':
+        yield {'event': 'error', 'status': 'error', 'file': name, 'error': result.get('error')}
+        return
+    yield {
+        'event': 'page',
+        'file': name,
+        'page': 1,
+        'method': 'easyocr',
+        'text_blocks': result['text_blocks'],
+        'page_text': result['full_text']
+    }
+    yield {
+        'event': 'summary',
+        'status': 'success',
+        'file': name,
+        'total_pages': 1,
+        'pages_done': 1,
+        'methods': {'easyocr': 1},
+        'elapsed': round(time.perf_counter() - start, 3)
+    }
+
+
+def file_cache_key(source: Union[str, bytes, np.ndarray], ext: str, languages: List[str],
+                   dpi: Dpi, rois: Optional[List] = None, tiled: Optional[bool] = None,
+                   use_fallback: bool = False, mode: str = MODE_FULL,
+                   boxes: Optional[Union[List, Dict]] = None) -> str:
+    """
+    Result cache key for a whole file: its content plus every option that
+    changes the output
+    """
+    if isinstance(source, str):
+        content_hash = hash_file(source)
+    elif isinstance(source, np.ndarray):
+        content_hash = hash_array(source)
+    else:
+        content_hash = hash_bytes(source)
+    is_pdf = ext == '.pdf'
+    # Detection does not depend on the language set
+    return make_key('file', content_hash,
+                    languages=None if mode == MODE_DETECT else normalize_languages(languages),
+                    mode=None if mode == MODE_FULL else mode, boxes=boxes, model=model_settings(),
+                    dpi=dpi if is_pdf else None,
+                    auto_dpi=auto_dpi_settings() if is_pdf and dpi == AUTO_DPI else None,
+                    text_layer=config.PDF_TEXT_LAYER if is_pdf else None,
+                    preprocess=None if is_pdf else preprocess_settings(),
+                    fallback=(fallback_settings() if fallback_enabled(use_fallback) and mode == MODE_FULL
+                              else None),
+                    rois=None if is_pdf else (rois or None),
+                    tiling=None if is_pdf else tiling_settings(tiled),
+                    frame_pages=config.IMAGE_FRAME_PAGES if ext in MULTI_FRAME_EXTENSIONS else None)
+
+
+def record_file_metrics(file_type: str, result: Dict, elapsed: float):
+    """
+    Count a processed file and record its latency by type and page count
+    """
+    if result.get('status') != 'success':
+        FILES.inc(file_type=file_type, status='error')
+        ERRORS.inc(file_type=file_type)
+        return
+    FILES.inc(file_type=file_type, status='success')
+    FILE_SECONDS.observe(elapsed, file_type=file_type,
+                         pages=page_count_label(result.get('total_pages', 1)))
+
+
+def result_text(result: Dict) -> str:
+    """
+    Plain-text form of a detailed result, as returned when detail=False
+    """
+    if result.get('status') != 'success':
+        kind = 'PDF' if str(result.get('file', '')).lower().endswith('.pdf') else 'image'
+        return f"Error processing {kind}: {result.get('error')}"
+    if 'pages' in result:
+        return "\n".join([block['text'] for page in result['pages']
+                          for block in page['text_blocks']])
+    return result['full_text']
+
+
+def _ocr_pdf_chunk(pdf_path: Union[str, bytes], languages: List[str], dpi: Dpi, first_page: int,
+                   last_page: int, workers: Optional[int], use_fallback: bool = False,
+                   mode: str = MODE_FULL) -> List[Dict]:
+    if workers is None:
+        workers = config.OCR_WORKERS
+    fast = fallback_enabled(use_fallback) and mode == MODE_FULL
+    pass_dpi = fast_dpi(dpi) if fast else dpi
+    # In-memory PDFs stay in this process rather than being copied to every worker
+    if workers > 1 and isinstance(pdf_path, str):
+        from parallel import submit_page_range
+        pages = submit_page_range(pdf_path, languages, pass_dpi, first_page, last_page, workers,
+                                  mode=mode).result()
+    else:
+        pages = ocr_pdf_pages(pdf_path, languages, pass_dpi, first_page, last_page, mode=mode)
+    if fast:
+        pages = list(refine_pdf_pages(pdf_path, pages, languages, dpi))
+    return pages
+
+
+def _plan_batch_file(file_path: Source, filename: Optional[str], languages: List[str], dpi: Dpi,
+                     use_fallback: bool, workers: Optional[int], chunk_pages: int,
+                     rois: Optional[List] = None, mode: str = MODE_FULL) -> Dict:
+    """
+    Split one batch file into schedulable work units.
+    Images are a single unit; PDFs become one unit per chunk of pages.
+    PDF chunks bypass process_file, so the whole-file result cache is
+    checked here: a hit is a single unit returning the cached result, a
+    miss carries the 'cache_key' batch_process stores the reassembled
+    result under.
+    """
+    name = source_name(file_path, filename)
+    file_path = read_source(file_path)
+    is_pdf = source_extension(file_path, filename) == '.pdf'
+    if is_pdf and (not isinstance(file_path, str) or os.path.exists(file_path)):
+        try:
+            total_pages = pdf_page_count(file_path)
+        except Exception:
+            total_pages = None  # Let process_file report the error
+        if total_pages:
+            start = time.perf_counter()
+            cache = get_result_cache()
+            key = None
+            if cache is not None:
+                with stage('hash'):
+                    key = file_cache_key(file_path, '.pdf', languages, dpi, use_fallback=use_fallback, mode=mode)
+                with stage('cache_lookup'):
+                    cached = cache.get(key)
+                CACHE_LOOKUPS.inc(kind='file', result='miss' if cached is None else 'hit')
+                if cached is not None:
+                    logger.info(f"Result cache hit for {name}")
+                    cached['file'] = name
+                    record_file_metrics('pdf', cached, time.perf_counter() - start)
+                    return {'name': name, 'total_pages': None, 'units': [lambda: cached],
+                            'unit_pages': [total_pages], 'cache_key': None}
+            ranges = [(first, min(first + chunk_pages - 1, total_pages))
+                      for first in range(1, total_pages + 1, chunk_pages)]
+            units = [
+                lambda first=first, last=last: _ocr_pdf_chunk(file_path, languages, dpi, first, last,
+                                                              workers, use_fallback, mode)
+                for first, last in ranges
+            ]
+            return {'name': name, 'total_pages': total_pages, 'units': units,
+                    'unit_pages': [last - first + 1 for first, last in ranges], 'cache_key': key}
+
+    def unit():
+        return process_file(file_path, languages, detail=True, dpi=dpi, use_fallback=use_fallback,
+                            workers=workers, filename=filename, rois=rois, mode=mode)
+    pages = 1
+    if not is_pdf and (not isinstance(file_path, str) or os.path.exists(file_path)):
+        pages = image_page_count(file_path, source_extension(file_path, filename))
+    return {'name': name, 'total_pages': None, 'units': [unit], 'unit_pages': [pages], 'cache_key': None}
+
+
+def _round_robin(plans: List[Dict]) -> List[Tuple[int, int]]:
+    """
+    Interleave work units across files: the first unit of every file, then
+    the second, and so on. A long PDF then occupies at most its fair share
+    of the pool instead of starving the small files queued behind it.
+    """
+    order = []
+    rounds = max((len(plan['units']) for plan in plans), default=0)
+    for unit_index in range(rounds):
+        for file_index, plan in enumerate(plans):
+            if unit_index < len(plan['units']):
+                order.append((file_index, unit_index))
+    return order
 
-def batch_process(file_paths: List[str], languages: List[str] = ['en'], 
-                 detail: bool = False, dpi: int = 300, use_fallback: bool = False) -> Dict:
+
+def batch_process(file_paths: List[Source], languages: List[str] = ['en'], 
+                 detail: bool = False, dpi: Dpi = config.DEFAULT_DPI, use_fallback: bool = False,
+                 workers: Optional[int] = None, batch_workers: Optional[int] = None,
+                 progress: Optional[Callable[[int, int], None]] = None,
+                 filenames: Optional[List[Optional[str]]] = None,
+                 rois: Optional[List] = None, mode: str = MODE_FULL) -> Dict:
     """
     Process multiple files in batch
+
+    Files are processed concurrently on a bounded thread pool with a fair
+    round-robin schedule (PDFs are split into page chunks). Results are
+    returned in input order.
     
     Args:
-        file_paths: List of file paths to process
+        file_paths: List of files to process (paths or in-memory inputs, see process_file)
         languages: List of language codes
         detail: Return detailed information
-        dpi: DPI for PDF conversion
-        use_fallback: Use fallback processing for higher accuracy (compatibility parameter)
+        dpi: DPI for PDF conversion, or 'auto' to pick it per page
+        use_fallback: Cheap first pass, then re-process low-confidence blocks
+            and pages at higher quality (see fallback.py)
+        workers: Worker processes for multi-page PDFs (default: config.OCR_WORKERS)
+        batch_workers: Files/chunks processed concurrently (default: config.BATCH_WORKERS)
+        progress: Optional callback, progress(pages_done, total_pages) across all
+            files, where each image frame counts as one page
+        filenames: Original names for in-memory inputs, parallel to file_paths
+        rois: Regions OCRed in every image, [x, y, width, height] each
+        mode: MODE_FULL, MODE_DETECT or MODE_RECOGNIZE (on cached or fresh
+            detections; per-file boxes go through process_file)
         
     Returns:
         Dict containing results for all files
     """
+    if batch_workers is None:
+        batch_workers = config.BATCH_WORKERS
+    chunk_pages = max(1, config.BATCH_PDF_CHUNK_PAGES)
+
     results = {
         'total_files': len(file_paths),
         'processed': 0,
         'failed': 0,
-        'files': []
+        'files': [],
+        'timings': []
     }
-    
-    for file_path in file_paths:
-        logger.info(f"Processing file: {file_path}")
-        result = process_file(file_path, languages, detail=True, dpi=dpi, use_fallback=use_fallback)
-        
-        if isinstance(result, dict) and result.get('status') == 'success':
-            results['processed'] += 1
-        else:
-            results['failed'] += 1
-            
-        results['files'].append(result)
-    
+
+    batch_start = time.perf_counter()
+    if filenames is None:
+        filenames = [None] * len(file_paths)
+    plans = [_plan_batch_file(file_path, filename, languages, dpi, use_fallback, workers, chunk_pages,
+                              rois, mode)
+             for file_path, filename in zip(file_paths, filenames)]
+    # (start, end) of every unit, indexed like plan['units']
+    spans = [[None] * len(plan['units']) for plan in plans]
+    total_pages = sum(sum(plan['unit_pages']) for plan in plans)
+    pages_done = [0]
+    progress_lock = threading.Lock()
+
+    def run_unit(file_index: int, unit_index: int):
+        start = time.perf_counter()
+        try:
+            return plans[file_index]['units'][unit_index]()
+        finally:
+            spans[file_index][unit_index] = (start, time.perf_counter())
+            if progress is not None:
+                with progress_lock:
+                    pages_done[0] += plans[file_index]['unit_pages'][unit_index]
+                    progress(pages_done[0], total_pages)
+
+    with ThreadPoolExecutor(max_workers=max(1, batch_workers),
+                            thread_name_prefix='ocr-batch') as pool:
+        futures = {}
+        for file_index, unit_index in _round_robin(plans):
+            futures[(file_index, unit_index)] = pool.submit(run_unit, file_index, unit_index)
+
+        for file_index, plan in enumerate(plans):
+            name = plan['name']
+            logger.info(f"Processing file: {name}")
+            unit_futures = [futures[(file_index, i)] for i in range(len(plan['units']))]
+            try:
+                if plan['total_pages'] is None:
+                    result = unit_futures[0].result()
+                else:
+                    pages = []
+                    for future in unit_futures:
+                        pages.extend(future.result())
+                    result = build_pdf_result(name, plan['total_pages'], pages, mode)
+                    if plan['cache_key'] is not None:
+                        get_result_cache().put(plan['cache_key'], result)
+            except Exception as e:
+                # Wait for the file's remaining chunks so its timing is complete
+                wait(unit_futures)
+                logger.error(f"Error processing file {name}: {str(e)}")
+                result = {
+                    'status': 'error',
+                    'file': name,
+                    'error': str(e)
+                }
+
+            if isinstance(result, dict) and result.get('status') == 'success':
+                results['processed'] += 1
+            else:
+                results['failed'] += 1
+
+            results['files'].append(result)
+
+            file_spans = spans[file_index]
+            started = min(span[0] for span in file_spans)
+            wall_time = max(span[1] for span in file_spans) - started
+            if plan['total_pages'] is not None:
+                # Reassembled PDF chunks: process_file did not count this file
+                record_file_metrics('pdf', result, wall_time)
+            results['timings'].append({
+                'file': name,
+                'queue_wait': round(started - batch_start, 3),
+                'wall_time': round(wall_time, 3)
+            })
+
+    results['elapsed'] = round(time.perf_counter() - batch_start, 3)
     return results
 
 
-def main():
+def parse_dpi(value: Union[int, str]) -> Dpi:
     """
-    Main function to be called from command line or Node.js
-    Enhanced with argument parsing and multiple output formats
+    Parse a DPI option: a positive number or 'auto'
+
+    Raises:
+        ValueError: If the value is neither
+    """
+    if str(value).strip().lower() == AUTO_DPI:
+        return AUTO_DPI
+    try:
+        dpi = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid DPI {value!r}: expected a number or 'auto'")
+    if dpi <= 0:
+        raise ValueError(f"invalid DPI {value!r}: must be positive")
+    return dpi
+
+
+def parse_dpi_arg(value: str) -> Dpi:
+    """
+    argparse type for --dpi
+    """
+    try:
+        return parse_dpi(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def parse_roi_arg(value: str):
+    """
+    argparse type for --roi: "x,y,width,height"
+    """
+    try:
+        return parse_roi(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def serve_daemon(socket_path: str, languages: List[str]) -> int:
+    """
+    Run the CLI daemon: warm readers, then serve command lines forwarded by
+    later ocr.py invocations until interrupted
+
+    Args:
+        socket_path: Unix socket to listen on
+        languages: Language set to warm in addition to PRELOAD_LANGUAGES
+    """
+    import daemon
+    from warmup import warm_up
+
+    try:
+        server = daemon.listen(socket_path)
+    except RuntimeError as e:
+        logger.error(str(e))
+        return 1
+    language_sets = [languages] + [group for group in config.PRELOAD_LANGUAGES
+                                   if normalize_languages(group) != normalize_languages(languages)]
+    warm_up(language_sets)
+    daemon.serve(server, run_cli)
+    return 0
+
+
+def run_cli(argv: Optional[List[str]] = None) -> int:
+    """
+    Run one command line in this process
+
+    Args:
+        argv: Arguments, without the program name (default: sys.argv[1:])
+
+    Returns:
+        Exit code
     """
     parser = argparse.ArgumentParser(
         description='OCR tool for extracting text from images and PDFs',
@@ -231,13 +1719,22 @@ Examples:
   python ocr.py document.pdf --json
   python ocr.py image.jpg --languages en es --detail
   python ocr.py document.pdf --dpi 400 --json
+  python ocr.py document.pdf --dpi auto --detail --json
+  python ocr.py scan.pdf --workers 4
+  python ocr.py drawing.png --tiled --detail --json
+  python ocr.py form.png --roi 0,0,1200,300 --roi 800,900,400,80
   python ocr.py file1.png file2.pdf --batch --json
+  python ocr.py document.pdf --compact -o result.json
+  python ocr.py document.pdf --msgpack -o result.msgpack
+  python ocr.py scan.png --mode detect -o boxes.json
+  python ocr.py scan.png --mode recognize --boxes boxes.json --languages fr
+  python ocr.py --serve --languages en es &     # later runs use its warm readers
         """
     )
     
     parser.add_argument(
         'files',
-        nargs='+',
+        nargs='*',
         help='Path to image or PDF file(s) to process'
     )
     
@@ -254,6 +1751,18 @@ Examples:
         help='Output results in JSON format'
     )
     
+    parser.add_argument(
+        '--compact',
+        action='store_true',
+        help='Output compact columnar JSON (texts, confidences and boxes arrays per page)'
+    )
+    
+    parser.add_argument(
+        '--msgpack',
+        action='store_true',
+        help='Output compact columnar results as MessagePack (requires msgpack)'
+    )
+    
     parser.add_argument(
         '--detail',
         action='store_true',
@@ -262,9 +1771,56 @@ Examples:
     
     parser.add_argument(
         '--dpi',
+        type=parse_dpi_arg,
+        default=config.DEFAULT_DPI,
+        help=f"DPI for PDF to image conversion, or 'auto' to choose it per page "
+             f"(default: {config.DEFAULT_DPI})"
+    )
+    
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Worker processes for multi-page PDFs (default: OCR_WORKERS env, 1 = serial)'
+    )
+    
+    parser.add_argument(
+        '--roi',
+        dest='rois',
+        action='append',
+        type=parse_roi_arg,
+        default=None,
+        help='Only OCR this image region, x,y,width,height in pixels (repeatable)'
+    )
+    
+    parser.add_argument(
+        '--tiled',
+        action='store_true',
+        default=None,
+        help=f'OCR images in overlapping tiles (default: images larger than '
+             f'{config.TILE_THRESHOLD}px on a side)'
+    )
+    
+    parser.add_argument(
+        '--mode',
+        choices=MODES,
+        default=MODE_FULL,
+        help='full OCR, detect (text boxes only, JSON output) or recognize '
+             '(text in --boxes, or in cached detections) (default: full)'
+    )
+    
+    parser.add_argument(
+        '--boxes',
+        default=None,
+        help='JSON file of boxes to recognize: the output of --mode detect (or a '
+             'detailed result) for the same file; implies --mode recognize'
+    )
+    
+    parser.add_argument(
+        '--batch-workers',
         type=int,
-        default=300,
-        help='DPI for PDF to image conversion (default: 300)'
+        default=None,
+        help='Files processed concurrently in batch mode (default: BATCH_WORKERS env)'
     )
     
     parser.add_argument(
@@ -284,13 +1840,53 @@ Examples:
         help='Enable verbose logging'
     )
     
+    parser.add_argument(
+        '--timings',
+        action='store_true',
+        help='Include per-stage timings (seconds) in detailed output'
+    )
+    
     parser.add_argument(
         '--use-fallback',
         action='store_true',
-        help='Use fallback processing for higher accuracy (compatibility option)'
+        help='Fast first pass, then re-process low-confidence text at higher quality'
+    )
+    
+    parser.add_argument(
+        '--serve',
+        action='store_true',
+        help='Run as a daemon keeping readers warm; later ocr.py runs forward to it'
+    )
+    
+    parser.add_argument(
+        '--socket',
+        default=None,
+        help=f'Daemon Unix socket (default: OCR_DAEMON_SOCKET env, {config.DAEMON_SOCKET})'
+    )
+    
+    parser.add_argument(
+        '--no-daemon',
+        action='store_true',
+        help='Run in this process even if a daemon is listening'
     )
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    if args.serve:
+        return serve_daemon(args.socket or config.DAEMON_SOCKET, args.languages)
+    if not args.files:
+        parser.error('the following arguments are required: files')
+    boxes = None
+    if args.boxes:
+        if args.mode == MODE_DETECT:
+            parser.error('--boxes cannot be used with --mode detect')
+        if args.batch or len(args.files) > 1:
+            parser.error('--boxes applies to a single file')
+        try:
+            with open(args.boxes, 'r', encoding='utf-8') as f:
+                boxes = parse_boxes(json.load(f))
+        except (OSError, ValueError) as e:
+            parser.error(f"invalid --boxes file: {str(e)}")
+        args.mode = MODE_RECOGNIZE
     
     # Set logging level
     if args.verbose:
@@ -298,30 +1894,58 @@ Examples:
     else:
         logger.setLevel(logging.WARNING)
     
+    # Compact output is always detailed; detection results are only boxes
+    detail = args.detail or args.json or args.compact or args.msgpack
+    as_json = args.json or args.mode == MODE_DETECT
+    
     # Process files
     if args.batch or len(args.files) > 1:
-        result = batch_process(args.files, args.languages, args.detail or args.json, args.dpi, args.use_fallback)
-        output = json.dumps(result, indent=2) if args.json else result.get('full_text', str(result))
+        result = batch_process(args.files, args.languages, detail, args.dpi, args.use_fallback,
+                               workers=args.workers, batch_workers=args.batch_workers, rois=args.rois,
+                               mode=args.mode)
+        output = json.dumps(result, indent=2) if as_json else result.get('full_text', str(result))
     else:
         file_path = args.files[0]
-        result = process_file(file_path, args.languages, args.detail or args.json, args.dpi, args.use_fallback)
+        result = process_file(file_path, args.languages, detail, args.dpi, args.use_fallback,
+                              workers=args.workers, timings=args.timings, rois=args.rois,
+                              tiled=args.tiled, mode=args.mode, boxes=boxes)
         
-        if args.json:
+        if as_json:
             output = json.dumps(result, indent=2) if isinstance(result, dict) else json.dumps({'text': result})
         else:
             output = result.get('full_text', result) if isinstance(result, dict) else result
     
+    if args.msgpack:
+        output = dumps_msgpack(compact_result(result))
+    elif args.compact:
+        output = dumps_json(compact_result(result)).decode('utf-8')
+    
     # Output results
     if args.output:
         try:
-            with open(args.output, 'w', encoding='utf-8') as f:
-                f.write(str(output))
+            if isinstance(output, bytes):
+                with open(args.output, 'wb') as f:
+                    f.write(output)
+            else:
+                with open(args.output, 'w', encoding='utf-8') as f:
+                    f.write(str(output))
             logger.info(f"Results written to {args.output}")
         except Exception as e:
             logger.error(f"Error writing to file: {str(e)}")
-            sys.exit(1)
+            return 1
+    elif isinstance(output, bytes):
+        sys.stdout.buffer.write(output)
     else:
         print(output)
+    return 0
+
+
+def main():
+    """
+    Main function to be called from command line or Node.js
+    Enhanced with argument parsing and multiple output formats
+    """
+    sys.exit(run_cli())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,123 @@
+"""
+Multi-frame and memory-mapped image input
+Reads the frames of multi-frame TIFF and GIF files one at a time, so they
+can be OCRed as pages like a PDF, and maps uncompressed TIFF pages straight
+from disk instead of decoding them into memory.
+"""
+import io
+import os
+from typing import Iterator, Optional, Tuple, Union
+import logging
+
+import numpy as np
+from PIL import Image
+
+import config
+from metrics import stage
+from preprocessing import pil_to_array, to_8bit
+
+try:
+    import tifffile
+except ImportError:
+    tifffile = None
+
+logger = logging.getLogger(__name__)
+
+# Formats whose frames are OCRed as pages
+MULTI_FRAME_EXTENSIONS = ['.tif', '.tiff', '.gif']
+TIFF_EXTENSIONS = ['.tif', '.tiff']
+
+# TIFF photometric interpretations whose samples are usable as stored
+_PHOTOMETRIC_MINISBLACK = 1
+_PHOTOMETRIC_RGB = 2
+_ORIENTATION_TAG = 274
+
+
+def _open(source: Union[str, bytes]) -> Image.Image:
+    return Image.open(source if isinstance(source, str) else io.BytesIO(source))
+
+
+def image_header(source: Union[str, bytes]) -> Optional[Tuple[int, int, int]]:
+    """
+    (frames, width, height) of an image path or image bytes, read from the
+    file's headers without decoding pixels, or None if it cannot be opened
+    """
+    try:
+        with _open(source) as img:
+            return getattr(img, 'n_frames', 1), img.size[0], img.size[1]
+    except Exception:
+        return None
+
+
+def frame_count(source: Union[str, bytes]) -> int:
+    """
+    Number of frames in an image path or image bytes (1 if the file cannot
+    be opened; decoding then reports the error)
+    """
+    header = image_header(source)
+    return header[0] if header is not None else 1
+
+
+def memmap_frame(path: str, index: int = 0) -> Optional[np.ndarray]:
+    """
+    A TIFF page as a read-only memory map of the file, when its pixels are
+    stored uncompressed, contiguous and in a layout the pipeline reads as is
+    (8/16-bit grey or RGB(A), no orientation tag). Only the strips or tiles
+    that are actually read get paged in, so a large scan costs address
+    space rather than memory.
+
+    Returns:
+        The mapped page (RGBA is viewed as RGB), or None when the page has to
+        be decoded (or tifffile is not installed or config.IMAGE_MEMMAP is off)
+    """
+    if (tifffile is None or not config.IMAGE_MEMMAP
+            or os.path.splitext(path)[1].lower() not in TIFF_EXTENSIONS):
+        return None
+    try:
+        with tifffile.TiffFile(path) as tif:
+            if index >= len(tif.pages):
+                return None
+            page = tif.pages[index]
+            orientation = page.tags.get(_ORIENTATION_TAG)
+            if (not page.is_memmappable
+                    or page.photometric not in (_PHOTOMETRIC_MINISBLACK, _PHOTOMETRIC_RGB)
+                    or page.dtype not in (np.uint8, np.uint16)
+                    or (orientation is not None and orientation.value != 1)):
+                return None
+            shape = page.shape
+        if len(shape) == 3 and shape[2] not in (3, 4):
+            return None
+        img = tifffile.memmap(path, page=index, mode='r')
+    except Exception as e:
+        logger.debug(f"Decoding {path} page {index + 1} instead of mapping it: {str(e)}")
+        return None
+    if img.ndim == 3:
+        img = img[:, :, :3]
+    return to_8bit(img) if img.dtype != np.uint8 else img
+
+
+def iter_frames(source: Union[str, bytes], first_page: int = 1,
+                last_page: Optional[int] = None) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Decode the frames of a multi-frame image lazily, yielding
+    (page_number, 8-bit RGB or grey array) pairs in order
+
+    Only the frame being yielded is decoded and held; uncompressed TIFF
+    pages are memory-mapped (see memmap_frame) rather than decoded.
+
+    Args:
+        source: Path to the image file, or the image bytes
+        first_page: First frame to yield (1-based)
+        last_page: Last frame to yield (default: the last frame)
+    """
+    with _open(source) as img:
+        frames = getattr(img, 'n_frames', 1)
+        last_page = frames if last_page is None else min(last_page, frames)
+        for page_num in range(first_page, last_page + 1):
+            with stage('decode'):
+                frame = memmap_frame(source, page_num - 1) if isinstance(source, str) else None
+                if frame is None:
+                    img.seek(page_num - 1)
+                    frame = to_8bit(pil_to_array(img))
+            yield page_num, frame
+            del frame  # Released before the next frame is decoded
@@ -0,0 +1,173 @@
+"""
+Process-pool PDF OCR
+Spreads chunks of PDF pages across worker processes that each keep a warm reader
+"""
+import atexit
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+import logging
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_key: Optional[Tuple[int, int]] = None
+_executor_lock = threading.Lock()
+
+
+def torch_threads_per_worker(workers: int) -> int:
+    """
+    Torch intra-op threads for each worker so workers x threads fits the CPU
+    """
+    if config.TORCH_THREADS_PER_WORKER > 0:
+        return config.TORCH_THREADS_PER_WORKER
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def _init_worker(torch_threads: int, languages: List[str]):
+    """
+    Worker initializer: pin torch threads and warm a reader
+    """
+    from inference import set_torch_threads
+    set_torch_threads(torch_threads)
+
+    import ocr
+    ocr.get_reader(languages)
+
+
+def _ocr_page_range(pdf_path: str, languages: List[str], dpi: Union[int, str],
+                    first_page: int, last_page: int,
+                    pages_in_flight: Optional[int], mode: str = 'full',
+                    page_boxes: Optional[Dict[int, Dict]] = None,
+                    text_pages: Optional[Dict[int, List[Dict]]] = None) -> List[Dict]:
+    import ocr
+    return ocr.ocr_pdf_pages(pdf_path, languages, dpi, first_page, last_page, pages_in_flight,
+                             mode=mode, page_boxes=page_boxes, text_pages=text_pages)
+
+
+def get_executor(workers: int, languages: List[str]) -> ProcessPoolExecutor:
+    """
+    Get the shared worker pool, recreating it if the worker count changed.
+    Readers for other language sets are loaded lazily inside each worker.
+    """
+    global _executor, _executor_key
+    torch_threads = torch_threads_per_worker(workers)
+    key = (workers, torch_threads)
+    with _executor_lock:
+        if _executor is None or _executor_key != key:
+            if _executor is not None:
+                _executor.shutdown(wait=True)
+            logger.info(f"Starting {workers} OCR worker processes "
+                        f"with {torch_threads} torch threads each")
+            _executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context(config.OCR_START_METHOD),
+                initializer=_init_worker,
+                initargs=(torch_threads, list(languages))
+            )
+            _executor_key = key
+        return _executor
+
+
+def shutdown_executor():
+    global _executor, _executor_key
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+        _executor = None
+        _executor_key = None
+
+
+atexit.register(shutdown_executor)
+
+
+def page_chunks(total_pages: int, workers: int,
+                chunk_pages: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Split 1..total_pages into (first_page, last_page) chunks.
+    By default aims for about four chunks per worker to balance uneven pages.
+    """
+    if chunk_pages is None:
+        chunk_pages = config.PARALLEL_CHUNK_PAGES
+    if chunk_pages <= 0:
+        chunk_pages = max(1, math.ceil(total_pages / (workers * 4)))
+    return [(first, min(first + chunk_pages - 1, total_pages))
+            for first in range(1, total_pages + 1, chunk_pages)]
+
+
+def submit_page_range(pdf_path: str, languages: List[str], dpi: Union[int, str], first_page: int,
+                      last_page: int, workers: int, pages_in_flight: Optional[int] = None,
+                      mode: str = 'full', page_boxes: Optional[Dict[int, Dict]] = None,
+                      text_pages: Optional[Dict[int, List[Dict]]] = None) -> Future:
+    """
+    Submit one range of PDF pages to the worker pool (see ocr.ocr_pdf_pages
+    for `mode`, `page_boxes` and `text_pages`)
+    """
+    executor = get_executor(workers, languages)
+    if page_boxes:
+        # Only this range's boxes cross the process boundary
+        page_boxes = {page: boxes for page, boxes in page_boxes.items() if first_page <= page <= last_page}
+    if text_pages is not None:
+        text_pages = {page: blocks for page, blocks in text_pages.items() if first_page <= page <= last_page}
+    return executor.submit(_ocr_page_range, pdf_path, list(languages), dpi,
+                           first_page, last_page, pages_in_flight, mode, page_boxes, text_pages)
+
+
+def ocr_pdf_parallel(pdf_path: str, languages: List[str], dpi: Union[int, str], total_pages: int,
+                     workers: int, pages_in_flight: Optional[int] = None,
+                     progress: Optional[Callable[[int, int], None]] = None,
+                     mode: str = 'full', page_boxes: Optional[Dict[int, Dict]] = None,
+                     text_pages: Optional[Dict[int, List[Dict]]] = None) -> List[Dict]:
+    """
+    OCR all pages of a PDF across the worker pool
+
+    Each worker rasterizes its own chunk, so only page results cross process
+    boundaries. Returns page dicts in page order, same as ocr.ocr_pdf_pages.
+    progress(pages_done, total_pages) is called as each chunk completes.
+    """
+    chunks = page_chunks(total_pages, workers)
+    logger.info(f"Dispatching {total_pages} pages in {len(chunks)} chunks to {workers} workers")
+    try:
+        futures = [submit_page_range(pdf_path, languages, dpi, first, last,
+                                     workers, pages_in_flight, mode, page_boxes, text_pages)
+                   for first, last in chunks]
+        if progress is not None:
+            pages_done = 0
+            for future in as_completed(futures):
+                pages_done += len(future.result())
+                progress(pages_done, total_pages)
+        pages = []
+        for future in futures:
+            pages.extend(future.result())
+        return pages
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM-killed); start fresh on the next call
+        shutdown_executor()
+        raise
+
+
+def iter_pdf_parallel(pdf_path: str, languages: List[str], dpi: Union[int, str], total_pages: int,
+                      workers: int, pages_in_flight: Optional[int] = None,
+                      text_pages: Optional[Dict[int, List[Dict]]] = None) -> Iterator[Dict]:
+    """
+    Yield page dicts in page order as the worker pool finishes each chunk.
+    Chunks that have not started are cancelled if the consumer stops early.
+    """
+    futures = [submit_page_range(pdf_path, languages, dpi, first, last, workers, pages_in_flight,
+                                 text_pages=text_pages)
+               for first, last in page_chunks(total_pages, workers)]
+    try:
+        for future in futures:
+            yield from future.result()
+    except BrokenProcessPool:
+        shutdown_executor()
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,289 @@
+"""
+Image preprocessing
+Normalizes images before detection (first frame, EXIF orientation, 8-bit
+depth) and shrinks them to the smallest input that still reads the same:
+grayscale, downscale to a target text height or maximum side, and optional
+deskew and adaptive binarization. Boxes found on the processed image are
+mapped back to the coordinates of the upright original.
+"""
+import io
+from typing import Dict, List, Optional, Tuple, Union
+import logging
+
+import numpy as np
+from PIL import Image, ImageOps
+
+import config
+from metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# OpenCV is imported by the functions that use it: loading cv2 adds a
+# noticeable share of startup that --help or /api/health don't need
+
+# Longest side of the copy used to estimate text height and skew
+PROBE_SIDE = 1600
+# Fewer text-like components than this and the text height is unknown
+MIN_TEXT_COMPONENTS = 10
+# Scales closer to 1 than this are not worth a resample
+MIN_RESCALE = 0.9
+
+
+def to_8bit(img: np.ndarray) -> np.ndarray:
+    """
+    Scale 16-bit, 32-bit and float images to 8 bits, stretching the range
+    actually used (e.g. 12-bit scans stored as 16-bit)
+    """
+    import cv2
+    if img.dtype == np.uint8:
+        return img
+    peak = float(img.max()) if img.size else 0.0
+    if np.issubdtype(img.dtype, np.floating) and peak <= 1.0:
+        peak = 1.0
+    if peak <= 0:
+        return np.zeros(img.shape, np.uint8)
+    if np.issubdtype(img.dtype, np.integer) and peak <= 255:
+        return img.astype(np.uint8)
+    return cv2.convertScaleAbs(img, alpha=255.0 / peak)
+
+
+def pil_to_array(img: Image.Image) -> np.ndarray:
+    """
+    The current frame of an open PIL image as an RGB or grey array, EXIF
+    orientation applied (bit depth is kept; see to_8bit)
+    """
+    img = ImageOps.exif_transpose(img)
+    if img.mode in ('L', 'I', 'I;16', 'I;16B', 'I;16L', 'F'):
+        return np.array(img)
+    if img.mode in ('1', 'LA'):
+        return np.array(img.convert('L'))
+    return np.array(img.convert('RGB'))
+
+
+def _decode_pil(data: Union[str, bytes]) -> np.ndarray:
+    # Formats OpenCV cannot decode (e.g. GIF); PIL opens on the first frame
+    with Image.open(data if isinstance(data, str) else io.BytesIO(data)) as img:
+        return pil_to_array(img)
+
+
+def decode(data: Union[str, bytes]) -> np.ndarray:
+    """
+    Decode an image file or bytes into an 8-bit RGB or grey array
+
+    Multi-frame files (GIF, TIFF) give their first frame, EXIF orientation
+    is applied, and deeper images are scaled to 8 bits with to_8bit.
+    """
+    import cv2
+    buf = np.fromfile(data, np.uint8) if isinstance(data, str) else np.frombuffer(data, np.uint8)
+    # Keeps bit depth and grey layout; OpenCV applies EXIF orientation itself
+    img = cv2.imdecode(buf, cv2.IMREAD_ANYDEPTH | cv2.IMREAD_ANYCOLOR)
+    if img is None:
+        img = _decode_pil(data)
+    elif img.ndim == 3:
+        code = cv2.COLOR_BGRA2RGB if img.shape[2] == 4 else cv2.COLOR_BGR2RGB
+        img = cv2.cvtColor(img, code)
+    return to_8bit(img)
+
+
+def to_grey(img: np.ndarray) -> np.ndarray:
+    """Single-channel copy of an RGB, RGBA or grey image"""
+    import cv2
+    if img.ndim == 2:
+        return img
+    if img.ndim == 3 and img.shape[2] == 1:
+        return img[:, :, 0]
+    code = cv2.COLOR_RGBA2GRAY if img.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+    return cv2.cvtColor(img, code)
+
+
+def to_rgb(img: np.ndarray) -> np.ndarray:
+    """Three-channel RGB copy of a grey or RGBA image (RGB is returned as is)"""
+    import cv2
+    if img.ndim == 3 and img.shape[2] == 3:
+        return img
+    if img.ndim == 3 and img.shape[2] == 4:
+        return cv2.cvtColor(img, cv2.COLOR_RGBA2RGB)
+    return cv2.cvtColor(to_grey(img), cv2.COLOR_GRAY2RGB)
+
+
+def _probe(grey: np.ndarray) -> Tuple[np.ndarray, float]:
+    # Downscaled copy for the estimates below, and its scale
+    import cv2
+    scale = min(1.0, PROBE_SIDE / max(grey.shape[:2]))
+    if scale < 1.0:
+        grey = cv2.resize(grey, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return grey, scale
+
+
+def ink_mask(grey: np.ndarray) -> np.ndarray:
+    """
+    Otsu mask of the ink (non-zero) pixels, whether text is dark on light
+    or light on dark
+    """
+    import cv2
+    _, mask = cv2.threshold(grey, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    # Ink is the minority of the page; otherwise the polarity is reversed
+    if cv2.countNonZero(mask) > mask.size // 2:
+        mask = cv2.bitwise_not(mask)
+    return mask
+
+
+def estimate_text_height(grey: np.ndarray) -> Optional[float]:
+    """
+    Median height in pixels of character-like connected components, or None
+    when the image has too few of them to tell
+    """
+    import cv2
+    probe, scale = _probe(grey)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(ink_mask(probe), connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    # Glyphs: not specks, not lines or rules, not whole figures
+    text_like = ((heights >= 4) & (heights <= probe.shape[0] * 0.1) &
+                 (widths <= heights * 3) & (areas >= 8))
+    if np.count_nonzero(text_like) < MIN_TEXT_COMPONENTS:
+        return None
+    return float(np.median(heights[text_like])) / scale
+
+
+def target_scale(img: np.ndarray, grey: np.ndarray) -> float:
+    """
+    Downscale factor (at most 1) meeting config.PREPROCESS_MAX_SIDE and
+    bringing the median text height down to config.PREPROCESS_TARGET_TEXT_HEIGHT
+    """
+    scale = 1.0
+    if config.PREPROCESS_MAX_SIDE > 0:
+        scale = min(scale, config.PREPROCESS_MAX_SIDE / max(img.shape[:2]))
+    if config.PREPROCESS_TARGET_TEXT_HEIGHT > 0:
+        text_height = estimate_text_height(grey)
+        if text_height:
+            scale = min(scale, config.PREPROCESS_TARGET_TEXT_HEIGHT / text_height)
+    return scale
+
+
+def estimate_skew(grey: np.ndarray, max_angle: float) -> float:
+    """
+    Skew angle in degrees (counter-clockwise) that makes text lines
+    horizontal: the rotation whose row profile of ink is sharpest
+    """
+    import cv2
+    probe, _ = _probe(grey)
+    mask = ink_mask(probe)
+    h, w = mask.shape
+    center = (w / 2, h / 2)
+
+    def sharpness(angle: float) -> float:
+        rotation = cv2.getRotationMatrix2D(center, angle, 1.0)
+        rows = cv2.warpAffine(mask, rotation, (w, h), flags=cv2.INTER_NEAREST).sum(axis=1, dtype=np.float64)
+        return float(np.var(rows))
+
+    coarse = np.arange(-max_angle, max_angle + 0.25, 0.5)
+    best = max(coarse, key=sharpness)
+    fine = np.arange(best - 0.4, best + 0.45, 0.1)
+    return float(max(fine, key=sharpness))
+
+
+def rotate(img: np.ndarray, angle: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rotate an image about its center on a canvas grown to fit, filling with
+    white. Returns the image and the 2x3 affine matrix applied.
+    """
+    import cv2
+    h, w = img.shape[:2]
+    rotation = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    cos, sin = abs(rotation[0, 0]), abs(rotation[0, 1])
+    new_w, new_h = int(round(h * sin + w * cos)), int(round(h * cos + w * sin))
+    rotation[0, 2] += (new_w - w) / 2
+    rotation[1, 2] += (new_h - h) / 2
+    border = 255 if img.ndim == 2 else (255,) * img.shape[2]
+    rotated = cv2.warpAffine(img, rotation, (new_w, new_h), flags=cv2.INTER_LINEAR,
+                             borderMode=cv2.BORDER_CONSTANT, borderValue=border)
+    return rotated, rotation
+
+
+def _compose(outer: np.ndarray, inner: np.ndarray) -> np.ndarray:
+    # Affine matrix applying `inner`, then `outer`
+    return (np.vstack([outer, [0, 0, 1]]) @ np.vstack([inner, [0, 0, 1]]))[:2]
+
+
+def preprocess(img: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Run the configured preprocessing stages on a decoded image
+
+    Args:
+        img: 8-bit RGB or grey image array (see decode)
+
+    Returns:
+        (processed image, 2x3 affine matrix from original to processed
+        coordinates, or None when the geometry is unchanged). The image is
+        grey when grayscale or binarization is enabled, RGB otherwise.
+    """
+    import cv2
+    img = to_8bit(img)
+    if not config.PREPROCESS_ENABLED:
+        return img, None
+
+    matrix = None
+    grey_output = config.PREPROCESS_GRAYSCALE or config.PREPROCESS_BINARIZE
+    with stage('grayscale'):
+        grey = to_grey(img)
+    if grey_output:
+        img = grey
+    elif img.ndim == 2 or img.shape[2] != 3:
+        img = cv2.cvtColor(img, cv2.COLOR_GRAY2RGB if img.ndim == 2 else cv2.COLOR_RGBA2RGB)
+
+    with stage('downscale'):
+        scale = target_scale(img, grey)
+        if scale < MIN_RESCALE:
+            h, w = img.shape[:2]
+            size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+            img = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+            grey = img if grey_output else to_grey(img)
+            matrix = np.array([[size[0] / w, 0, 0], [0, size[1] / h, 0]])
+            logger.debug(f"Downscaled {w}x{h} image to {size[0]}x{size[1]}")
+
+    if config.PREPROCESS_DESKEW:
+        with stage('deskew'):
+            angle = estimate_skew(grey, config.PREPROCESS_DESKEW_MAX_ANGLE)
+            if abs(angle) >= 0.1:
+                img, rotation = rotate(img, angle)
+                matrix = rotation if matrix is None else _compose(rotation, matrix)
+                logger.debug(f"Deskewed image by {angle:.1f} degrees")
+
+    if config.PREPROCESS_BINARIZE:
+        with stage('binarize'):
+            img = cv2.adaptiveThreshold(img, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+                                        config.PREPROCESS_BINARIZE_BLOCK | 1,
+                                        config.PREPROCESS_BINARIZE_C)
+    return img, matrix
+
+
+def to_original(results: List, matrix: Optional[np.ndarray]) -> List:
+    """
+    Map raw EasyOCR results (bbox, text, confidence) found on a processed
+    image back to the original image's coordinates
+    """
+    import cv2
+    if matrix is None:
+        return results
+    inverse = cv2.invertAffineTransform(matrix)
+    mapped = []
+    for bbox, text, confidence in results:
+        points = np.asarray(bbox, dtype=np.float64) @ inverse[:, :2].T + inverse[:, 2]
+        mapped.append((points.tolist(), text, confidence))
+    return mapped
+
+
+def preprocess_settings() -> Optional[Dict]:
+    """Settings that change preprocessing output, for result cache keys"""
+    if not config.PREPROCESS_ENABLED:
+        return None
+    return {
+        'grayscale': config.PREPROCESS_GRAYSCALE,
+        'max_side': config.PREPROCESS_MAX_SIDE,
+        'target_text_height': config.PREPROCESS_TARGET_TEXT_HEIGHT,
+        'deskew': config.PREPROCESS_DESKEW and config.PREPROCESS_DESKEW_MAX_ANGLE,
+        'binarize': config.PREPROCESS_BINARIZE and [config.PREPROCESS_BINARIZE_BLOCK,
+                                                    config.PREPROCESS_BINARIZE_C]
+    }
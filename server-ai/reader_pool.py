@@ -0,0 +1,205 @@
+"""
+EasyOCR reader pool
+Keeps one warm reader per language set, bounded by a memory budget
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+
+import config
+from inference import create_reader
+from metrics import READER_LOAD_SECONDS, READER_LOADS, stage
+
+logger = logging.getLogger(__name__)
+
+LanguageKey = Tuple[str, ...]
+
+
+def normalize_languages(languages: Iterable[str]) -> LanguageKey:
+    """
+    Normalize a list of language codes into a hashable pool key.
+    ['EN', 'es', 'en'] and ['es', 'en'] both map to ('en', 'es').
+    """
+    codes = {str(lang).strip().lower() for lang in languages if str(lang).strip()}
+    if not codes:
+        codes = {'en'}
+    return tuple(sorted(codes))
+
+
+def estimate_reader_size(reader) -> int:
+    """
+    Estimate the resident size of a reader in bytes from its model tensors
+    """
+    total = 0
+    for attr in ('detector', 'recognizer'):
+        model = getattr(reader, attr, None)
+        if model is None:
+            continue
+        try:
+            for tensor in list(model.parameters()) + list(model.buffers()):
+                total += tensor.numel() * tensor.element_size()
+        except AttributeError:
+            # Not a torch module (e.g. a stub in tooling); nothing to count
+            continue
+    return total
+
+
+class _PoolEntry:
+    __slots__ = ('reader', 'size_bytes', 'load_time', 'hits', 'loaded_at', 'last_used')
+
+    def __init__(self, reader, size_bytes: int, load_time: float):
+        self.reader = reader
+        self.size_bytes = size_bytes
+        self.load_time = load_time
+        self.hits = 0
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+
+
+class ReaderPool:
+    """
+    LRU pool of EasyOCR readers keyed by normalized language set.
+
+    Readers are loaded on first use (or preloaded), reused on later calls and
+    evicted least-recently-used first once the estimated resident size of the
+    pool exceeds the memory budget. The most recently loaded reader is never
+    evicted, so a single reader larger than the budget still works.
+    """
+
+    def __init__(self, max_memory_mb: float = config.READER_POOL_MAX_MB,
+                 factory: Optional[Callable[[List[str]], object]] = None):
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024)
+        self._factory = factory or self._create_reader
+        self._entries: 'OrderedDict[LanguageKey, _PoolEntry]' = OrderedDict()
+        self._loading: Dict[LanguageKey, threading.Event] = {}
+        self._lock = threading.Lock()
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _create_reader(languages: List[str]):
+        return create_reader(languages)
+
+    def get(self, languages: Iterable[str] = ('en',)):
+        """
+        Get a warm reader for the given languages, loading it if needed
+        """
+        key = normalize_languages(languages)
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.hits += 1
+                    entry.last_used = time.time()
+                    self._entries.move_to_end(key)
+                    return entry.reader
+
+                pending = self._loading.get(key)
+                if pending is None:
+                    # This thread loads the reader; others wait on the event
+                    pending = threading.Event()
+                    self._loading[key] = pending
+                    self.misses += 1
+                    break
+
+            pending.wait()
+
+        try:
+            return self._load(key)
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+            pending.set()
+
+    def _load(self, key: LanguageKey):
+        logger.info(f"Initializing EasyOCR reader with languages: {list(key)}")
+        start = time.perf_counter()
+        with stage('reader_load'):
+            reader = self._factory(list(key))
+        load_time = time.perf_counter() - start
+        READER_LOADS.inc(languages='+'.join(key))
+        READER_LOAD_SECONDS.observe(load_time, languages='+'.join(key))
+        size_bytes = estimate_reader_size(reader)
+        logger.info(f"Reader {list(key)} loaded in {load_time:.2f}s "
+                    f"({size_bytes / (1024 * 1024):.1f} MB)")
+
+        with self._lock:
+            self._entries[key] = _PoolEntry(reader, size_bytes, load_time)
+            self._entries.move_to_end(key)
+            self._evict_over_budget(keep=key)
+        return reader
+
+    def _evict_over_budget(self, keep: LanguageKey):
+        # Caller holds self._lock. In-flight callers keep their own reference,
+        # so an evicted reader is freed once they finish.
+        while self._resident_bytes() > self.max_memory_bytes:
+            victim = next((k for k in self._entries if k != keep), None)
+            if victim is None:
+                break
+            entry = self._entries.pop(victim)
+            self.evictions += 1
+            logger.info(f"Evicting reader {list(victim)} "
+                        f"({entry.size_bytes / (1024 * 1024):.1f} MB, {entry.hits} hits)")
+
+    def _resident_bytes(self) -> int:
+        return sum(entry.size_bytes for entry in self._entries.values())
+
+    def preload(self, language_sets: Iterable[Iterable[str]]):
+        """
+        Load the given language sets ahead of the first request
+        """
+        for languages in language_sets:
+            try:
+                self.get(languages)
+            except Exception as e:
+                logger.error(f"Failed to preload reader {list(languages)}: {str(e)}")
+
+    def evict(self, languages: Iterable[str]) -> bool:
+        """
+        Drop the reader for a language set. Returns True if one was cached.
+        """
+        with self._lock:
+            return self._entries.pop(normalize_languages(languages), None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """
+        Pool-level and per-reader statistics
+        """
+        with self._lock:
+            readers = [{
+                'languages': list(key),
+                'hits': entry.hits,
+                'load_time': round(entry.load_time, 3),
+                'size_mb': round(entry.size_bytes / (1024 * 1024), 1),
+                'loaded_at': entry.loaded_at,
+                'last_used': entry.last_used
+            } for key, entry in self._entries.items()]
+            return {
+                'readers': readers,
+                'resident_mb': round(self._resident_bytes() / (1024 * 1024), 1),
+                'max_memory_mb': round(self.max_memory_bytes / (1024 * 1024), 1),
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+_pool: Optional[ReaderPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_reader_pool() -> ReaderPool:
+    """
+    Get the process-wide reader pool
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ReaderPool()
+    return _pool
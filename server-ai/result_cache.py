@@ -0,0 +1,232 @@
+"""
+Content-addressed OCR result cache
+In-memory LRU tier with an optional SQLite tier on disk
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import logging
+
+import numpy as np
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Content hash of a file, read in chunks
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_bytes(data: bytes, *extra: str) -> str:
+    """
+    Content hash of in-memory data, optionally salted with shape or type info
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    for item in extra:
+        digest.update(item.encode())
+    digest.update(data)
+    return digest.hexdigest()
+
+
+def hash_array(img: np.ndarray) -> str:
+    """
+    Content hash of a numpy array (pixels, shape and dtype), hashing
+    contiguous arrays and memory maps in place instead of copying them
+    """
+    return hash_bytes(memoryview(np.ascontiguousarray(img)).cast('B'), str(img.shape), str(img.dtype))
+
+
+def hash_image(img) -> str:
+    """
+    Content hash of a decoded PIL image (pixels, size and mode)
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"{img.mode}:{img.size[0]}x{img.size[1]}".encode())
+    digest.update(img.tobytes())
+    return digest.hexdigest()
+
+
+def make_key(kind: str, content_hash: str, **params) -> str:
+    """
+    Cache key from a content hash plus every parameter that affects output
+    """
+    payload = json.dumps({'kind': kind, 'hash': content_hash, 'params': params},
+                         sort_keys=True, default=list)
+    return hashlib.blake2b(payload.encode(), digest_size=20).hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier cache of JSON-serializable OCR results.
+
+    Values are stored as JSON text, so callers always get a fresh copy they
+    can modify. The memory tier is bounded by entry count; the disk tier by
+    total size, checked every `trim_every` puts rather than on each one
+    (the SQLite file may be shared by several worker processes, so the
+    size is summed from the table, not tracked in memory). Both tiers
+    expire entries after `ttl` seconds (0 = never).
+    """
+
+    def __init__(self, max_entries: int = config.RESULT_CACHE_MAX_ENTRIES,
+                 disk_path: Optional[str] = config.RESULT_CACHE_PATH or None,
+                 max_disk_mb: float = config.RESULT_CACHE_MAX_DISK_MB,
+                 ttl: float = config.RESULT_CACHE_TTL,
+                 trim_every: int = config.RESULT_CACHE_TRIM_EVERY):
+        self.max_entries = max_entries
+        self.max_disk_bytes = int(max_disk_mb * 1024 * 1024)
+        self.ttl = ttl
+        self.trim_every = max(1, trim_every)
+        self._puts_since_trim = 0
+        self._memory: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.counters = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'puts': 0,
+            'evictions': 0
+        }
+        if disk_path:
+            self._open_disk(disk_path)
+
+    def _open_disk(self, disk_path: str):
+        directory = os.path.dirname(os.path.abspath(disk_path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(disk_path, timeout=30, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            ' key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,'
+            ' created REAL NOT NULL, accessed REAL NOT NULL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)')
+        logger.info(f"Result cache disk tier at {disk_path}")
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl > 0 and now - created > self.ttl
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Look up a cached value. Returns None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, value = entry
+                if not self._expired(created, now):
+                    self._memory.move_to_end(key)
+                    self.counters['memory_hits'] += 1
+                    return json.loads(value)
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute('SELECT value, created FROM results WHERE key = ?',
+                                       (key,)).fetchone()
+                if row is not None:
+                    value, created = row
+                    if not self._expired(created, now):
+                        self._db.execute('UPDATE results SET accessed = ? WHERE key = ?', (now, key))
+                        self._put_memory(key, value, created)
+                        self.counters['disk_hits'] += 1
+                        return json.loads(value)
+                    self._db.execute('DELETE FROM results WHERE key = ?', (key,))
+
+            self.counters['misses'] += 1
+            return None
+
+    def put(self, key: str, value: Any):
+        """
+        Store a JSON-serializable value in both tiers
+        """
+        now = time.time()
+        data = json.dumps(value)
+        with self._lock:
+            self.counters['puts'] += 1
+            self._put_memory(key, data, now)
+            if self._db is not None:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO results (key, value, size, created, accessed) '
+                    'VALUES (?, ?, ?, ?, ?)', (key, data, len(data), now, now)
+                )
+                self._puts_since_trim += 1
+                if self._puts_since_trim >= self.trim_every:
+                    self._trim_disk(now)
+
+    def _put_memory(self, key: str, data: str, created: float):
+        # Caller holds self._lock
+        self._memory[key] = (created, data)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.counters['evictions'] += 1
+
+    def _trim_disk(self, now: float):
+        # Caller holds self._lock
+        self._puts_since_trim = 0
+        if self.ttl > 0:
+            self._db.execute('DELETE FROM results WHERE created < ?', (now - self.ttl,))
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        # Drop least recently accessed rows until back under budget
+        excess = total - self.max_disk_bytes
+        for key, size in self._db.execute(
+                'SELECT key, size FROM results ORDER BY accessed').fetchall():
+            self._db.execute('DELETE FROM results WHERE key = ?', (key,))
+            self.counters['evictions'] += 1
+            excess -= size
+            if excess <= 0:
+                break
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM results')
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.counters)
+            stats['memory_entries'] = len(self._memory)
+            if self._db is not None:
+                count, size = self._db.execute(
+                    'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results').fetchone()
+                stats['disk_entries'] = count
+                stats['disk_mb'] = round(size / (1024 * 1024), 2)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 3) if lookups else 0.0
+        return stats
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """
+    Get the process-wide result cache, or None when caching is disabled
+    """
+    global _cache
+    if not config.RESULT_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResultCache()
+    return _cache
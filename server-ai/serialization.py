@@ -0,0 +1,154 @@
+"""
+Result serialization
+Compact columnar form of detailed results, and fast encoders (orjson,
+msgpack) used when they are installed
+"""
+import json
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Output formats: the default dict format, and the compact columnar format
+# as JSON or MessagePack
+FORMAT_JSON = 'json'
+FORMAT_COMPACT = 'compact'
+FORMAT_MSGPACK = 'msgpack'
+
+JSON_MIMETYPE = 'application/json'
+COMPACT_MIMETYPE = 'application/vnd.ocr.compact+json'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+
+
+class TextBlocks:
+    """
+    Text blocks stored by column: texts, confidences and an (n, 4, 2) int32
+    array of box corner points, instead of one dict per block
+    """
+    __slots__ = ('texts', 'confidences', 'boxes')
+
+    def __init__(self, texts: List[str], confidences: np.ndarray, boxes: np.ndarray):
+        self.texts = texts
+        self.confidences = confidences
+        self.boxes = boxes
+
+    @classmethod
+    def from_blocks(cls, text_blocks: List[Dict]) -> 'TextBlocks':
+        """Build from text block dicts ({'text', 'confidence', 'bbox'})"""
+        count = len(text_blocks)
+        confidences = np.fromiter((block['confidence'] for block in text_blocks), np.float64, count)
+        boxes = np.array([block['bbox'] for block in text_blocks], dtype=np.int32).reshape(count, 4, 2)
+        return cls([block['text'] for block in text_blocks], confidences, boxes)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def to_blocks(self) -> List[Dict]:
+        """Back to text block dicts, as in the default format"""
+        return [{'text': text, 'confidence': float(confidence), 'bbox': box}
+                for text, confidence, box in zip(self.texts, self.confidences, self.boxes.tolist())]
+
+    def to_dict(self) -> Dict:
+        """
+        Columns for encoding: 'boxes' holds eight ints per block
+        (x0, y0, ... x3, y3, clockwise from top-left)
+        """
+        return {
+            'texts': self.texts,
+            'confidences': np.round(self.confidences, 4),
+            'boxes': self.boxes.reshape(len(self), 8)
+        }
+
+
+def compact_result(result: Any) -> Any:
+    """
+    Copy of a detailed result (image, PDF or batch) with each 'text_blocks'
+    list replaced by a columnar 'blocks' entry (see TextBlocks.to_dict)
+    """
+    if not isinstance(result, dict):
+        return result
+    compact = {}
+    for key, value in result.items():
+        if key == 'text_blocks':
+            compact['blocks'] = TextBlocks.from_blocks(value).to_dict()
+        elif key in ('pages', 'files'):
+            compact[key] = [compact_result(item) for item in value]
+        else:
+            compact[key] = value
+    compact['format'] = FORMAT_COMPACT
+    return compact
+
+
+def _default(obj: Any) -> Any:
+    # numpy values for encoders without native numpy support
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def dumps_json(obj: Any, pretty: bool = False) -> bytes:
+    """
+    Encode as UTF-8 JSON with orjson when installed (numpy arrays are
+    encoded natively), falling back to the json module
+    """
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(obj, default=_default, option=option)
+    if pretty:
+        return json.dumps(obj, default=_default, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj, default=_default, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def dumps_msgpack(obj: Any) -> bytes:
+    """Encode as MessagePack (requires the msgpack package)"""
+    if msgpack is None:
+        raise RuntimeError('MessagePack output requires the msgpack package')
+    return msgpack.packb(obj, default=_default, use_bin_type=True)
+
+
+def available_formats() -> List[str]:
+    """Output formats usable in this environment"""
+    formats = [FORMAT_JSON, FORMAT_COMPACT]
+    if msgpack is not None:
+        formats.append(FORMAT_MSGPACK)
+    return formats
+
+
+def format_for_mimetype(mimetype: str) -> str:
+    """Output format for a negotiated response mimetype"""
+    if mimetype in MSGPACK_MIMETYPES:
+        return FORMAT_MSGPACK
+    if mimetype == COMPACT_MIMETYPE:
+        return FORMAT_COMPACT
+    return FORMAT_JSON
+
+
+def offered_mimetypes() -> List[str]:
+    """Response mimetypes the API can produce, default first"""
+    offers = [JSON_MIMETYPE, COMPACT_MIMETYPE]
+    if msgpack is not None:
+        offers.extend(MSGPACK_MIMETYPES)
+    return offers
+
+
+def encode(obj: Any, output_format: str) -> Tuple[bytes, str]:
+    """
+    Encode a response body in a compact output format
+
+    Returns:
+        (encoded bytes, mimetype)
+    """
+    if output_format == FORMAT_MSGPACK:
+        return dumps_msgpack(obj), MSGPACK_MIMETYPES[0]
+    return dumps_json(obj), COMPACT_MIMETYPE
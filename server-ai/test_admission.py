@@ -0,0 +1,184 @@
+"""
+Admission Control Test
+Checks cost estimates, token bucket refill, the in-flight budget, the
+413/429/503 rejections with their Retry-After, and how clients are
+identified for their rate limits
+"""
+
+import io
+import math
+
+import pytest
+from PIL import Image
+
+import admission
+import app
+import config
+from admission import AdmissionController, AdmissionRejected, file_cost
+from api_common import client_key
+
+
+class Clock:
+    """Stands in for time.monotonic in admission"""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admission, 'time', clock)
+    return clock
+
+
+def png_bytes(width, height):
+    buffer = io.BytesIO()
+    Image.new('L', (width, height), 255).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def rejection(controller, *args, **kwargs):
+    with pytest.raises(AdmissionRejected) as info:
+        controller.admit(*args, **kwargs)
+    return info.value
+
+
+def test_file_cost(monkeypatch):
+    """Images cost one page per ADMISSION_PAGE_PIXELS pixels, at least one"""
+    monkeypatch.setattr(config, 'ADMISSION_PAGE_PIXELS', 1000 * 1000)
+    assert file_cost(png_bytes(100, 100), 'small.png') == 1.0
+    assert file_cost(png_bytes(2000, 1500), 'large.png') == 3.0
+    assert file_cost(b'not an image', 'broken.png') == 1.0
+
+
+def test_bucket_refill(clock):
+    """A client spends its burst, then refills at client_rate pages per second"""
+    controller = AdmissionController(max_inflight=0, client_rate=2, client_burst=10)
+    controller.admit('a', 8, hold=False)
+    error = rejection(controller, 'a', 4, hold=False)
+    assert (error.status, error.retry_after) == (429, 1)
+    # Another client has its own bucket
+    controller.admit('b', 10, hold=False)
+
+    clock.now += 1
+    controller.admit('a', 4, hold=False)
+    error = rejection(controller, 'a', 7, hold=False)
+    assert (error.status, error.retry_after) == (429, 4)
+    clock.now += 100
+    controller.admit('a', 10, hold=False)
+
+
+def test_oversized_request_leaves_debt(clock):
+    """A request larger than the burst needs a full bucket and leaves it in debt"""
+    controller = AdmissionController(max_inflight=0, client_rate=1, client_burst=10)
+    controller.admit('a', 25, hold=False)
+    error = rejection(controller, 'a', 1, hold=False)
+    assert error.retry_after == 16
+    clock.now += 16
+    controller.admit('a', 1, hold=False)
+
+
+def test_retry_after_capped(clock, monkeypatch):
+    monkeypatch.setattr(config, 'ADMISSION_MAX_RETRY_AFTER', 30)
+    controller = AdmissionController(max_inflight=0, client_rate=0.01, client_burst=10)
+    controller.admit('a', 10, hold=False)
+    assert rejection(controller, 'a', 5, hold=False).retry_after == 30
+
+
+def test_inflight_budget(clock):
+    """Held work shares max_inflight pages; 503 past it unless the process is idle"""
+    controller = AdmissionController(max_inflight=10, client_rate=0)
+    # An idle process admits any single request
+    ticket = controller.admit('a', 25)
+    assert rejection(controller, 'b', 1).status == 503
+    clock.now += 5
+    controller.release(ticket)
+    assert controller.stats()['inflight_pages'] == 0
+
+    first = controller.admit('a', 6)
+    error = rejection(controller, 'b', 6)
+    # 2 pages over budget at the seconds per page measured so far
+    assert error.status == 503
+    assert error.retry_after == math.ceil(2 * controller.stats()['seconds_per_page'])
+    # Queued jobs do not hold the budget
+    controller.admit('b', 6, hold=False)
+    controller.admit('b', 4)
+    controller.release(first)
+    assert controller.stats()['inflight_pages'] == 4
+
+
+def test_request_limits(clock):
+    controller = AdmissionController(max_inflight=0, client_rate=0, max_files=2, max_request_pages=50)
+    assert rejection(controller, 'a', 2, files=3).status == 413
+    error = rejection(controller, 'a', 51, files=1)
+    assert (error.status, error.retry_after) == (413, None)
+    controller.admit('a', 50, files=2)
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    """Admission enabled with a controller the test configures"""
+    monkeypatch.setattr(config, 'ADMISSION_ENABLED', True)
+    monkeypatch.setattr(config, 'ADMISSION_CLIENT_HEADER', '')
+    controller = AdmissionController(max_inflight=10, client_rate=1, client_burst=5, max_files=2)
+    monkeypatch.setattr(admission, '_controller', controller)
+    return controller
+
+
+def post_image(files=1):
+    client = app.app.test_client()
+    return client.post('/api/process', data={
+        'files': [(io.BytesIO(png_bytes(50, 50)), f'{index}.png') for index in range(files)]
+    })
+
+
+def test_rejections_over_http(controller, clock):
+    """Rejections answer before any OCR runs, with Retry-After when retrying helps"""
+    controller.admit('127.0.0.1', 5, hold=False)
+    response = post_image()
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '1'
+    assert response.json['success'] is False
+
+    clock.now += 10
+    ticket = controller.admit('other', 10)
+    response = post_image()
+    assert response.status_code == 503
+    assert int(response.headers['Retry-After']) >= 1
+    controller.release(ticket)
+
+    response = post_image(files=3)
+    assert response.status_code == 413
+    assert 'Retry-After' not in response.headers
+
+
+def test_client_key_ignores_forged_forwarded_for(monkeypatch):
+    """A forged leading X-Forwarded-For entry does not change the client"""
+    monkeypatch.setattr(config, 'ADMISSION_CLIENT_HEADER', 'X-Forwarded-For')
+    monkeypatch.setattr(config, 'ADMISSION_TRUSTED_PROXIES', 1)
+    honest = client_key({'X-Forwarded-For': '203.0.113.7'}, '10.0.0.1')
+    forged = client_key({'X-Forwarded-For': '198.51.100.1, 203.0.113.7'}, '10.0.0.1')
+    rotated = client_key({'X-Forwarded-For': '198.51.100.2,203.0.113.7'}, '10.0.0.1')
+    assert honest == forged == rotated == '203.0.113.7'
+
+
+def test_client_key_trusted_proxies(monkeypatch):
+    """With two proxies the client is the second entry from the right"""
+    monkeypatch.setattr(config, 'ADMISSION_CLIENT_HEADER', 'X-Forwarded-For')
+    monkeypatch.setattr(config, 'ADMISSION_TRUSTED_PROXIES', 2)
+    headers = {'X-Forwarded-For': '198.51.100.1, 203.0.113.7, 10.1.2.3'}
+    assert client_key(headers, '10.0.0.1') == '203.0.113.7'
+    assert client_key({'X-Forwarded-For': '203.0.113.7'}, '10.0.0.1') == '203.0.113.7'
+
+
+def test_client_key_fallback(monkeypatch):
+    """Without the header (or with none configured) the peer address is used"""
+    monkeypatch.setattr(config, 'ADMISSION_CLIENT_HEADER', 'X-Forwarded-For')
+    assert client_key({}, '10.0.0.1') == '10.0.0.1'
+    monkeypatch.setattr(config, 'ADMISSION_CLIENT_HEADER', '')
+    assert client_key({'X-Forwarded-For': '203.0.113.7'}, '10.0.0.1') == '10.0.0.1'
+    assert client_key({}, None) == 'unknown'
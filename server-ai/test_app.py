@@ -0,0 +1,20 @@
+"""
+Flask App Test
+Checks that invalid form options are answered with 400 before any OCR runs
+"""
+
+import io
+
+import pytest
+
+import app
+
+
+@pytest.mark.parametrize('path', ['/api/process', '/api/detect', '/api/process/stream', '/api/jobs'])
+@pytest.mark.parametrize('dpi', ['abc', '0', '-300'])
+def test_invalid_dpi(path, dpi):
+    """A bad dpi field gets 400, like bad rois or mode"""
+    client = app.app.test_client()
+    response = client.post(path, data={'dpi': dpi, 'files': (io.BytesIO(b'\x89PNG'), 'a.png')})
+    assert response.status_code == 400
+    assert response.json['error'].startswith('Invalid dpi')
@@ -0,0 +1,84 @@
+"""
+ASGI App Test
+Sends multipart bodies to the Starlette app over raw ASGI, in chunks and
+without Content-Length, and checks the request size limit
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import asgi_app
+
+
+def multipart(fields, files):
+    """Multipart body and its Content-Type header"""
+    request = httpx.Request('POST', 'http://test/', data=fields, files=files)
+    return request.read(), request.headers['content-type']
+
+
+def post(path, body, content_type, chunk_size=1024, headers=()):
+    """
+    POST a body to the app in chunks of chunk_size, without Content-Length
+    (as a chunked upload arrives). Returns (status, JSON body).
+    """
+    chunks = [body[start:start + chunk_size] for start in range(0, len(body), chunk_size)] or [b'']
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'POST',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(b'content-type', content_type.encode())] + list(headers),
+        'client': ('127.0.0.1', 1234), 'server': ('test', 80)
+    }
+    response = {'status': None, 'body': b''}
+
+    async def receive():
+        if chunks:
+            chunk = chunks.pop(0)
+            return {'type': 'http.request', 'body': chunk, 'more_body': bool(chunks)}
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        elif message['type'] == 'http.response.body':
+            response['body'] += message.get('body', b'')
+
+    asyncio.run(asgi_app.app(scope, receive, send))
+    return response['status'], json.loads(response['body'])
+
+
+def test_chunked_upload_over_limit(monkeypatch):
+    """A body past the limit gets 413 even without Content-Length"""
+    monkeypatch.setattr(asgi_app, 'MAX_CONTENT_LENGTH', 4096)
+    body, content_type = multipart({'languages': '["en"]'}, {'files': ('a.png', b'\x89PNG' + b'0' * 10000)})
+    status, data = post('/api/process', body, content_type)
+    assert status == 413
+    assert data['success'] is False
+
+
+def test_chunked_upload_over_limit_with_false_length(monkeypatch):
+    """A Content-Length under the limit does not let a larger body through"""
+    monkeypatch.setattr(asgi_app, 'MAX_CONTENT_LENGTH', 4096)
+    body, content_type = multipart({}, {'files': ('a.png', b'\x89PNG' + b'0' * 10000)})
+    status, _ = post('/api/process', body, content_type, headers=[(b'content-length', b'100')])
+    assert status == 413
+
+
+def test_chunked_form_under_limit(monkeypatch):
+    """A small chunked form is still parsed: no file part gives 400"""
+    monkeypatch.setattr(asgi_app, 'MAX_CONTENT_LENGTH', 4096)
+    body, content_type = multipart({'languages': '["en"]', 'padding': 'x' * 2000}, {'other': ('a.txt', b'')})
+    status, data = post('/api/process', body, content_type, chunk_size=256)
+    assert status == 400
+    assert data['error'] == 'No files uploaded'
+
+
+@pytest.mark.parametrize('path', ['/api/process', '/api/detect', '/api/process/stream', '/api/jobs'])
+def test_invalid_dpi(path):
+    """A bad dpi field gets 400, like bad rois or mode"""
+    body, content_type = multipart({'dpi': 'abc'}, {'files': ('a.png', b'\x89PNG')})
+    status, data = post(path, body, content_type)
+    assert status == 400
+    assert data['error'].startswith('Invalid dpi')
@@ -0,0 +1,137 @@
+"""
+Micro-batching Test
+Runs images through the recognition batcher with a fake reader standing in
+for EasyOCR, and checks that a batch is detected and recognized in one call
+each and that every image gets the same result as OCR without batching
+"""
+
+import io
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import batcher
+import config
+import reader_pool
+from batcher import RecognitionBatcher
+from ocr import process_file, readtext_array
+from preprocessing import to_grey
+
+
+class FakeReader:
+    """
+    Stands in for easyocr.Reader: detects one box around the dark pixels
+    of each image and reads it as its size and mean intensity, so a box
+    recognized on the wrong image or at the wrong place reads differently
+    """
+
+    def __init__(self):
+        self.detect_calls = []
+        self.recognize_calls = 0
+
+    def detect(self, img, reformat=True, canvas_size=2560, **options):
+        images = img if img.ndim == 4 else img[np.newaxis]
+        self.detect_calls.append((len(images), canvas_size))
+        horizontal_lists = []
+        for image in images:
+            ys, xs = np.nonzero(image.mean(axis=2) < 128)
+            if len(xs) == 0:
+                horizontal_lists.append([])
+                continue
+            horizontal_lists.append([[int(xs.min()) - 2, int(xs.max()) + 3, int(ys.min()) - 2, int(ys.max()) + 3]])
+        return horizontal_lists, [[] for _ in images]
+
+    def recognize(self, grey, horizontal_list, free_list, reformat=True, **options):
+        self.recognize_calls += 1
+        height, width = grey.shape
+        results = []
+        for x0, x1, y0, y1 in horizontal_list:
+            x0, x1, y0, y1 = max(0, x0), min(x1, width), max(0, y0), min(y1, height)
+            crop = grey[y0:y1, x0:x1]
+            text = f"{crop.shape[1]}x{crop.shape[0]}:{int(crop.mean())}"
+            results.append(([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], text, 0.9))
+        return results
+
+
+def create_image(width, height, box, fill, channels=3):
+    """Light image with one dark rectangle (x0, y0, x1, y1) of `fill`"""
+    img = np.full((height, width, channels), 240, dtype=np.uint8)
+    x0, y0, x1, y1 = box
+    img[y0:y1, x0:x1] = fill
+    return img
+
+
+@pytest.fixture
+def reader(monkeypatch):
+    fake = FakeReader()
+    monkeypatch.setattr(reader_pool, '_pool', reader_pool.ReaderPool(factory=lambda languages: fake))
+    return fake
+
+
+def test_batch_recognized_in_one_call(reader):
+    """Grey, RGB, RGBA and blank images share one detect and one recognize call"""
+    images = [
+        to_grey(create_image(400, 120, (30, 20, 200, 60), 40)),
+        create_image(380, 110, (10, 10, 370, 100), 90),
+        create_image(400, 120, (300, 70, 390, 110), 10, channels=4),
+        create_image(390, 120, (0, 0, 0, 0), 0)
+    ]
+    expected = [readtext_array(reader, img) for img in images]
+    reader.detect_calls.clear()
+    reader.recognize_calls = 0
+
+    batch = RecognitionBatcher(('en',), window_ms=200)
+    futures = [batch.submit(img) for img in images]
+    results = [future.result(timeout=30) for future in futures]
+
+    assert batch.batches == 1
+    assert reader.detect_calls == [(4, 2560)]
+    assert reader.recognize_calls == 1
+    assert results == expected
+    assert results[3] == []
+
+
+def test_batch_split_by_canvas_size(reader):
+    """Images for the fallback's fast canvas are not batched with the rest"""
+    img = create_image(400, 120, (30, 20, 200, 60), 40)
+    batch = RecognitionBatcher(('en',), window_ms=200)
+    futures = [batch.submit(img), batch.submit(img, canvas_size=1280), batch.submit(img)]
+    results = [future.result(timeout=30) for future in futures]
+
+    assert sorted(reader.detect_calls, key=str) == [(1, 1280), (2, 2560)]
+    assert results[0] == results[1] == results[2]
+
+
+def test_process_file_batched(reader, monkeypatch):
+    """
+    Concurrent image uploads OCRed through the batcher (grey after
+    preprocessing) match unbatched OCR
+    """
+    monkeypatch.setattr(config, 'RESULT_CACHE_ENABLED', False)
+    monkeypatch.setattr(config, 'RECOGNITION_BATCH_WINDOW_MS', 200)
+    monkeypatch.setattr(batcher, '_batchers', {})
+    buffer = io.BytesIO()
+    Image.fromarray(create_image(800, 200, (60, 50, 500, 120), 30)).save(buffer, format='PNG')
+    data = buffer.getvalue()
+    results = [None, None]
+
+    def run(index):
+        results[index] = process_file(data, detail=True, filename=f'batched_{index}.png')
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batches = batcher.get_batcher(['en']).batches
+
+    monkeypatch.setattr(config, 'RECOGNITION_BATCH_WINDOW_MS', 0)
+    unbatched = process_file(data, detail=True, filename='unbatched.png')
+
+    assert batches == 1, "both uploads should share one batch"
+    assert unbatched['text_blocks']
+    for batched in results:
+        assert batched['status'] == 'success', batched.get('error')
+        assert batched['text_blocks'] == unbatched['text_blocks']
@@ -0,0 +1,135 @@
+"""
+Background Jobs Test
+Runs stand-in jobs through the job manager and checks their lifecycle, the
+queue-full rejection and result expiry
+"""
+
+import io
+import threading
+import time
+
+import pytest
+
+import app
+import config
+import jobs
+from jobs import COMPLETED, FAILED, InMemoryJobStore, JobManager, QueueFullError
+
+
+class Clock:
+    """Stands in for time.time in jobs"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def wait_for(manager, job_id, status, timeout=5):
+    """Poll a job until it reaches `status`"""
+    for _ in range(int(timeout / 0.01)):
+        job = manager.store.get(job_id)
+        if job is not None and job['status'] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not reach {status}")
+
+
+def blocked_manager(max_queue):
+    """A one-worker manager whose worker is held by a job until the event is set"""
+    release = threading.Event()
+    running = threading.Event()
+
+    def block(progress):
+        running.set()
+        release.wait(5)
+        return {}
+
+    manager = JobManager(store=InMemoryJobStore(), workers=1, max_queue=max_queue, ttl=60)
+    manager.submit(block)
+    running.wait(5)
+    return manager, release
+
+
+def test_job_lifecycle():
+    """Progress, result, failure and on_finish cleanup"""
+    manager = JobManager(store=InMemoryJobStore(), workers=1, max_queue=4, ttl=60)
+    finished = []
+
+    def run(progress):
+        progress(1, 2)
+        progress(2, 2)
+        return {'text': 'ok'}
+
+    def fail(progress):
+        raise RuntimeError('bad page')
+
+    job = manager.submit(run, on_finish=lambda: finished.append('run'), files=['a.pdf'])
+    assert job['status'] == 'queued' and job['files'] == ['a.pdf']
+    failed = manager.submit(fail, on_finish=lambda: finished.append('fail'))
+
+    job = wait_for(manager, job['id'], COMPLETED)
+    assert job['result'] == {'text': 'ok'}
+    assert job['progress'] == {'pages_done': 2, 'total_pages': 2}
+    assert job['expires_at'] == pytest.approx(job['finished_at'] + 60)
+    failed = wait_for(manager, failed['id'], FAILED)
+    assert failed['error'] == 'bad page'
+    manager._queue.join()
+    assert finished == ['run', 'fail']
+
+
+def test_queue_full():
+    """Past max_queue waiting jobs, submit raises and keeps no record"""
+    manager, release = blocked_manager(max_queue=2)
+    queued = [manager.submit(lambda progress: {}) for _ in range(2)]
+    with pytest.raises(QueueFullError):
+        manager.submit(lambda progress: {}, files=['rejected.pdf'])
+    assert manager.queue_depth() == 2
+    assert len(manager.store._jobs) == 3
+    assert not [job for job in manager.store._jobs.values() if job.get('files') == ['rejected.pdf']]
+
+    release.set()
+    for job in queued:
+        wait_for(manager, job['id'], COMPLETED)
+    manager.submit(lambda progress: {})
+
+
+def test_ttl_expiry(monkeypatch):
+    """Finished jobs are dropped ttl seconds after finishing; unfinished ones are kept"""
+    clock = Clock()
+    monkeypatch.setattr(jobs, 'time', clock)
+    manager = JobManager(store=InMemoryJobStore(), workers=1, max_queue=2, ttl=60)
+    first = wait_for(manager, manager.submit(lambda progress: {})['id'], COMPLETED)
+    clock.now += 30
+    second = wait_for(manager, manager.submit(lambda progress: {})['id'], COMPLETED)
+
+    clock.now += 29
+    assert manager.get(first['id'])['status'] == COMPLETED
+    clock.now += 2
+    assert manager.get(first['id']) is None
+    assert manager.get(second['id'])['status'] == COMPLETED
+
+    store = InMemoryJobStore()
+    store.create({'id': 'a', 'status': 'running', 'expires_at': None})
+    store.create({'id': 'b', 'status': 'completed', 'expires_at': 10})
+    assert [job['id'] for job in store.purge_expired(10)] == ['b']
+    assert store.get('a') is not None
+
+
+def test_queue_full_over_http(monkeypatch):
+    """A full queue answers 429 with Retry-After; expired jobs are 404"""
+    monkeypatch.setattr(config, 'ADMISSION_ENABLED', False)
+    manager, release = blocked_manager(max_queue=1)
+    manager.submit(lambda progress: {})
+    monkeypatch.setattr(jobs, '_manager', manager)
+    client = app.app.test_client()
+    try:
+        response = client.post('/api/jobs', data={'files': (io.BytesIO(b'\x89PNG'), 'a.png')})
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == str(config.JOB_RETRY_AFTER)
+    finally:
+        release.set()
+
+    assert client.get('/api/jobs/unknown').status_code == 404
+    assert client.get('/api/jobs/unknown/result').status_code == 404
@@ -0,0 +1,127 @@
+"""
+Reader Pool Test
+Loads fake readers of known size into the pool and checks reuse, the
+memory budget and least-recently-used eviction
+"""
+
+import threading
+
+from reader_pool import ReaderPool, estimate_reader_size, normalize_languages
+
+MB = 1024 * 1024
+
+
+class FakeTensor:
+    def __init__(self, size_bytes):
+        self.size_bytes = size_bytes
+
+    def numel(self):
+        return self.size_bytes // 4
+
+    def element_size(self):
+        return 4
+
+
+class FakeModel:
+    def __init__(self, size_bytes):
+        self.size_bytes = size_bytes
+
+    def parameters(self):
+        return [FakeTensor(self.size_bytes)]
+
+    def buffers(self):
+        return []
+
+
+class FakeReader:
+    """Stands in for easyocr.Reader: a detector and recognizer of known size"""
+
+    def __init__(self, languages, size_mb=1):
+        self.languages = languages
+        self.detector = FakeModel(size_mb * MB // 2)
+        self.recognizer = FakeModel(size_mb * MB // 2)
+
+
+def create_pool(max_memory_mb, sizes=None):
+    """Pool whose factory records each load; sizes maps a language to MB"""
+    loads = []
+
+    def factory(languages):
+        loads.append(tuple(languages))
+        return FakeReader(languages, (sizes or {}).get(languages[0], 1))
+
+    return ReaderPool(max_memory_mb=max_memory_mb, factory=factory), loads
+
+
+def test_normalize_languages():
+    assert normalize_languages(['EN', 'es', 'en']) == normalize_languages(['es', 'en']) == ('en', 'es')
+    assert normalize_languages([]) == ('en',)
+
+
+def test_estimate_reader_size():
+    assert estimate_reader_size(FakeReader(['en'], size_mb=3)) == 3 * MB
+    assert estimate_reader_size(object()) == 0
+
+
+def test_reader_reused():
+    """Language sets that normalize alike share one load"""
+    pool, loads = create_pool(10)
+    reader = pool.get(['en', 'fr'])
+    assert pool.get(['FR', 'en']) is reader
+    assert loads == [('en', 'fr')]
+    assert pool.misses == 1
+    assert pool.stats()['readers'][0]['hits'] == 1
+
+
+def test_eviction_order():
+    """Over budget, the least recently used reader is evicted first"""
+    pool, loads = create_pool(2.5)
+    pool.get(['de'])
+    pool.get(['en'])
+    pool.get(['de'])  # 'en' is now least recently used
+    pool.get(['fr'])
+
+    assert [entry['languages'] for entry in pool.stats()['readers']] == [['de'], ['fr']]
+    assert pool.evictions == 1
+
+    pool.get(['es'])
+    assert [entry['languages'] for entry in pool.stats()['readers']] == [['fr'], ['es']]
+    pool.get(['en'])
+    assert loads == [('de',), ('en',), ('fr',), ('es',), ('en',)]
+    assert pool.stats()['resident_mb'] <= 2.5
+
+
+def test_oversized_reader_kept():
+    """A reader larger than the whole budget still loads, alone"""
+    pool, _ = create_pool(2, sizes={'ja': 5})
+    pool.get(['en'])
+    reader = pool.get(['ja'])
+    assert [entry['languages'] for entry in pool.stats()['readers']] == [['ja']]
+    assert pool.get(['ja']) is reader
+
+
+def test_concurrent_first_use_loads_once():
+    """Threads asking for the same cold reader wait for a single load"""
+    pool, loads = create_pool(10)
+    started = threading.Event()
+    release = threading.Event()
+    factory = pool._factory
+
+    def slow_factory(languages):
+        started.set()
+        release.wait(5)
+        return factory(languages)
+
+    pool._factory = slow_factory
+    readers = []
+    threads = [threading.Thread(target=lambda: readers.append(pool.get(['en']))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    started.wait(5)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(readers) == 4 and all(reader is readers[0] for reader in readers)
+    assert loads == [('en',)]
+    assert pool.misses == 1
@@ -0,0 +1,128 @@
+"""
+Result Cache Test
+Checks cache keys, memory and disk tier hits and misses, LRU eviction,
+expiry and the disk size budget
+"""
+
+import numpy as np
+
+import config
+import result_cache
+from ocr import MODE_DETECT, file_cache_key
+from result_cache import ResultCache, hash_array, make_key
+
+
+class Clock:
+    """Stands in for time.time in result_cache"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+def test_make_key():
+    """Keys ignore parameter order and change with content or any parameter"""
+    key = make_key('file', 'abc', languages=('en',), dpi=300)
+    assert key == make_key('file', 'abc', dpi=300, languages=('en',))
+    assert key != make_key('file', 'abd', languages=('en',), dpi=300)
+    assert key != make_key('file', 'abc', languages=('en',), dpi=200)
+    assert key != make_key('pdf_page', 'abc', languages=('en',), dpi=300)
+
+
+def test_hash_array():
+    """Array hashes cover shape and dtype, not only the bytes"""
+    img = np.arange(24, dtype=np.uint8).reshape(4, 6)
+    assert hash_array(img) == hash_array(img.copy())
+    assert hash_array(img) != hash_array(img.reshape(6, 4))
+    assert hash_array(img[:, ::2]) == hash_array(np.ascontiguousarray(img[:, ::2]))
+
+
+def test_file_cache_key():
+    """File keys follow the options that change the output, and only those"""
+    data = b'\x89PNG image bytes'
+    key = file_cache_key(data, '.png', ['en', 'fr'], 300)
+    assert key == file_cache_key(data, '.png', ['FR', 'en'], 300)
+    # DPI only applies to PDFs
+    assert key == file_cache_key(data, '.png', ['en', 'fr'], 150)
+    assert file_cache_key(data, '.pdf', ['en'], 300) != file_cache_key(data, '.pdf', ['en'], 150)
+    assert key != file_cache_key(data + b'!', '.png', ['en', 'fr'], 300)
+    assert key != file_cache_key(data, '.png', ['en'], 300)
+    assert key != file_cache_key(data, '.png', ['en', 'fr'], 300, rois=[[0, 0, 10, 10]])
+    # Detection does not depend on the language set
+    assert (file_cache_key(data, '.png', ['en'], 300, mode=MODE_DETECT)
+            == file_cache_key(data, '.png', ['ja'], 300, mode=MODE_DETECT))
+    assert file_cache_key(data, '.png', ['en'], 300, mode=MODE_DETECT) != file_cache_key(data, '.png', ['en'], 300)
+
+
+def test_memory_hit_and_miss():
+    cache = ResultCache(max_entries=2, disk_path=None)
+    assert cache.get('a') is None
+    cache.put('a', {'text': ['x']})
+    value = cache.get('a')
+    assert value == {'text': ['x']}
+    # Callers get a copy
+    value['text'].append('y')
+    assert cache.get('a') == {'text': ['x']}
+    stats = cache.stats()
+    assert (stats['memory_hits'], stats['misses'], stats['puts']) == (2, 1, 1)
+    assert stats['hit_rate'] == round(2 / 3, 3)
+
+
+def test_memory_lru_eviction():
+    cache = ResultCache(max_entries=2, disk_path=None)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.counters['evictions'] == 1
+
+
+def test_disk_tier(tmp_path):
+    """A second cache (another worker) on the same file hits the disk tier"""
+    path = str(tmp_path / 'cache.sqlite')
+    ResultCache(max_entries=10, disk_path=path).put('a', {'pages': 1})
+    cache = ResultCache(max_entries=10, disk_path=path)
+    assert cache.get('a') == {'pages': 1}
+    assert cache.get('a') == {'pages': 1}
+    assert (cache.counters['disk_hits'], cache.counters['memory_hits']) == (1, 1)
+    assert cache.stats()['disk_entries'] == 1
+
+
+def test_ttl_expiry(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(result_cache, 'time', clock)
+    cache = ResultCache(max_entries=10, disk_path=str(tmp_path / 'cache.sqlite'), ttl=60)
+    cache.put('a', 1)
+    clock.now += 59
+    assert cache.get('a') == 1
+    clock.now += 2
+    assert cache.get('a') is None
+    assert cache.stats()['disk_entries'] == 0
+
+
+def test_disk_trim(tmp_path, monkeypatch):
+    """Every trim_every puts the disk tier drops least recently accessed rows to its budget"""
+    clock = Clock()
+    monkeypatch.setattr(result_cache, 'time', clock)
+    value = 'x' * 1000
+    cache = ResultCache(max_entries=1, disk_path=str(tmp_path / 'cache.sqlite'),
+                        max_disk_mb=3000 / (1024 * 1024), ttl=0, trim_every=2)
+    for key in 'abc':
+        clock.now += 1
+        cache.put(key, value)
+    clock.now += 1
+    assert cache.get('a') == value  # from disk; 'b' is now least recently accessed
+    clock.now += 1
+    cache.put('d', value)
+
+    assert cache.stats()['disk_entries'] == 2
+    assert [cache.get(key) is not None for key in 'abcd'] == [True, False, False, True]
+
+
+def test_get_result_cache_disabled(monkeypatch):
+    monkeypatch.setattr(config, 'RESULT_CACHE_ENABLED', False)
+    assert result_cache.get_result_cache() is None
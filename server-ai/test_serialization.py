@@ -0,0 +1,115 @@
+"""
+Serialization Test
+Round-trips detailed results through the compact columnar format and the
+JSON and MessagePack encoders
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+import serialization
+from serialization import (COMPACT_MIMETYPE, FORMAT_COMPACT, FORMAT_JSON, FORMAT_MSGPACK, TextBlocks,
+                           compact_result, dumps_json, dumps_msgpack, encode, format_for_mimetype)
+
+BLOCKS = [
+    {'text': 'Invoice Nº 42', 'confidence': 0.9876, 'bbox': [[10, 20], [210, 20], [210, 50], [10, 50]]},
+    {'text': '総額 ¥1,000', 'confidence': 0.5, 'bbox': [[12, 60], [180, 62], [179, 90], [11, 88]]}
+]
+
+RESULT = {
+    'success': True,
+    'files': [
+        {'filename': 'a.png', 'status': 'success', 'text': 'Invoice Nº 42', 'text_blocks': BLOCKS},
+        {'filename': 'b.pdf', 'status': 'success', 'pages': [
+            {'page': 1, 'method': 'text_layer', 'text_blocks': BLOCKS[:1]},
+            {'page': 2, 'method': 'easyocr', 'text_blocks': []}
+        ]}
+    ]
+}
+
+
+def expand(compact):
+    """Compact result (after decoding) back to the default format"""
+    if not isinstance(compact, dict):
+        return compact
+    result = {}
+    for key, value in compact.items():
+        if key == 'blocks':
+            boxes = np.array(value['boxes'], dtype=np.int32).reshape(-1, 4, 2)
+            result['text_blocks'] = TextBlocks(value['texts'], np.array(value['confidences']), boxes).to_blocks()
+        elif key in ('pages', 'files'):
+            result[key] = [expand(item) for item in value]
+        elif key != 'format':
+            result[key] = value
+    return result
+
+
+def test_text_blocks_round_trip():
+    blocks = TextBlocks.from_blocks(BLOCKS)
+    assert len(blocks) == 2
+    assert blocks.boxes.shape == (2, 4, 2)
+    assert blocks.to_blocks() == BLOCKS
+    columns = blocks.to_dict()
+    assert columns['boxes'].tolist()[1] == [12, 60, 180, 62, 179, 90, 11, 88]
+    # Confidences are stored to four decimals
+    assert TextBlocks.from_blocks([dict(BLOCKS[0], confidence=0.123456)]).to_dict()['confidences'].tolist() == [0.1235]
+    assert TextBlocks.from_blocks([]).to_blocks() == []
+
+
+def test_compact_result_nested():
+    """Image, PDF page and batch levels are all made columnar"""
+    compact = compact_result(RESULT)
+    assert compact['format'] == FORMAT_COMPACT
+    assert 'text_blocks' not in compact['files'][0]
+    assert compact['files'][0]['blocks']['texts'] == ['Invoice Nº 42', '総額 ¥1,000']
+    assert compact['files'][1]['pages'][1]['blocks']['texts'] == []
+    # The source result is left untouched
+    assert RESULT['files'][0]['text_blocks'] is BLOCKS
+
+
+@pytest.mark.parametrize('use_orjson', [True, False])
+def test_json_round_trip(use_orjson, monkeypatch):
+    if not use_orjson:
+        monkeypatch.setattr(serialization, 'orjson', None)
+    elif serialization.orjson is None:
+        pytest.skip('orjson is not installed')
+    assert json.loads(dumps_json(RESULT)) == RESULT
+    assert json.loads(dumps_json(RESULT, pretty=True)) == RESULT
+    decoded = json.loads(dumps_json(compact_result(RESULT)))
+    assert decoded['format'] == FORMAT_COMPACT
+    assert expand(decoded) == RESULT
+
+
+def test_json_numpy_values(monkeypatch):
+    monkeypatch.setattr(serialization, 'orjson', None)
+    assert json.loads(dumps_json({'a': np.int64(3), 'b': np.float32(0.5), 'c': np.arange(3)})) == {
+        'a': 3, 'b': 0.5, 'c': [0, 1, 2]}
+    with pytest.raises(TypeError):
+        dumps_json({'a': object()})
+
+
+def test_msgpack_round_trip():
+    msgpack = pytest.importorskip('msgpack')
+    assert msgpack.unpackb(dumps_msgpack(RESULT), raw=False) == RESULT
+    body, mimetype = encode(compact_result(RESULT), FORMAT_MSGPACK)
+    assert mimetype == 'application/msgpack'
+    assert expand(msgpack.unpackb(body, raw=False)) == RESULT
+
+
+def test_msgpack_missing(monkeypatch):
+    monkeypatch.setattr(serialization, 'msgpack', None)
+    with pytest.raises(RuntimeError):
+        dumps_msgpack(RESULT)
+    assert FORMAT_MSGPACK not in serialization.available_formats()
+    assert 'application/msgpack' not in serialization.offered_mimetypes()
+
+
+def test_format_for_mimetype():
+    assert format_for_mimetype('application/x-msgpack') == FORMAT_MSGPACK
+    assert format_for_mimetype(COMPACT_MIMETYPE) == FORMAT_COMPACT
+    assert format_for_mimetype('application/json') == FORMAT_JSON
+    body, mimetype = encode(compact_result(RESULT), FORMAT_COMPACT)
+    assert mimetype == COMPACT_MIMETYPE
+    assert expand(json.loads(body)) == RESULT
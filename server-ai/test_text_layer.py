@@ -0,0 +1,60 @@
+"""
+PDF Text Layer Test
+Parses pdftotext -bbox-layout output and checks which pages are read from
+their text layer and which fall back to OCR
+"""
+
+import config
+import text_layer
+from text_layer import extract_text_layer, parse_bbox_layout
+
+LETTER = (612, 792)
+
+
+def create_page(lines, size=LETTER):
+    """One pdftotext page of text lines given as (text, xMin, yMin, xMax, yMax) in points"""
+    body = ''.join(
+        f'<line xMin="{x0}" yMin="{y0}" xMax="{x1}" yMax="{y1}">'
+        + ''.join(f'<word xMin="{x0}" yMin="{y0}" xMax="{x1}" yMax="{y1}">{word}</word>' for word in text.split())
+        + '</line>'
+        for text, x0, y0, x1, y1 in lines
+    )
+    return f'<page width="{size[0]}" height="{size[1]}"><flow><block>{body}</block></flow></page>'
+
+
+def create_document(pages):
+    return ('<html xmlns="http://www.w3.org/1999/xhtml"><head><title></title></head><body><doc>'
+            + ''.join(pages) + '</doc></body></html>')
+
+
+# A born-digital page of body text
+TEXT_PAGE = create_page([(f'Line {i} of the body text of a born-digital page', 72, 72 + 14 * i, 540, 84 + 14 * i)
+                         for i in range(45)])
+# A scan with a digital header and Bates stamp: enough characters, little of the page
+MIXED_PAGE = create_page([
+    ('CONFIDENTIAL - SUBJECT TO PROTECTIVE ORDER', 150, 20, 460, 32),
+    ('ACME-PROD-0001234', 480, 760, 590, 770)
+])
+
+
+def test_parse_bbox_layout():
+    """Line boxes are scaled to pixels and coverage is the lines' share of the page"""
+    pages = parse_bbox_layout(create_document([MIXED_PAGE]), 3, 144)
+    blocks, coverage = pages[3]
+    assert [block['text'] for block in blocks] == ['CONFIDENTIAL - SUBJECT TO PROTECTIVE ORDER', 'ACME-PROD-0001234']
+    assert blocks[1]['bbox'] == [[960, 1520], [1180, 1520], [1180, 1540], [960, 1540]]
+    assert abs(coverage - (310 * 12 + 110 * 10) / (612 * 792)) < 1e-9
+
+
+def test_mixed_page_falls_back_to_ocr(monkeypatch):
+    """A scan with a digital header and Bates stamp is OCRed; a text page is not"""
+    monkeypatch.setattr(config, 'PDF_TEXT_LAYER', True)
+    xhtml = create_document([TEXT_PAGE, MIXED_PAGE, create_page([])])
+    monkeypatch.setattr(text_layer, 'run_pdftotext', lambda pdf, first, last: xhtml)
+
+    pages = extract_text_layer(b'%PDF', 1, 3, 300)
+    assert list(pages) == [1]
+    assert len(pages[1]) == 45
+
+    monkeypatch.setattr(config, 'PDF_TEXT_LAYER_MIN_COVERAGE', 0)
+    assert list(extract_text_layer(b'%PDF', 1, 3, 300)) == [1, 2]
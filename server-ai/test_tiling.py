@@ -0,0 +1,90 @@
+"""
+Tiling Test
+Checks tile plans, region clipping and that text seen by two overlapping
+tiles is kept once, whole, when their results are merged
+"""
+
+import numpy as np
+import pytest
+
+from tiling import merge_tile_results, normalize_rois, ocr_tiled, plan_tiles
+
+
+def box(x0, y0, x1, y1):
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+
+
+def test_plan_tiles_covers_image():
+    tiles = plan_tiles(2500, 3000, 1024, 128)
+    covered = np.zeros((2500, 3000), dtype=bool)
+    for x, y, w, h in tiles:
+        assert (w, h) == (1024, 1024)
+        assert 0 <= x <= 3000 - w and 0 <= y <= 2500 - h
+        covered[y:y + h, x:x + w] = True
+    assert covered.all()
+    assert plan_tiles(300, 500, 1024, 128) == [(0, 0, 500, 300)]
+
+
+def test_normalize_rois():
+    assert normalize_rois([[-10, 5, 50, 50], {'x': 90, 'y': 90, 'width': 20, 'height': 20}], 100, 100) == [
+        (0, 5, 40, 50), (90, 90, 10, 10)]
+    with pytest.raises(ValueError):
+        normalize_rois([[200, 200, 10, 10]], 100, 100)
+    with pytest.raises(ValueError):
+        normalize_rois([[0, 0, 10]], 100, 100)
+
+
+def test_merge_across_seam():
+    """A word cut by one tile's edge and whole in the next is kept once, whole"""
+    left, right = (0, 0, 1000, 1000), (800, 0, 1000, 1000)
+    tile_results = [
+        (left, [
+            (box(100, 100, 300, 140), 'alpha', 0.9),
+            (box(850, 400, 920, 440), 'overlap', 0.8),
+            (box(950, 600, 1000, 640), 'HEL', 0.95)
+        ]),
+        (right, [
+            (box(850, 400, 920, 440), 'overlap', 0.9),
+            (box(950, 600, 1100, 640), 'HELLO', 0.7),
+            (box(1500, 100, 1700, 140), 'omega', 0.9)
+        ])
+    ]
+    merged = merge_tile_results(tile_results, 1000, 1800)
+    assert [text for _, text, _ in merged] == ['alpha', 'omega', 'overlap', 'HELLO']
+    # Of two equal boxes the more confident one is kept
+    assert merged[2][2] == 0.9
+
+
+def test_merge_keeps_neighbours():
+    """Boxes that merely touch or overlap a little are both kept"""
+    tile = (0, 0, 1000, 1000)
+    merged = merge_tile_results([(tile, [
+        (box(100, 100, 200, 130), 'one', 0.9),
+        (box(195, 100, 300, 130), 'two', 0.9),
+        (box(100, 130, 200, 160), 'three', 0.9)
+    ])], 1000, 1000)
+    assert [text for _, text, _ in merged] == ['one', 'two', 'three']
+
+
+def test_ocr_tiled_seam():
+    """
+    Tiled OCR of words straddling tile seams finds each word once and whole.
+    The stand-in OCR reads each word's pixel value and visible width.
+    """
+    img = np.zeros((1500, 1500), dtype=np.uint8)
+    words = {1: (900, 100, 1150, 140), 2: (100, 950, 300, 990), 3: (960, 960, 1100, 1000), 4: (200, 200, 400, 240)}
+    for value, (x0, y0, x1, y1) in words.items():
+        img[y0:y1, x0:x1] = value
+
+    def ocr(view):
+        results = []
+        for value in np.unique(view[view > 0]):
+            ys, xs = np.nonzero(view == value)
+            x0, y0, x1, y1 = int(xs.min()), int(ys.min()), int(xs.max()) + 1, int(ys.max()) + 1
+            results.append((box(x0, y0, x1, y1), f"{value}:{x1 - x0}x{y1 - y0}", 0.9))
+        return results
+
+    merged = ocr_tiled(ocr, img, tile_size=1024, overlap=256, workers=2)
+    found = sorted(text for _, text, _ in merged)
+    assert found == sorted(f"{value}:{x1 - x0}x{y1 - y0}" for value, (x0, y0, x1, y1) in words.items())
+    assert [bbox for bbox, text, _ in merged if text.startswith('1:')] == [box(900, 100, 1150, 140)]
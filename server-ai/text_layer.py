@@ -0,0 +1,101 @@
+"""
+Embedded PDF text layer
+Reads born-digital text and boxes with poppler's pdftotext instead of OCR
+"""
+import subprocess
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Tuple, Union
+import logging
+
+import config
+from metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# PDF user-space units per inch; pdftotext reports boxes in these units
+POINTS_PER_INCH = 72.0
+
+
+def run_pdftotext(pdf: Union[str, bytes], first_page: int, last_page: int) -> str:
+    """
+    Run pdftotext -bbox-layout over a page range and return its XHTML output.
+    PDF bytes are piped through stdin rather than written to disk.
+    """
+    source = '-' if isinstance(pdf, bytes) else pdf
+    command = ['pdftotext', '-f', str(first_page), '-l', str(last_page),
+               '-bbox-layout', '-enc', 'UTF-8', source, '-']
+    completed = subprocess.run(command, input=pdf if isinstance(pdf, bytes) else None,
+                               capture_output=True, check=True,
+                               timeout=config.PDF_TEXT_LAYER_TIMEOUT or None)
+    return completed.stdout.decode('utf-8', errors='replace')
+
+
+def parse_bbox_layout(xhtml: str, first_page: int, dpi: float) -> Dict[int, Tuple[List[Dict], float]]:
+    """
+    Parse pdftotext -bbox-layout output into (text blocks, coverage) per page
+    number. Each text line becomes one block, shaped like OCR text blocks,
+    with its box scaled from PDF points to pixels at `dpi`; coverage is the
+    fraction of the page area the lines cover.
+    """
+    scale = dpi / POINTS_PER_INCH
+    root = ET.fromstring(xhtml)
+    pages = {}
+    for page_num, page in enumerate(root.iterfind('.//{*}page'), start=first_page):
+        page_area = float(page.get('width')) * float(page.get('height')) * scale * scale
+        text_area = 0.0
+        blocks = []
+        for line in page.iterfind('.//{*}line'):
+            words = [word.text.strip() for word in line.iterfind('{*}word') if word.text and word.text.strip()]
+            if not words:
+                continue
+            x_min, y_min = float(line.get('xMin')) * scale, float(line.get('yMin')) * scale
+            x_max, y_max = float(line.get('xMax')) * scale, float(line.get('yMax')) * scale
+            text_area += (x_max - x_min) * (y_max - y_min)
+            blocks.append({
+                'text': ' '.join(words),
+                'confidence': 1.0,
+                'bbox': [[int(x_min), int(y_min)], [int(x_max), int(y_min)],
+                         [int(x_max), int(y_max)], [int(x_min), int(y_max)]]
+            })
+        pages[page_num] = blocks, min(1.0, text_area / page_area) if page_area > 0 else 0.0
+    return pages
+
+
+def has_usable_text(text_blocks: List[Dict], coverage: float) -> bool:
+    """
+    Whether a page's text layer holds enough text, over enough of the page,
+    to skip OCR. A scanned page with a small digital header, footer, Bates
+    stamp or partial OCR layer has text but low coverage, and is OCRed.
+    """
+    chars = sum(len(''.join(block['text'].split())) for block in text_blocks)
+    return chars >= config.PDF_TEXT_LAYER_MIN_CHARS and coverage >= config.PDF_TEXT_LAYER_MIN_COVERAGE
+
+
+def extract_text_layer(pdf: Union[str, bytes], first_page: int, last_page: int,
+                       dpi: float) -> Dict[int, List[Dict]]:
+    """
+    Text blocks for each page in the range that has a usable text layer
+
+    Pages missing from the result (image-only scans, scans with little
+    embedded text, or every page if pdftotext is unavailable or fails)
+    need OCR.
+
+    Args:
+        pdf: Path to the PDF file, or the PDF bytes
+        first_page: First page to read (1-based)
+        last_page: Last page to read
+        dpi: Resolution the boxes are expressed at, matching rendered pages
+    """
+    if not config.PDF_TEXT_LAYER:
+        return {}
+    try:
+        with stage('text_layer'):
+            pages = parse_bbox_layout(run_pdftotext(pdf, first_page, last_page), first_page, dpi)
+    except FileNotFoundError:
+        logger.warning("pdftotext not found; OCRing every PDF page")
+        return {}
+    except (subprocess.SubprocessError, ET.ParseError, ValueError) as e:
+        logger.warning(f"Could not read PDF text layer: {str(e)}")
+        return {}
+    return {page_num: blocks for page_num, (blocks, coverage) in pages.items()
+            if has_usable_text(blocks, coverage)}
@@ -0,0 +1,205 @@
+"""
+Tiled and region-of-interest OCR
+Splits very large images into overlapping tiles (or caller-given regions),
+OCRs them in parallel and merges the boxes back into image coordinates
+"""
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+import logging
+
+import numpy as np
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# (x, y, width, height) in image pixels
+Region = Tuple[int, int, int, int]
+
+# Raw EasyOCR result: (four [x, y] corner points, text, confidence)
+RawResult = Tuple[List, str, float]
+
+# Side in pixels of the grid cells kept boxes are bucketed in while merging
+DEDUP_CELL_SIZE = 256
+
+
+def plan_tiles(height: int, width: int, tile_size: int, overlap: int) -> List[Region]:
+    """
+    Cover an image with tile_size x tile_size tiles overlapping by `overlap`
+    pixels. Edge tiles are shifted inward rather than shrunk, so every tile
+    (but those of a smaller image) has the full size.
+    """
+    step = max(1, tile_size - overlap)
+
+    def starts(length: int) -> List[int]:
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, step))
+        positions.append(length - tile_size)
+        return positions
+
+    return [(x, y, min(tile_size, width), min(tile_size, height))
+            for y in starts(height) for x in starts(width)]
+
+
+def should_tile(img: np.ndarray, tiled: Optional[bool] = None) -> bool:
+    """
+    Whether to OCR an image in tiles: forced on or off by `tiled`, otherwise
+    when its longer side exceeds config.TILE_THRESHOLD
+    """
+    if tiled is not None:
+        return tiled
+    return config.TILE_THRESHOLD > 0 and max(img.shape[:2]) > config.TILE_THRESHOLD
+
+
+def normalize_rois(rois: Sequence[Union[Sequence[int], dict]], height: int, width: int) -> List[Region]:
+    """
+    Validate regions given as [x, y, width, height] or
+    {'x', 'y', 'width', 'height'} and clip them to the image bounds
+    """
+    regions = []
+    for roi in rois:
+        if isinstance(roi, dict):
+            roi = (roi.get('x', 0), roi.get('y', 0), roi.get('width'), roi.get('height'))
+        if len(roi) != 4 or any(value is None for value in roi):
+            raise ValueError(f"Invalid ROI {roi!r}: expected x, y, width, height")
+        x, y, w, h = (int(value) for value in roi)
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(width, x + w), min(height, y + h)
+        if x1 <= x0 or y1 <= y0:
+            raise ValueError(f"ROI {list(roi)} is empty or outside the {width}x{height} image")
+        regions.append((x0, y0, x1 - x0, y1 - y0))
+    return regions
+
+
+def parse_roi(value: str) -> Region:
+    """
+    Parse a command-line ROI, "x,y,width,height"
+    """
+    parts = [part.strip() for part in value.split(',')]
+    if len(parts) != 4:
+        raise ValueError(f"Invalid ROI {value!r}: expected x,y,width,height")
+    x, y, w, h = (int(part) for part in parts)
+    return x, y, w, h
+
+
+def offset_results(results: List[RawResult], dx: int, dy: int) -> List[RawResult]:
+    """Shift raw results from region coordinates to image coordinates"""
+    return [([[point[0] + dx, point[1] + dy] for point in bbox], text, confidence)
+            for bbox, text, confidence in results]
+
+
+def _bounds(bbox: List) -> Tuple[float, float, float, float]:
+    xs = [point[0] for point in bbox]
+    ys = [point[1] for point in bbox]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _overlap_ratio(a: Tuple[float, float, float, float], b: Tuple[float, float, float, float]) -> float:
+    # Intersection over the smaller box: 1.0 when one box contains the other
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1]))
+    return width * height / smaller if smaller > 0 else 0.0
+
+
+def merge_tile_results(tile_results: List[Tuple[Region, List[RawResult]]], height: int, width: int,
+                       margin: int = 2) -> List[RawResult]:
+    """
+    Merge per-tile results (already in image coordinates) into one list
+
+    Text on a seam is seen by two tiles: whole in one, cut in the other.
+    Candidates are ranked so boxes not touching an inner tile edge come
+    first, then larger and more confident boxes, and any box overlapping an
+    already kept box by more than config.TILE_DEDUP_OVERLAP is dropped.
+    Overlapping boxes always share a grid cell they both reach into, so
+    kept boxes are bucketed by DEDUP_CELL_SIZE cells and a candidate is
+    only compared with the boxes in its own cells.
+    Results are returned in reading order (top to bottom, left to right).
+    """
+    candidates = []
+    for (x, y, w, h), results in tile_results:
+        for result in results:
+            x0, y0, x1, y1 = box = _bounds(result[0])
+            # Touching a tile edge that is not also an image edge: likely cut
+            cut = ((x0 <= x + margin and x > 0) or (y0 <= y + margin and y > 0) or
+                   (x1 >= x + w - margin and x + w < width) or
+                   (y1 >= y + h - margin and y + h < height))
+            area = (x1 - x0) * (y1 - y0)
+            cells = [(col, row)
+                     for col in range(int(x0 // DEDUP_CELL_SIZE), int(x1 // DEDUP_CELL_SIZE) + 1)
+                     for row in range(int(y0 // DEDUP_CELL_SIZE), int(y1 // DEDUP_CELL_SIZE) + 1)]
+            candidates.append((cut, -area, -result[2], box, cells, result))
+
+    kept = []
+    kept_by_cell: Dict[Tuple[int, int], List[Tuple[float, float, float, float]]] = {}
+    for _, _, _, box, cells, result in sorted(candidates, key=lambda c: c[:3]):
+        if all(_overlap_ratio(box, other) <= config.TILE_DEDUP_OVERLAP
+               for cell in cells for other in kept_by_cell.get(cell, ())):
+            kept.append((box, result))
+            for cell in cells:
+                kept_by_cell.setdefault(cell, []).append(box)
+    kept.sort(key=lambda item: (item[0][1], item[0][0]))
+    return [result for _, result in kept]
+
+
+def ocr_regions(ocr: Callable[[np.ndarray], List[RawResult]], img: np.ndarray,
+                regions: List[Region], workers: Optional[int] = None) -> List[List[RawResult]]:
+    """
+    Run `ocr` on each region of an image in parallel, returning results per
+    region in image coordinates. Regions are numpy views, not copies.
+    """
+    if workers is None:
+        workers = config.TILE_WORKERS
+
+    def run(region: Region) -> List[RawResult]:
+        x, y, w, h = region
+        return offset_results(ocr(img[y:y + h, x:x + w]), x, y)
+
+    if workers <= 1 or len(regions) <= 1:
+        return [run(region) for region in regions]
+    # Each task runs in a copy of the caller's context, so stage timings
+    # still reach the request's collect_timings() block
+    contexts = [contextvars.copy_context() for _ in regions]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ocr-tile') as executor:
+        return list(executor.map(lambda context, region: context.run(run, region), contexts, regions))
+
+
+def ocr_tiled(ocr: Callable[[np.ndarray], List[RawResult]], img: np.ndarray,
+              tile_size: Optional[int] = None, overlap: Optional[int] = None,
+              workers: Optional[int] = None) -> List[RawResult]:
+    """
+    OCR a large image as overlapping tiles and merge the results
+
+    Args:
+        ocr: Function running detection and recognition on an image array
+        img: Image array (RGB or grey)
+        tile_size: Tile side in pixels (default: config.TILE_SIZE)
+        overlap: Tile overlap in pixels, at least the tallest expected line
+            of text (default: config.TILE_OVERLAP)
+        workers: Tiles OCRed concurrently (default: config.TILE_WORKERS)
+    """
+    tile_size = tile_size or config.TILE_SIZE
+    overlap = config.TILE_OVERLAP if overlap is None else overlap
+    height, width = img.shape[:2]
+    tiles = plan_tiles(height, width, tile_size, overlap)
+    logger.info(f"OCR of {width}x{height} image in {len(tiles)} tiles of {tile_size}px")
+    results = ocr_regions(ocr, img, tiles, workers)
+    return merge_tile_results(list(zip(tiles, results)), height, width)
+
+
+def ocr_rois(ocr: Callable[[np.ndarray], List[RawResult]], img: np.ndarray,
+             rois: Sequence, workers: Optional[int] = None) -> List[Tuple[Region, List[RawResult]]]:
+    """
+    OCR only the given regions of an image. `ocr` gets each region as a
+    view and is responsible for tiling it if it is large.
+
+    Returns:
+        (clipped region, results in image coordinates) for each ROI, in order
+    """
+    height, width = img.shape[:2]
+    regions = normalize_rois(rois, height, width)
+    return list(zip(regions, ocr_regions(ocr, img, regions, workers)))
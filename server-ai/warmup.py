@@ -0,0 +1,122 @@
+"""
+Reader warmup and worker readiness
+Loads readers and runs a dummy inference before serving, so that under a
+pre-forking server (gunicorn preload_app) the model weights are loaded once
+in the master and shared copy-on-write by every worker
+"""
+import gc
+import threading
+import time
+from typing import Dict, Iterable, Optional
+import logging
+
+import numpy as np
+
+import config
+from inference import default_torch_threads, set_torch_threads
+from reader_pool import get_reader_pool, normalize_languages
+
+logger = logging.getLogger(__name__)
+
+_state = {
+    'ready': False,
+    'warming': False,
+    'languages': [],
+    'errors': {},
+    'warmup_time': None
+}
+_state_lock = threading.Lock()
+
+
+def dummy_image() -> np.ndarray:
+    """Small RGB image with a line of text, enough to exercise both models"""
+    import cv2
+    img = np.full((64, 320, 3), 255, dtype=np.uint8)
+    cv2.putText(img, 'Warmup 123', (10, 45), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 2)
+    return img
+
+
+def warm_up(language_sets: Iterable[Iterable[str]]) -> Dict:
+    """
+    Load a reader for each language set and run one inference through it
+
+    The inference triggers the allocations and lazy initialization a first
+    request would otherwise pay for. With config.PREFORK_WARMUP (set by
+    gunicorn.conf.py) torch runs single-threaded here, so no OpenMP thread
+    pool exists at fork time, and surviving objects are moved to the
+    permanent GC generation so collections in workers don't write to
+    (and un-share) the pages holding them.
+
+    Returns:
+        Readiness state, as returned by readiness()
+    """
+    # Imported here: ocr imports the app-level modules this one serves
+    from ocr import readtext_array
+
+    if config.PREFORK_WARMUP:
+        set_torch_threads(1)
+
+    with _state_lock:
+        _state['warming'] = True
+    start = time.perf_counter()
+    warmed, errors = [], {}
+    for languages in language_sets:
+        key = '+'.join(normalize_languages(languages))
+        try:
+            reader = get_reader_pool().get(languages)
+            readtext_array(reader, dummy_image())
+            warmed.append(key)
+            logger.info(f"Warmed reader {key}")
+        except Exception as e:
+            errors[key] = str(e)
+            logger.error(f"Failed to warm reader {key}: {str(e)}")
+
+    if config.PREFORK_WARMUP:
+        gc.collect()
+        gc.freeze()
+
+    with _state_lock:
+        _state.update(ready=not errors, warming=False, languages=warmed, errors=errors,
+                      warmup_time=round(time.perf_counter() - start, 3))
+    return readiness()
+
+
+def warm_up_in_background(language_sets: Iterable[Iterable[str]]) -> threading.Thread:
+    """
+    Run warm_up in a daemon thread, so a server can answer health checks
+    while models load; readiness() reports ready once it finishes
+    """
+    language_sets = [list(languages) for languages in language_sets]
+    with _state_lock:
+        _state['warming'] = True
+    thread = threading.Thread(target=warm_up, args=(language_sets,), name='reader-warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def after_fork(workers: Optional[int] = None):
+    """
+    Worker-side setup after a pre-fork warmup: give torch this worker's
+    share of the CPU cores, divided between its concurrent model calls
+    (config.TORCH_THREADS_PER_WORKER, or see inference.default_torch_threads)
+    """
+    if not config.PREFORK_WARMUP:
+        return
+    set_torch_threads(config.TORCH_THREADS_PER_WORKER or default_torch_threads(workers or 1))
+
+
+def readiness() -> Dict:
+    """Whether this process has warm readers, and which"""
+    with _state_lock:
+        return {
+            'ready': _state['ready'],
+            'warming': _state['warming'],
+            'languages': list(_state['languages']),
+            'errors': dict(_state['errors']),
+            'warmup_time': _state['warmup_time']
+        }
+
+
+def is_ready() -> bool:
+    with _state_lock:
+        return _state['ready']